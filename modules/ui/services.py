@@ -13,7 +13,7 @@ from modules.recipe_search.main import get_recipe_links
 import tempfile
 import os
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import sys
 
 from dotenv import load_dotenv
@@ -34,6 +34,15 @@ _sam_model = None
 # VectorDB 검색기
 _recipe_searcher = None
 
+# 검색 마이크로서비스 (sever/search_server) - 설정하면 로컬 RecipeSearcher 대신 HTTP로 검색
+SEARCH_SERVICE_URL = os.getenv("SEARCH_SERVICE_URL")
+SEARCH_SERVICE_TIMEOUT = float(os.getenv("SEARCH_SERVICE_TIMEOUT", "10"))
+_search_session = None
+
+# 검색 계측 싱크 (SEARCH_METRICS_LOG 설정 시 JSON-lines 파일에도 기록)
+SEARCH_METRICS_LOG = os.getenv("SEARCH_METRICS_LOG")
+_metrics_sink = None
+
 # YouTube 레시피 검색 함수
 _youtube_recipe_func = None
 
@@ -68,6 +77,31 @@ def _get_ocr_resources():
     return _ocr_engine, _sam_model
 
 
+def _get_metrics_sink():
+    """프로세스 공용 MetricsRegistry (+ 선택적 JSON-lines 파일 싱크)"""
+    global _metrics_sink
+    if _metrics_sink is None:
+        sys.path.append(str(Path(__file__).parent.parent.parent))
+        from modules.vector_db.metrics import CompositeSink, JsonLinesSink, get_registry
+
+        _metrics_sink = get_registry()
+        if SEARCH_METRICS_LOG:
+            _metrics_sink = CompositeSink([get_registry(), JsonLinesSink(SEARCH_METRICS_LOG)])
+    return _metrics_sink
+
+
+def get_search_metrics(fmt: str = "prometheus"):
+    """
+    검색 계측 내보내기
+    fmt: "prometheus"(텍스트 형식) 또는 "json"(단계별 평균/p50/p95, 캐시 히트율 요약)
+    """
+    from modules.vector_db.metrics import get_registry
+
+    _get_metrics_sink()
+    registry = get_registry()
+    return registry.to_prometheus() if fmt == "prometheus" else registry.snapshot()
+
+
 def _get_recipe_searcher():
     """VectorDB RecipeSearcher를 lazy load하는 함수"""
     global _recipe_searcher
@@ -75,8 +109,9 @@ def _get_recipe_searcher():
         try:
             sys.path.append(str(Path(__file__).parent.parent.parent))
             from modules.vector_db.search import RecipeSearcher
-            _recipe_searcher = RecipeSearcher()
-            print("✅ VectorDB RecipeSearcher 로드 완료")
+            # 모델/DB 로드는 백그라운드에서 진행 (워밍업 전 검색은 최대 2초 대기 후 키워드 매칭으로 응답)
+            _recipe_searcher = RecipeSearcher(background_warmup=True, warmup_wait=2.0, metrics=_get_metrics_sink())
+            print("✅ VectorDB RecipeSearcher 생성 완료 (백그라운드 워밍업 시작)")
         except Exception as e:
             print(f"VectorDB 모듈 import 실패: {e}")
             print("Mock 데이터를 사용합니다.")
@@ -84,6 +119,22 @@ def _get_recipe_searcher():
     return _recipe_searcher
 
 
+def _search_via_service(ingredients: List[str], n_results: int = 5, filters: Optional[Dict] = None) -> List[Dict]:
+    """검색 마이크로서비스 호출 (세션 재사용으로 keep-alive 연결 유지)"""
+    global _search_session
+    if _search_session is None:
+        import requests
+        _search_session = requests.Session()
+
+    response = _search_session.post(
+        f"{SEARCH_SERVICE_URL.rstrip('/')}/search",
+        json={"ingredients": ingredients, "n_results": n_results, "filters": filters},
+        timeout=SEARCH_SERVICE_TIMEOUT,
+    )
+    response.raise_for_status()
+    return response.json()["results"]
+
+
 def _get_youtube_recipe_func():
     """YouTube 레시피 검색 함수를 lazy load하는 함수"""
     global _youtube_recipe_func
@@ -107,6 +158,10 @@ def detect_ingredients(image_file: Any) -> List[str]:
     """
     if image_file is None:
         return []
+
+    # 재료 인식(OCR) 동안 검색 모델 워밍업을 미리 시작 (step 3 첫 검색 지연 감소)
+    if not SEARCH_SERVICE_URL:
+        _get_recipe_searcher()
     
     # OCR 모듈 사용
     run_ocr_pipeline = _get_ocr_pipeline()
@@ -143,29 +198,43 @@ def detect_ingredients(image_file: Any) -> List[str]:
             tmp_path.unlink()
 
 
-def get_dish_candidates(ingredients: List[str]) -> List[str]:
+def get_dish_candidates(ingredients: List[str], filters: Optional[Dict] = None) -> List[str]:
     """
     재료 리스트를 받아 요리 후보 5개 정도 반환.
     VectorDB 하이브리드 검색으로 레시피 추천.
+    filters: 조리시간/난이도/인분 등 사전 필터 (예: {"max_minutes": 20, "difficulty": "쉬움"})
     """
     if not ingredients:
         return []
 
-    # VectorDB RecipeSearcher 로드
-    searcher = _get_recipe_searcher()
+    # VectorDB RecipeSearcher 로드 (검색 서비스를 쓰면 로컬 모델을 띄우지 않음)
+    searcher = None if SEARCH_SERVICE_URL else _get_recipe_searcher()
 
     # VectorDB를 사용할 수 없으면 mock 데이터 반환
-    if searcher is None:
+    if searcher is None and not SEARCH_SERVICE_URL:
         print("VectorDB를 사용할 수 없어 Mock 데이터를 사용합니다.")
         return mock_get_dish_candidates(ingredients)
 
+    metrics_sink = None
+    trace = None
     try:
+        # step 3 전체 지연 계측 (검색 서비스 HTTP 왕복 포함)
+        metrics_sink = _get_metrics_sink()
+        from modules.vector_db.metrics import QueryTrace
+        trace = QueryTrace("get_dish_candidates")
+        trace.labels['mode'] = "service" if SEARCH_SERVICE_URL else "local"
+
         print(f"\n{'='*50}")
         print(f"🛒 재료 기반 레시피 검색: {ingredients}")
         print(f"{'='*50}")
 
         # 하이브리드 검색 실행 (벡터 유사도 60% + 키워드 매칭 40%)
-        top_recipes = searcher.hybrid_search(ingredients, n_results=5)
+        with trace.stage("search"):
+            if SEARCH_SERVICE_URL:
+                top_recipes = _search_via_service(ingredients, n_results=5, filters=filters)
+            else:
+                top_recipes = searcher.hybrid_search(ingredients, n_results=5, filters=filters)
+        trace.add("returned", len(top_recipes))
 
         # 정제된 요리명만 추출
         recipe_names = [r['name'] for r in top_recipes]
@@ -181,8 +250,18 @@ def get_dish_candidates(ingredients: List[str]) -> List[str]:
     except Exception as e:
         print(f"VectorDB 검색 오류: {e}")
         print("오류 발생으로 Mock 데이터를 사용합니다.")
+        if trace is not None:
+            trace.add("mock_fallback")
         return mock_get_dish_candidates(ingredients)
 
+    finally:
+        # 계측 실패가 검색 결과(또는 mock 대체)를 덮어쓰지 않도록 예외 무시
+        try:
+            if metrics_sink is not None and trace is not None:
+                metrics_sink.record(trace.finish())
+        except Exception as e:
+            print(f"⚠️ 검색 계측 기록 실패: {e}")
+
 
 def get_recipe_links(dish: str) -> Dict:
     """
@@ -0,0 +1,370 @@
+"""
+modules.vector_db.backends
+작성자: 추윤서
+기능: RecipeSearcher용 교체 가능한 벡터 검색 백엔드
+- ChromaBackend: 기존 Chroma collection.query (HNSW, search_ef 지정 가능 - hnsw.py 참고)
+- NumpyBackend: 전체 임베딩을 메모리 맵 float32 행렬로 두고 정규화된 행렬곱 + argpartition으로 정확 검색
+  (레시피 1,000개 규모에서는 HNSW/SQLite 계층 없이도 충분히 빠르고 결과가 정확함)
+- IVFBackend: IVF + PQ/int8 압축 코드만 메모리에 두고, 후보 shortlist만 원본(메모리 맵)으로 다시 계산
+  (수백만 레시피 규모, quantization.py 참고)
+
+모든 백엔드는 Chroma query 결과와 같은 형식({'ids': [[...]], 'distances': [[...]]})을 반환
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from modules.vector_db.metadata_store import chroma_db_mtime
+from modules.vector_db.quantization import IVFIndex
+
+EMBEDDINGS_FILE = "embeddings.npy"
+IDS_FILE = "ids.json"
+INFO_FILE = "info.json"
+IVF_DIR = "ivf"
+
+
+class SearchBackend:
+    """검색 백엔드 공통 인터페이스"""
+
+    name = "base"
+
+    # 메타데이터 필터 방식: "where"(Chroma where 절) 또는 "mask"(백엔드 행 순서의 불리언 마스크)
+    filter_mode = "mask"
+
+    def query(self, query_vectors, n_results, where=None, mask=None):
+        """
+        Args:
+            query_vectors: 쿼리 벡터 리스트 또는 (n, dim) 배열
+            n_results: 쿼리당 후보 수
+            where: Chroma where 절 (filter_mode == "where"인 백엔드)
+            mask: 백엔드 행 순서의 불리언 마스크, True인 행만 검색 (filter_mode == "mask"인 백엔드)
+
+        Returns:
+            {'ids': [[id, ...], ...], 'distances': [[코사인 거리, ...], ...]}
+        """
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def refreshed(self, collection):
+        """
+        원본 컬렉션이 바뀌었을 때 새 백엔드를 만들어 반환 (바뀌지 않았으면 self)
+        - 이 객체는 그대로 두므로 진행 중인 쿼리에 영향 없음, 호출한 쪽이 참조를 한 번에 교체
+        - 오래 걸릴 수 있으므로 요청 스레드가 아닌 백그라운드에서 호출 (RecipeSearcher._refresh_collection)
+        """
+        return self
+
+
+class ChromaBackend(SearchBackend):
+    """Chroma HNSW 인덱스 검색"""
+
+    name = "chroma"
+    filter_mode = "where"
+
+    def __init__(self, collection, search_ef=None):
+        """
+        Args:
+            search_ef: 검색 탐색 폭. hnswlib은 ef = max(search_ef, k)로 탐색하므로
+                       컬렉션 생성 시 값보다 크면 k를 search_ef까지 늘려 조회한 뒤 앞의 n_results개만 반환
+        """
+        self.collection = collection
+        self.search_ef = search_ef
+
+    def query(self, query_vectors, n_results, where=None, mask=None):
+        if isinstance(query_vectors, np.ndarray):
+            query_vectors = query_vectors.tolist()
+        fetch = max(n_results, self.search_ef or 0)
+        results = self.collection.query(
+            query_embeddings=query_vectors,
+            n_results=fetch,
+            where=where,
+            include=["distances"]
+        )
+        if fetch > n_results:
+            results['ids'] = [ids[:n_results] for ids in results['ids']]
+            results['distances'] = [distances[:n_results] for distances in results['distances']]
+        return results
+
+    def count(self):
+        return self.collection.count()
+
+    def refreshed(self, collection):
+        # Chroma가 인덱스를 직접 갱신
+        return self if collection is self.collection else ChromaBackend(collection, self.search_ef)
+
+
+class NumpyBackend(SearchBackend):
+    """메모리 맵 float32 행렬 기반 정확 검색 (코사인)"""
+
+    name = "numpy"
+
+    def __init__(self, ids, embeddings, path=None, fingerprint=None, block_size=262144, db_path=None):
+        """
+        Args:
+            ids: 행 순서의 recipe id 리스트
+            embeddings: (N, dim) L2 정규화된 float32 행렬 (np.memmap 가능)
+            block_size: 한 번에 점수를 계산할 최대 행 수 (대용량에서 메모리 제한)
+            db_path: 컬렉션의 Chroma DB 경로 (지문에 DB 파일 수정 시각 포함, collection_fingerprint 참고)
+        """
+        self.ids = list(ids)
+        self.embeddings = embeddings
+        self.path = path
+        self.fingerprint = fingerprint
+        self.block_size = block_size
+        self.db_path = db_path
+
+    def count(self):
+        return len(self.ids)
+
+    # ============ 생성 / 로드 ============
+
+    @staticmethod
+    def collection_fingerprint(collection, db_path=None):
+        """
+        컬렉션 id + 개수 + chroma.sqlite3 수정 시각 (RecipeMetadataStore.fingerprint와 같은 변경 표시)
+        - 개수가 같은 upsert / 같은 수의 delete + add도 감지 (info.json에 저장되어 재시작 후에도 비교)
+        """
+        return [str(collection.id), collection.count(), chroma_db_mtime(db_path)]
+
+    @classmethod
+    def export_from_collection(cls, collection, path, page_size=1000, db_path=None):
+        """
+        Chroma 컬렉션 임베딩을 페이지 단위로 읽어 정규화된 .npy(메모리 맵)로 저장
+        - 임시 파일에 다 쓴 뒤 os.replace로 교체: 이전 파일을 메모리 맵으로 읽는 중인 쿼리는
+          교체 후에도 이전 내용(지워진 inode)을 계속 읽음 (제자리에서 다시 쓰면 파일이 잘려 SIGBUS)
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        total = collection.count()
+        # 지문은 읽기 전에 계산 → 내보내는 도중 바뀌면 다음 갱신 때 다시 내보냄
+        fingerprint = cls.collection_fingerprint(collection, db_path)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+
+        embeddings_tmp = path / (EMBEDDINGS_FILE + suffix)
+        ids_tmp = path / (IDS_FILE + suffix)
+        info_tmp = path / (INFO_FILE + suffix)
+        try:
+            first = collection.get(include=["embeddings"], limit=1)
+            dim = len(first['embeddings'][0]) if first['ids'] else 0
+            matrix = np.lib.format.open_memmap(embeddings_tmp, mode='w+', dtype=np.float32, shape=(total, dim))
+
+            ids = []
+            offset = 0
+            while offset < total:
+                page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+                if not page['ids']:
+                    break
+                block = np.asarray(page['embeddings'], dtype=np.float32)
+                block /= np.linalg.norm(block, axis=1, keepdims=True) + 1e-12
+                matrix[offset:offset + len(block)] = block
+                ids.extend(page['ids'])
+                offset += len(page['ids'])
+            matrix.flush()
+            del matrix
+
+            with open(ids_tmp, 'w', encoding='utf-8') as f:
+                json.dump(ids, f, ensure_ascii=False)
+            with open(info_tmp, 'w', encoding='utf-8') as f:
+                json.dump({'fingerprint': fingerprint, 'count': len(ids), 'dim': dim}, f)
+
+            # info(지문)를 마지막에 교체 → 중간에 멈추면 다음 로드 때 지문이 달라 다시 내보냄
+            os.replace(embeddings_tmp, path / EMBEDDINGS_FILE)
+            os.replace(ids_tmp, path / IDS_FILE)
+            os.replace(info_tmp, path / INFO_FILE)
+        except BaseException:
+            for tmp in (embeddings_tmp, ids_tmp, info_tmp):
+                tmp.unlink(missing_ok=True)
+            raise
+
+        print(f"✅ NumPy 인덱스 저장 완료: {path} ({len(ids)} x {dim})")
+        return cls.load(path, db_path=db_path)
+
+    @classmethod
+    def load(cls, path, mmap=True, db_path=None):
+        """저장된 인덱스 로드 (기본: 메모리 맵, 필요한 페이지만 OS가 읽어 옴)"""
+        path = Path(path)
+        with open(path / IDS_FILE, 'r', encoding='utf-8') as f:
+            ids = json.load(f)
+        info = {}
+        if (path / INFO_FILE).exists():
+            with open(path / INFO_FILE, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        embeddings = np.load(path / EMBEDDINGS_FILE, mmap_mode='r' if mmap else None)
+        if len(embeddings) != len(ids):
+            # 내보내는 도중 삭제된 행(뒤쪽 빈 행) 또는 교체 도중 중단된 인덱스
+            # → 짧은 쪽에 맞추고 지문을 비워 다음 갱신 때 다시 내보내게 함
+            n = min(len(embeddings), len(ids))
+            ids, embeddings, info = ids[:n], embeddings[:n], {}
+        return cls(ids, embeddings, path=path, fingerprint=info.get('fingerprint'), db_path=db_path)
+
+    @classmethod
+    def from_collection(cls, collection, path, db_path=None):
+        """저장된 인덱스가 컬렉션과 일치하면 로드, 아니면 다시 내보내기"""
+        try:
+            backend = cls.load(path, db_path=db_path)
+            if backend.fingerprint == cls.collection_fingerprint(collection, db_path):
+                return backend
+            print("⚠️ NumPy 인덱스가 컬렉션과 다름 - 다시 내보냅니다")
+        except FileNotFoundError:
+            pass
+        return cls.export_from_collection(collection, path, db_path=db_path)
+
+    def refreshed(self, collection):
+        if self.path is None or self.fingerprint == self.collection_fingerprint(collection, self.db_path):
+            return self
+        return self.export_from_collection(collection, self.path, db_path=self.db_path)
+
+    # ============ 검색 ============
+
+    def query(self, query_vectors, n_results, where=None, mask=None):
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12)
+
+        total = len(self.ids)
+        k = min(n_results, total if mask is None else int(np.count_nonzero(mask)))
+        if k == 0:
+            return {'ids': [[] for _ in queries], 'distances': [[] for _ in queries]}
+
+        # 블록 단위로 점수 계산 후 블록별 상위 k개만 남겨 병합 (메모리 사용량 제한)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, total, self.block_size):
+            block = np.asarray(self.embeddings[start:start + self.block_size])
+            scores = queries @ block.T
+            if mask is not None:
+                # 필터에 걸린 행은 점수를 -inf로 두어 상위 k에 들어오지 않게 함
+                scores[:, ~mask[start:start + len(block)]] = -np.inf
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+            else:
+                top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        # 최종 k개만 점수 내림차순 정렬
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+
+        return {
+            'ids': [[self.ids[row] for row in rows] for rows in best_rows],
+            'distances': (1.0 - best_scores).tolist(),
+        }
+
+
+class IVFBackend(SearchBackend):
+    """IVF + PQ/int8 압축 인덱스 검색 + 원본 벡터 정확 재계산 (코사인)"""
+
+    name = "ivf"
+
+    def __init__(self, ids, index, raw=None, nprobe=8, shortlist=None, path=None, fingerprint=None,
+                 nlist=None, m=None, db_path=None):
+        """
+        Args:
+            ids: 원본 행 순서의 recipe id 리스트
+            index: quantization.IVFIndex
+            raw: 원본 정규화 행렬 (NumpyBackend.embeddings, 메모리 맵). None이면 압축 점수만 사용
+            nprobe: 쿼리당 탐색할 IVF 리스트 수 (클수록 recall 증가/지연 증가)
+            shortlist: 원본으로 다시 계산할 후보 수 (기본 max(n_results x 4, 400))
+            nlist, m: 학습 설정 (refreshed()에서 다시 학습할 때 그대로 사용, None이면 기본값)
+            db_path: 컬렉션의 Chroma DB 경로 (지문용, NumpyBackend.collection_fingerprint 참고)
+        """
+        self.ids = list(ids)
+        self.index = index
+        self.raw = raw
+        self.nprobe = nprobe
+        self.shortlist = shortlist
+        self.path = path
+        self.fingerprint = fingerprint
+        self.nlist = nlist
+        self.m = m
+        self.db_path = db_path
+
+    def count(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_collection(cls, collection, path, kind="pq", nlist=None, m=None, nprobe=8, shortlist=None,
+                        db_path=None):
+        """
+        원본 인덱스(NumpyBackend 형식, path)를 내보내거나 로드한 뒤 IVF 인덱스(path/ivf)를 로드 또는 학습
+        (컬렉션 지문이나 양자화 설정이 바뀌면 다시 학습)
+        """
+        raw = NumpyBackend.from_collection(collection, path, db_path=db_path)
+        ivf_path = Path(path) / IVF_DIR
+        try:
+            index, info = IVFIndex.load(ivf_path)
+            if info.get('fingerprint') == raw.fingerprint and info['kind'] == kind and info.get('m') == m \
+                    and (nlist is None or info['nlist'] == nlist):
+                return cls(raw.ids, index, raw.embeddings, nprobe, shortlist, path, raw.fingerprint, nlist, m,
+                           raw.db_path)
+            print("⚠️ IVF 인덱스가 컬렉션/설정과 다름 - 다시 학습합니다")
+        except FileNotFoundError:
+            pass
+        return cls.train(raw, path, kind=kind, nlist=nlist, m=m, nprobe=nprobe, shortlist=shortlist)
+
+    @classmethod
+    def train(cls, raw, path, kind="pq", nlist=None, m=None, nprobe=8, shortlist=None):
+        """NumpyBackend(원본)으로 IVF 인덱스 학습 후 path/ivf에 저장"""
+        start = time.perf_counter()
+        index = IVFIndex.build(raw.embeddings, nlist=nlist, kind=kind, m=m)
+        index.save(Path(path) / IVF_DIR, info={'fingerprint': raw.fingerprint, 'm': m})
+        print(f"✅ IVF 인덱스 학습 완료: {kind}, 리스트 {index.nlist}개, "
+              f"{index.memory_bytes() / 2 ** 20:.1f} MB ({time.perf_counter() - start:.1f}s)")
+        return cls(raw.ids, index, raw.embeddings, nprobe, shortlist, path, raw.fingerprint, nlist, m,
+                   raw.db_path)
+
+    def refreshed(self, collection):
+        """
+        원본 내보내기 + 다시 학습한 새 백엔드 (대용량에서는 수 분 걸림 - 백그라운드에서 호출,
+        그동안 이 객체로 계속 검색). 설정한 nlist / m은 그대로 사용해 다음 시작 때 다시 학습하지 않음
+        """
+        if self.path is None or self.fingerprint == NumpyBackend.collection_fingerprint(collection, self.db_path):
+            return self
+        raw = NumpyBackend.export_from_collection(collection, self.path, db_path=self.db_path)
+        return self.train(raw, self.path, kind=self.index.kind, nlist=self.nlist, m=self.m,
+                          nprobe=self.nprobe, shortlist=self.shortlist)
+
+    def query(self, query_vectors, n_results, where=None, mask=None):
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12)
+
+        rows, scores = self.index.search(
+            queries, n_results, nprobe=self.nprobe, shortlist=self.shortlist, raw=self.raw, mask=mask
+        )
+        return {
+            'ids': [[self.ids[row] for row in query_rows] for query_rows in rows],
+            'distances': [(1.0 - query_scores).tolist() for query_scores in scores],
+        }
+
+
+def create_backend(name, collection, numpy_index_path=None, search_ef=None, options=None, db_path=None):
+    """
+    이름으로 백엔드 생성 ("chroma", "numpy", "ivf", search_ef는 chroma만 해당)
+
+    Args:
+        options: ivf 백엔드 설정 (kind / nlist / m / nprobe / shortlist, IVFBackend.from_collection 참고)
+        db_path: 컬렉션의 Chroma DB 경로 (numpy / ivf 인덱스 지문에 DB 파일 수정 시각 포함)
+    """
+    if name == "chroma":
+        return ChromaBackend(collection, search_ef=search_ef)
+    if name == "numpy":
+        return NumpyBackend.from_collection(collection, numpy_index_path, db_path=db_path)
+    if name == "ivf":
+        return IVFBackend.from_collection(collection, numpy_index_path, db_path=db_path, **(options or {}))
+    raise ValueError(f"Unknown search backend: {name}")
@@ -0,0 +1,121 @@
+"""
+modules.vector_db.collection_alias
+작성자: 추윤서
+기능: 버전 컬렉션 + 별칭(alias)으로 무중단(blue/green) 재색인
+- 재색인은 기존 컬렉션을 지우지 않고 새 버전 컬렉션(recipes_local_cosine__v<시각>)에 만든 뒤
+  별칭 파일(db_path/collection_aliases.json)의 가리키는 대상을 한 번에 교체 (임시 파일 + os.replace, 원자적)
+- 검색기는 쿼리마다 별칭 파일 mtime만 확인하고, 바뀌었으면 새 버전을 백그라운드에서 로드한 뒤 교체
+  (로드하는 동안에도 이전 버전으로 계속 검색 → 재시작/빈 결과 없음)
+- 이전 버전은 롤백/진행 중인 쿼리를 위해 keep개까지 남기고 나머지는 garbage_collect()로 삭제
+- 별칭 파일이 없으면 별칭 이름 그대로의 컬렉션 사용 (기존 DB 호환)
+"""
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+ALIAS_FILE = "collection_aliases.json"
+VERSION_SEPARATOR = "__v"
+
+# 교체된 뒤에도 남겨 둘 이전 버전 수 (롤백 + 교체 직전에 시작된 쿼리용)
+KEEP_PREVIOUS = 1
+
+
+def versioned_name(alias):
+    """새 버전 컬렉션 이름 (시각 기반, 이름순 = 생성순)"""
+    return f"{alias}{VERSION_SEPARATOR}{time.strftime('%Y%m%d%H%M%S')}{int(time.time() * 1000) % 1000:03d}"
+
+
+def is_version_of(name, alias):
+    """alias의 버전 컬렉션(또는 별칭 도입 전의 같은 이름 컬렉션)인지"""
+    return name == alias or name.startswith(alias + VERSION_SEPARATOR)
+
+
+class CollectionAliases:
+    """db_path/collection_aliases.json: {별칭: {'collection': 현재 버전, 'previous': [이전 버전, ...], 'updated_at'}}"""
+
+    def __init__(self, db_path):
+        self.path = Path(db_path) / ALIAS_FILE
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write(self, aliases):
+        # 같은 디렉토리의 임시 파일에 쓴 뒤 rename → 읽는 쪽은 항상 이전 또는 새 파일 전체만 봄
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(aliases, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def mtime(self):
+        """별칭 파일 수정 시각 (없으면 None) - 검색기가 쿼리마다 확인하는 값"""
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def resolve(self, alias):
+        """별칭이 가리키는 컬렉션 이름 (등록되지 않았으면 별칭 그대로)"""
+        entry = self.load().get(alias)
+        return entry['collection'] if entry else alias
+
+    def switch(self, alias, collection_name):
+        """
+        별칭을 새 컬렉션으로 교체 (원자적)
+
+        Returns:
+            이전에 가리키던 컬렉션 이름
+        """
+        aliases = self.load()
+        entry = aliases.get(alias) or {'collection': alias, 'previous': []}
+        previous = entry['collection']
+        history = [name for name in [previous, *entry.get('previous', [])] if name != collection_name]
+        aliases[alias] = {'collection': collection_name, 'previous': history, 'updated_at': time.time()}
+        self._write(aliases)
+        return previous
+
+    def garbage_collect(self, client, alias, keep=KEEP_PREVIOUS):
+        """
+        현재 버전과 최근 이전 버전 keep개를 제외한 alias 버전 컬렉션 삭제
+        (NumPy 백엔드의 버전별 인덱스 디렉토리도 함께 삭제)
+
+        Returns:
+            삭제한 컬렉션 이름 리스트
+        """
+        entry = self.load().get(alias)
+        if not entry:
+            return []
+        protected = {entry['collection'], *entry.get('previous', [])[:keep]}
+
+        # Chroma 0.6은 이름 리스트, 이전 버전은 Collection 리스트를 반환
+        names = [name if isinstance(name, str) else name.name for name in client.list_collections()]
+        deleted = []
+        for name in names:
+            if not is_version_of(name, alias) or name in protected:
+                continue
+            try:
+                client.delete_collection(name)
+            except Exception as e:
+                print(f"⚠️ 이전 버전 삭제 실패 [{name}]: {e}")
+                continue
+            shutil.rmtree(self.path.parent / "numpy_index" / name, ignore_errors=True)
+            deleted.append(name)
+
+        if deleted:
+            aliases = self.load()
+            if alias in aliases:
+                aliases[alias]['previous'] = [name for name in aliases[alias].get('previous', []) if name not in deleted]
+                self._write(aliases)
+        return deleted
+
+
+def resolve_collection(client, db_path, alias):
+    """별칭을 따라 현재 버전 컬렉션 로드"""
+    return client.get_collection(name=CollectionAliases(db_path).resolve(alias))
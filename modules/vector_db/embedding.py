@@ -1,29 +1,269 @@
 """
 추윤서
 # 나중에 새로운 레시피를 추가할 때
+# 대량 추가(야간 수집 등)는 add_recipes: 레시피를 스트리밍으로 받아 배치 인코딩 + upsert
+#   - 내용(임베딩 텍스트 해시 + 메타데이터)이 그대로인 id는 건너뜀, 같은 배치 안의 중복 id는 마지막 것만 사용
+#   - 배치마다 처리량 통계 반환
+
+실행: python -m modules.vector_db.embedding recipes.jsonl [--batch-size 256]
 """
 
+import argparse
+import json
+import time
+
 import chromadb
-from sentence_transformers import SentenceTransformer
+import numpy as np
+
+from modules.vector_db.collection_alias import CollectionAliases
+from modules.vector_db.embedding_cache import DEFAULT_DIR as EMBEDDING_CACHE_DIR, CachedEncoder, EmbeddingCache
+from modules.vector_db.encoders import load_encoder
+from modules.vector_db.hnsw import hnsw_metadata
+from modules.vector_db.incremental import HASH_KEY, content_hash
+from modules.vector_db.metadata_store import numeric_metadata
+
+COL_NAME = "recipes_local_cosine"
+
+# 레시피에 있으면 메타데이터로 함께 저장하는 필드 (vectordb_builder.create_metadata와 같은 이름)
+OPTIONAL_FIELDS = ("category", "difficulty", "cooking_time", "servings", "calories")
+# recipe_metadata가 관리하는 선택 필드 (레시피에서 빠지면 저장된 값도 지움, llm_name 등 다른 키는 유지)
+MANAGED_FIELDS = ("blog_url",) + OPTIONAL_FIELDS + ("cooking_time_minutes", "servings_count", "calories_kcal")
+
+
+def recipe_text(name, ingredients):
+    """임베딩 텍스트 (reindex.py와 같은 형식)"""
+    return f"요리명: {name}, 재료: {ingredients}"
+
 
 class RecipeEmbedder:
-    def __init__(self, db_path="./modules/vector_db/vectordb_recipes"):
-        self.model = SentenceTransformer('jhgan/ko-sroberta-multitask')
+    def __init__(self, db_path="./modules/vector_db/vectordb_recipes", encoder=None,
+                 hnsw_M=None, hnsw_construction_ef=None, hnsw_search_ef=None,
+                 embedding_cache_path=EMBEDDING_CACHE_DIR):
+        # encoder: "torch" 또는 "onnx-int8" (None이면 환경변수 ENCODER_BACKEND)
+        # hnsw_*: 컬렉션을 새로 만들 때만 적용되는 HNSW 파라미터 (hnsw.py 참고, None이면 Chroma 기본값)
+        # embedding_cache_path: 빌더/재색인과 공유하는 임베딩 캐시 (None이면 사용 안 함)
+        self.model = load_encoder(encoder)
+        if embedding_cache_path:
+            self.model = CachedEncoder(self.model, EmbeddingCache(embedding_cache_path))
         self.client = chromadb.PersistentClient(path=db_path)
-        # 우리가 만든 코사인 유사도 컬렉션을 사용
+        # 우리가 만든 코사인 유사도 컬렉션을 사용 (별칭이 있으면 현재 버전, collection_alias.py 참고)
         self.collection = self.client.get_or_create_collection(
-            name="recipes_local_cosine",
-            metadata={"hnsw:space": "cosine"}
+            name=CollectionAliases(db_path).resolve(COL_NAME),
+            metadata=hnsw_metadata("cosine", hnsw_M, hnsw_construction_ef, hnsw_search_ef)
         )
 
     def add_new_recipe(self, recipe_id, name, ingredients, blog_url):
-        """새로운 레시피 하나를 DB에 추가하는 함수"""
-        text = f"요리명: {name}, 재료: {ingredients}"
-        vector = self.model.encode(text).tolist()
-        
-        self.collection.add(
-            embeddings=[vector],
-            metadatas=[{"name": name, "ingredients": ingredients, "blog_url": blog_url}],
-            ids=[str(recipe_id)]
+        """새로운 레시피 하나를 DB에 추가하는 함수 (이미 있는 id면 갱신)"""
+        self.add_recipes(
+            [{"id": recipe_id, "name": name, "ingredients": ingredients, "blog_url": blog_url}],
+            verbose=False, clear_missing=False
         )
-        print(f"✅ 새 레시피 '{name}' 추가 완료!")
\ No newline at end of file
+        print(f"✅ 새 레시피 '{name}' 추가 완료!")
+
+    # ============ 대량 추가 ============
+
+    @staticmethod
+    def recipe_metadata(recipe):
+        """레시피 dict → (id, 메타데이터, 임베딩 텍스트)"""
+        ingredients = recipe.get('ingredients', recipe.get('ingredients_canonical', []))
+        if not isinstance(ingredients, str):
+            ingredients = json.dumps(list(ingredients), ensure_ascii=False)
+
+        metadata = {"name": recipe['name'], "ingredients": ingredients}
+        if recipe.get('blog_url'):
+            metadata['blog_url'] = recipe['blog_url']
+        for field in OPTIONAL_FIELDS:
+            if recipe.get(field) is not None:
+                metadata[field] = recipe[field]
+        # 필터 검색용 숫자형 필드 (cooking_time_minutes 등)
+        metadata.update(numeric_metadata(metadata))
+
+        text = recipe_text(metadata['name'], ingredients)
+        metadata[HASH_KEY] = content_hash(text)
+        recipe_id = recipe['id'] if 'id' in recipe else recipe['recipe_id']
+        return str(recipe_id), metadata, text
+
+    @staticmethod
+    def _stale_keys(stored, metadata, clear_missing):
+        """
+        새 메타데이터로 덮어써도 남아 버리는(upsert는 병합) 저장된 키
+        - clear_missing이면 레시피에서 빠진 MANAGED_FIELDS
+        - 요리명이 바뀌었으면 이전 이름으로 정제한 llm_name (precompute_names가 다시 계산하도록)
+        """
+        stale = set()
+        if clear_missing:
+            stale.update(key for key in MANAGED_FIELDS if key in stored and key not in metadata)
+        if 'llm_name' in stored and stored.get('name') != metadata.get('name'):
+            stale.add('llm_name')
+        return stale
+
+    def _rewrite_records(self, ids, embeddings, metadatas):
+        """
+        키를 지우기 위해 delete → add로 다시 쓰기 (Chroma는 메타데이터 키 삭제를 지원하지 않음)
+        - add가 실패하면 삭제 전에 읽어 둔 레코드를 그대로 복구한 뒤 예외 전달
+        """
+        backup = self.collection.get(ids=ids, include=["embeddings", "metadatas"])
+        self.collection.delete(ids=ids)
+        try:
+            self.collection.add(ids=ids, embeddings=embeddings, metadatas=metadatas)
+        except Exception:
+            if backup['ids']:
+                self.collection.add(ids=backup['ids'], embeddings=backup['embeddings'], metadatas=backup['metadatas'])
+            raise
+
+    def _upsert_batch(self, batch, number, stats, clear_missing=True):
+        """
+        배치 하나 처리 (batch: {id: (메타데이터, 텍스트)}, 이미 중복 제거됨)
+        clear_missing: 레시피에 없는 MANAGED_FIELDS를 저장된 메타데이터에서도 지움
+        (요리명이 바뀐 레시피의 llm_name은 clear_missing과 관계없이 지움)
+
+        Returns:
+            배치 통계 dict
+        """
+        start = time.perf_counter()
+        ids = list(batch)
+
+        # 저장된 메타데이터에 새 값이 모두 그대로 있고 빠진 필드도 없으면(텍스트 해시 포함) 인코딩/쓰기 생략
+        # (llm_name처럼 나중에 추가된 키는 비교하지 않음, upsert도 기존 키를 유지)
+        existing = self.collection.get(ids=ids, include=["metadatas"])
+        stored = {recipe_id: metadata or {} for recipe_id, metadata in zip(existing['ids'], existing['metadatas'])}
+        stale = {
+            recipe_id: self._stale_keys(stored[recipe_id], batch[recipe_id][0], clear_missing)
+            for recipe_id in ids if recipe_id in stored
+        }
+        stale = {recipe_id: keys for recipe_id, keys in stale.items() if keys}
+        changed = [
+            recipe_id for recipe_id in ids
+            if recipe_id not in stored or recipe_id in stale
+            or any(stored[recipe_id].get(key) != value for key, value in batch[recipe_id][0].items())
+        ]
+
+        if changed:
+            texts = [batch[recipe_id][1] for recipe_id in changed]
+            vectors = np.asarray(self.model.encode(texts, batch_size=64), dtype=np.float32)
+            upsert_rows = [i for i, recipe_id in enumerate(changed) if recipe_id not in stale]
+            rewrite_rows = [i for i, recipe_id in enumerate(changed) if recipe_id in stale]
+            if upsert_rows:
+                self.collection.upsert(
+                    ids=[changed[i] for i in upsert_rows],
+                    embeddings=vectors[upsert_rows],
+                    metadatas=[batch[changed[i]][0] for i in upsert_rows]
+                )
+            if rewrite_rows:
+                # upsert는 메타데이터를 병합해 지울 키(빠진 필드 / 이전 llm_name)가 남으므로 다시 씀
+                # (그 밖의 저장된 키는 새 메타데이터에 옮겨 유지)
+                rewrite_ids = [changed[i] for i in rewrite_rows]
+                self._rewrite_records(
+                    rewrite_ids,
+                    vectors[rewrite_rows],
+                    [{**{key: value for key, value in stored[recipe_id].items() if key not in stale[recipe_id]},
+                      **batch[recipe_id][0]} for recipe_id in rewrite_ids]
+                )
+
+        seconds = time.perf_counter() - start
+        batch_stats = {
+            'batch': number,
+            'received': stats['received'],
+            'duplicates': stats['duplicates'],
+            'unchanged': len(ids) - len(changed),
+            'added': sum(recipe_id not in stored for recipe_id in changed),
+            'updated': sum(recipe_id in stored for recipe_id in changed),
+            'seconds': round(seconds, 3),
+            'per_second': round(stats['received'] / seconds, 1) if seconds > 0 else 0.0,
+        }
+        return batch_stats
+
+    def add_recipes(self, recipes, batch_size=256, verbose=True, clear_missing=True):
+        """
+        레시피 여러 개를 배치 단위로 인코딩해 upsert (iterable을 끝까지 메모리에 올리지 않음)
+
+        Args:
+            recipes: 레시피 dict iterable
+                     (id, name, ingredients(리스트 또는 JSON 문자열) 필수, blog_url / category / difficulty /
+                      cooking_time / servings / calories 선택)
+            batch_size: 한 번에 인코딩/upsert할 최대 레시피 수
+            verbose: 배치마다 진행 상황 출력
+            clear_missing: 이미 있는 레시피에서 빠진 선택 필드(blog_url / category / ... / calories)를 저장된
+                           메타데이터에서도 지움 (False면 빠진 필드는 이전 값 유지, 일부 필드만 넘길 때 사용)
+
+        Returns:
+            {'batches': [배치별 {'batch', 'received', 'duplicates', 'unchanged', 'added', 'updated',
+                                 'seconds', 'per_second'}, ...],
+             'received', 'duplicates', 'invalid', 'unchanged', 'added', 'updated', 'seconds', 'per_second'}
+        """
+        batch_size = min(batch_size, self.client.get_max_batch_size())
+        start = time.perf_counter()
+        batches = []
+        invalid = 0
+
+        batch = {}
+        counts = {'received': 0, 'duplicates': 0}
+
+        def flush():
+            batch_stats = self._upsert_batch(batch, len(batches) + 1, counts, clear_missing)
+            batches.append(batch_stats)
+            if verbose:
+                print(f"✅ 배치 {batch_stats['batch']}: {batch_stats['received']}개 "
+                      f"(추가 {batch_stats['added']}, 갱신 {batch_stats['updated']}, "
+                      f"변경 없음 {batch_stats['unchanged']}, 중복 {batch_stats['duplicates']}, "
+                      f"{batch_stats['per_second']:.0f}개/s)")
+
+        for recipe in recipes:
+            try:
+                recipe_id, metadata, text = self.recipe_metadata(recipe)
+            except (KeyError, TypeError) as e:
+                invalid += 1
+                print(f"⚠️ 레시피 형식 오류로 건너뜀: {e}")
+                continue
+
+            counts['received'] += 1
+            # 같은 배치 안의 중복 id는 마지막 것만 사용
+            if recipe_id in batch:
+                counts['duplicates'] += 1
+                del batch[recipe_id]
+            batch[recipe_id] = (metadata, text)
+            if len(batch) >= batch_size:
+                flush()
+                batch = {}
+                counts = {'received': 0, 'duplicates': 0}
+        if batch:
+            flush()
+
+        seconds = time.perf_counter() - start
+        totals = {key: sum(b[key] for b in batches) for key in ('received', 'duplicates', 'unchanged', 'added', 'updated')}
+        return {
+            'batches': batches,
+            **totals,
+            'invalid': invalid,
+            'seconds': round(seconds, 2),
+            'per_second': round(totals['received'] / seconds, 1) if seconds > 0 else 0.0,
+        }
+
+
+def iter_recipes(path):
+    """JSON Lines(.jsonl)는 한 줄씩, 그 외는 JSON 리스트 파일로 읽기"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if str(path).endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="새 레시피 대량 추가 (배치 인코딩 + upsert)")
+    parser.add_argument("input", help="레시피 JSON 리스트 또는 JSON Lines 파일")
+    parser.add_argument("--db-path", default="./modules/vector_db/vectordb_recipes")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--encoder", default=None, help="인코더 백엔드 (기본: 환경변수 ENCODER_BACKEND)")
+    args = parser.parse_args()
+
+    embedder = RecipeEmbedder(db_path=args.db_path, encoder=args.encoder)
+    stats = embedder.add_recipes(iter_recipes(args.input), batch_size=args.batch_size)
+    stats.pop('batches')
+    print(f"✨ 완료! {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+modules.vector_db.embedding_cache
+작성자: 추윤서
+기능: 내용 주소 기반(content-addressed) 임베딩 디스크 캐시
+- 키: (모델 이름, 텍스트 해시) → 같은 모델로 같은 텍스트를 다시 임베딩하지 않음
+  (VectorDBBuilder / reindex.py / RecipeEmbedder가 같은 캐시를 공유)
+- 저장: 모델/차원별 고정 크기 float32 .npy 샤드(메모리 맵) + SQLite 인덱스(키 → 샤드/행)
+  메타데이터만 바뀐 재빌드나 HNSW 파라미터 변경 시에는 인코더/API 호출 없이 캐시에서 읽음
+- CachedEncoder: encode()를 가진 로컬 인코더를 감싸 캐시 미스만 인코딩
+"""
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from modules.vector_db.incremental import content_hash
+
+DEFAULT_DIR = "./modules/vector_db/embedding_cache"
+INDEX_FILE = "index.sqlite3"
+SHARD_SIZE = 4096
+
+# SQLite 변수 개수 제한을 피하기 위한 조회 단위
+_QUERY_CHUNK = 500
+
+
+def encoder_cache_key(encoder):
+    """로컬 인코더 캐시 키 (같은 모델이라도 torch / onnx-int8 결과가 조금 다르므로 백엔드까지 포함)"""
+    model_name = getattr(encoder, 'model_name', type(encoder).__name__)
+    backend = getattr(encoder, 'name', None)
+    return f"{model_name}:{backend}" if backend else model_name
+
+
+class EmbeddingCache:
+    """(모델, 텍스트 해시) → 임베딩 벡터 디스크 캐시"""
+
+    def __init__(self, path=DEFAULT_DIR, shard_size=SHARD_SIZE):
+        """
+        Args:
+            path: 캐시 디렉토리 (샤드 .npy 파일 + index.sqlite3)
+            shard_size: 샤드 파일 하나의 행 수
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._arrays = {}
+        # 여러 프로세스가 같은 캐시를 쓸 수 있도록 쓰기 잠금 대기 시간을 넉넉히
+        self._conn = sqlite3.connect(str(self.path / INDEX_FILE), check_same_thread=False, timeout=60)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS shards ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, model TEXT NOT NULL, dim INTEGER NOT NULL, "
+            "file TEXT NOT NULL, used INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, shard INTEGER NOT NULL, row INTEGER NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    # ============ 샤드 ============
+
+    def _shard_array(self, shard_id, file):
+        """샤드 메모리 맵 (프로세스 안에서 한 번만 열어 재사용)"""
+        array = self._arrays.get(shard_id)
+        if array is None:
+            array = self._arrays[shard_id] = np.load(self.path / file, mmap_mode='r+')
+        return array
+
+    def _new_shard(self, model, dim):
+        cursor = self._conn.execute(
+            "INSERT INTO shards (model, dim, file, used) VALUES (?, ?, '', 0)", (model, dim)
+        )
+        shard_id = cursor.lastrowid
+        slug = re.sub(r'[^0-9A-Za-z]+', '_', model).strip('_')
+        file = f"{slug}-{dim}-{shard_id:05d}.npy"
+        np.lib.format.open_memmap(self.path / file, mode='w+', dtype=np.float32, shape=(self.shard_size, dim)).flush()
+        self._conn.execute("UPDATE shards SET file = ? WHERE id = ?", (file, shard_id))
+        return shard_id, file, 0
+
+    def _lookup(self, model, hashes):
+        """{텍스트 해시: (샤드 id, 파일, 행)}"""
+        found = {}
+        for i in range(0, len(hashes), _QUERY_CHUNK):
+            chunk = hashes[i:i + _QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                "SELECT e.text_hash, e.shard, s.file, e.row FROM entries e JOIN shards s ON s.id = e.shard "
+                f"WHERE e.model = ? AND e.text_hash IN ({placeholders})",
+                [model, *chunk]
+            ).fetchall()
+            found.update((text_hash, (shard, file, row)) for text_hash, shard, file, row in rows)
+        return found
+
+    # ============ 조회 / 저장 ============
+
+    def get_many(self, model, texts):
+        """텍스트 순서대로 캐시된 벡터 (없으면 None)"""
+        hashes = [content_hash(text) for text in texts]
+        with self._lock:
+            found = self._lookup(model, list(dict.fromkeys(hashes)))
+            vectors = []
+            for text_hash in hashes:
+                location = found.get(text_hash)
+                if location is None:
+                    vectors.append(None)
+                    continue
+                shard_id, file, row = location
+                vectors.append(np.array(self._shard_array(shard_id, file)[row]))
+            hits = sum(vector is not None for vector in vectors)
+            self.hits += hits
+            self.misses += len(vectors) - hits
+        return vectors
+
+    def put_many(self, model, texts, vectors):
+        """벡터 저장 (이미 있는 텍스트는 건너뜀)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or not len(vectors):
+            return 0
+        dim = vectors.shape[1]
+        pending = {}
+        for text, vector in zip(texts, vectors):
+            pending.setdefault(content_hash(text), vector)
+
+        with self._lock:
+            # 행 예약 → 벡터 기록 → 인덱스 커밋을 한 트랜잭션으로 (다른 프로세스는 커밋 후에만 보임)
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = self._lookup(model, list(pending))
+                items = [(text_hash, vector) for text_hash, vector in pending.items() if text_hash not in existing]
+                entries = []
+                while len(entries) < len(items):
+                    shard = self._conn.execute(
+                        "SELECT id, file, used FROM shards WHERE model = ? AND dim = ? AND used < ? "
+                        "ORDER BY id DESC LIMIT 1",
+                        (model, dim, self.shard_size)
+                    ).fetchone()
+                    shard_id, file, used = shard if shard else self._new_shard(model, dim)
+                    take = items[len(entries):len(entries) + self.shard_size - used]
+                    array = self._shard_array(shard_id, file)
+                    array[used:used + len(take)] = np.stack([vector for _, vector in take])
+                    array.flush()
+                    self._conn.execute("UPDATE shards SET used = ? WHERE id = ?", (used + len(take), shard_id))
+                    entries.extend((model, text_hash, shard_id, used + i) for i, (text_hash, _) in enumerate(take))
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO entries (model, text_hash, shard, row) VALUES (?, ?, ?, ?)", entries
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return len(entries)
+
+    def get_or_compute(self, model, texts, compute):
+        """
+        캐시 미스만 compute(텍스트 리스트) → (n, dim) 배열로 계산해 저장 후 전체 (len(texts), dim) 배열 반환
+        """
+        texts = list(texts)
+        cached = self.get_many(model, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        if missing:
+            computed = np.asarray(compute(missing), dtype=np.float32)
+            self.put_many(model, missing, computed)
+            by_text = dict(zip(missing, computed))
+            cached = [by_text[text] if vector is None else vector for text, vector in zip(texts, cached)]
+        if not cached:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack(cached).astype(np.float32, copy=False)
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            shards = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(used), 0) FROM shards").fetchone()
+        total = self.hits + self.misses
+        return {
+            'entries': entries,
+            'shards': shards[0],
+            'rows': shards[1],
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            # 샤드는 미리 크기만 잡아 둔 희소 파일 → 실제 사용 중인 블록 기준
+            'disk_mb': round(sum(f.stat().st_blocks * 512 for f in self.path.glob("*.npy")) / 2 ** 20, 2),
+        }
+
+    def close(self):
+        with self._lock:
+            self._arrays.clear()
+            self._conn.close()
+
+
+class CachedEncoder:
+    """encode()를 가진 인코더를 감싸 (모델, 텍스트) 단위로 캐시 (SentenceTransformer.encode와 같은 호출 방식)"""
+
+    def __init__(self, encoder, cache, model_key=None):
+        self.encoder = encoder
+        self.cache = cache
+        self.model_key = model_key or encoder_cache_key(encoder)
+        self.name = getattr(encoder, 'name', type(encoder).__name__)
+        self.model_name = getattr(encoder, 'model_name', None)
+
+    def get_sentence_embedding_dimension(self):
+        return self.encoder.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, normalize_embeddings=False, **kwargs):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+
+        # 캐시에는 정규화 전 벡터를 저장하고, 요청 시에만 정규화
+        vectors = self.cache.get_or_compute(
+            self.model_key,
+            texts,
+            lambda missing: self.encoder.encode(
+                missing, batch_size=batch_size, show_progress_bar=show_progress_bar, **kwargs
+            )
+        )
+        if normalize_embeddings and len(vectors):
+            vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+        return vectors[0] if single else vectors
@@ -0,0 +1,191 @@
+"""
+modules.vector_db.encoders
+작성자: 추윤서
+기능: ko-sroberta 문장 인코더 백엔드 선택
+- torch: 기존 SentenceTransformer (fp32 PyTorch, CPU)
+- onnx-int8: ONNX로 한 번 내보낸 뒤 동적 int8 양자화, onnxruntime으로 실행 (CPU 전용 환경에서 더 빠름)
+
+두 백엔드 모두 SentenceTransformer.encode와 같은 방식으로 호출
+(문자열 1개 → (dim,) 배열, 리스트 → (n, dim) 배열)
+
+ONNX 모델 생성: python -m modules.vector_db.encoders --export
+"""
+import argparse
+import os
+from pathlib import Path
+
+import numpy as np
+
+MODEL_NAME = "jhgan/ko-sroberta-multitask"
+DEFAULT_ONNX_DIR = "./modules/vector_db/onnx_models/ko-sroberta-multitask"
+ONNX_FP32_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+ENCODER_BACKENDS = ("torch", "onnx-int8")
+
+
+class TorchEncoder:
+    """SentenceTransformer(fp32 PyTorch) 인코더"""
+
+    name = "torch"
+
+    def __init__(self, model_name=MODEL_NAME, device='cpu'):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device=device)
+
+    def get_sentence_embedding_dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        return self.model.encode(texts, batch_size=batch_size, show_progress_bar=show_progress_bar, **kwargs)
+
+
+def export_onnx_int8(model_name=MODEL_NAME, out_dir=DEFAULT_ONNX_DIR, opset=14):
+    """
+    Hugging Face 모델을 ONNX로 내보낸 뒤 동적 int8 양자화 (최초 1회)
+    - 내보내기에만 torch/transformers(최신 torch는 onnxscript도)가 필요하고, 실행은 onnxruntime만 있으면 됨
+
+    Returns:
+        양자화된 모델 경로
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    fp32_path = out_dir / ONNX_FP32_FILE
+    int8_path = out_dir / ONNX_INT8_FILE
+
+    print(f"🔨 ONNX 내보내기: {model_name} → {fp32_path}")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    dummy = tokenizer(["요리명: , 재료: 감자"], return_tensors="pt")
+
+    export_kwargs = dict(
+        input_names=["input_ids", "attention_mask"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "last_hidden_state": {0: "batch", 1: "sequence"},
+        },
+        opset_version=opset,
+    )
+    with torch.no_grad():
+        try:
+            torch.onnx.export(model, (dummy["input_ids"], dummy["attention_mask"]), str(fp32_path), dynamo=False, **export_kwargs)
+        except TypeError:
+            # dynamo 인자가 없는 구버전 torch
+            torch.onnx.export(model, (dummy["input_ids"], dummy["attention_mask"]), str(fp32_path), **export_kwargs)
+
+    print(f"🔨 동적 int8 양자화 → {int8_path}")
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(str(out_dir))
+
+    print(f"✅ ONNX int8 모델 준비 완료 ({int8_path.stat().st_size / 1e6:.0f} MB, fp32 {fp32_path.stat().st_size / 1e6:.0f} MB)")
+    return int8_path
+
+
+class OnnxInt8Encoder:
+    """ONNX Runtime + 동적 int8 양자화 인코더 (mean pooling, SentenceTransformer와 동일한 출력)"""
+
+    name = "onnx-int8"
+
+    def __init__(self, model_dir=DEFAULT_ONNX_DIR, model_name=MODEL_NAME, max_seq_length=128, num_threads=None):
+        """
+        Args:
+            model_dir: 양자화 모델/토크나이저 경로 (없으면 자동으로 내보내기)
+            max_seq_length: 최대 토큰 길이 (ko-sroberta-multitask 기본값 128)
+            num_threads: onnxruntime intra-op 스레드 수 (None이면 전체 코어)
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = Path(model_dir)
+        model_path = model_dir / ONNX_INT8_FILE
+        if not model_path.exists():
+            export_onnx_int8(model_name, model_dir)
+
+        self.model_name = model_name
+        self.max_seq_length = max_seq_length
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        hidden_size = self.session.get_outputs()[0].shape[-1]
+        self._dim = hidden_size if isinstance(hidden_size, int) else None
+
+    def get_sentence_embedding_dimension(self):
+        return self._dim
+
+    def _encode_batch(self, texts):
+        tokens = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np"
+        )
+        attention_mask = tokens["attention_mask"].astype(np.int64)
+        hidden = self.session.run(None, {
+            "input_ids": tokens["input_ids"].astype(np.int64),
+            "attention_mask": attention_mask,
+        })[0]
+
+        # mean pooling (패딩 토큰 제외)
+        mask = attention_mask[:, :, None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, normalize_embeddings=False, **kwargs):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+
+        # 길이순으로 정렬해 배치 내 패딩 최소화 후 원래 순서로 복원
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            batches.append(self._encode_batch([texts[i] for i in order[start:start + batch_size]]))
+            if show_progress_bar:
+                print(f"   인코딩 {min(start + batch_size, len(texts))}/{len(texts)}")
+
+        outputs = np.zeros((len(texts), self._dim or 0), dtype=np.float32)
+        if batches:
+            outputs = np.empty((len(texts), batches[0].shape[1]), dtype=np.float32)
+            outputs[order] = np.vstack(batches)
+
+        if normalize_embeddings:
+            outputs /= np.linalg.norm(outputs, axis=1, keepdims=True) + 1e-12
+        return outputs[0] if single else outputs
+
+
+def load_encoder(backend=None, model_name=MODEL_NAME, **kwargs):
+    """
+    인코더 백엔드 생성
+
+    Args:
+        backend: "torch" 또는 "onnx-int8" (None이면 환경변수 ENCODER_BACKEND, 기본 torch)
+    """
+    backend = backend or os.getenv("ENCODER_BACKEND", "torch")
+    if backend == "torch":
+        return TorchEncoder(model_name, **kwargs)
+    if backend == "onnx-int8":
+        return OnnxInt8Encoder(model_name=model_name, **kwargs)
+    raise ValueError(f"Unknown encoder backend: {backend} (choose from {ENCODER_BACKENDS})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ko-sroberta ONNX int8 모델 내보내기")
+    parser.add_argument("--export", action="store_true", help="ONNX 내보내기 + int8 양자화 실행")
+    parser.add_argument("--out", default=DEFAULT_ONNX_DIR)
+    args = parser.parse_args()
+
+    if args.export:
+        export_onnx_int8(MODEL_NAME, args.out)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+modules.vector_db.filters
+작성자: 추윤서
+기능: 레시피 메타데이터 사전 필터 (조리시간 / 난이도 / 카테고리 / 인분 / 칼로리)
+- Chroma 백엔드: where 절로 변환해 HNSW 검색 단계에서 후보를 줄임
+- NumPy 백엔드 / 키워드 순위: 메타데이터 스토어 배열로 만든 행 마스크 사용
+- 숫자형 조건은 값이 없는(NaN) 레시피를 제외
+
+예: RecipeFilters(max_minutes=20, difficulty="쉬움", servings=1)
+"""
+import numbers
+
+import numpy as np
+
+
+def _as_list(name, value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return [value]
+    try:
+        values = list(value)
+    except TypeError:
+        raise ValueError(f"{name}: 문자열 또는 문자열 리스트여야 합니다 ({value!r})") from None
+    if not all(isinstance(v, str) for v in values):
+        raise ValueError(f"{name}: 문자열 또는 문자열 리스트여야 합니다 ({value!r})")
+    return sorted(set(values))
+
+
+def _as_number(name, value):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, numbers.Real) or value != value:
+        raise ValueError(f"{name}: 숫자여야 합니다 ({value!r})")
+    return value
+
+
+class RecipeFilters:
+    """검색 전 적용할 구조화 필터"""
+
+    def __init__(self, max_minutes=None, min_minutes=None, difficulty=None, category=None,
+                 servings=None, max_calories=None):
+        """
+        Args:
+            max_minutes / min_minutes: 조리시간 범위(분). 예: max_minutes=20 → "20분 이내"
+            difficulty: 난이도 문자열 또는 리스트 (예: "쉬움", ["쉬움", "보통"])
+            category: 카테고리 문자열 또는 리스트
+            servings: 인분 수 (정확히 일치, 예: 1 → "1인분")
+            max_calories: 최대 칼로리(kcal)
+
+        Raises:
+            ValueError: 숫자 조건이 숫자가 아니거나 문자열 조건이 문자열(리스트)이 아닐 때
+        """
+        self.max_minutes = _as_number("max_minutes", max_minutes)
+        self.min_minutes = _as_number("min_minutes", min_minutes)
+        self.difficulty = _as_list("difficulty", difficulty)
+        self.category = _as_list("category", category)
+        self.servings = _as_number("servings", servings)
+        self.max_calories = _as_number("max_calories", max_calories)
+
+    @classmethod
+    def coerce(cls, filters):
+        """
+        None / dict / RecipeFilters를 RecipeFilters로 변환 (조건이 없으면 None)
+
+        Raises:
+            ValueError: 알 수 없는 필터 이름 / 잘못된 값 (검색 서버는 400으로 응답)
+        """
+        if filters is None:
+            return None
+        if isinstance(filters, dict):
+            try:
+                filters = cls(**filters)
+            except TypeError as e:
+                raise ValueError(f"알 수 없는 필터: {e}") from None
+        elif not isinstance(filters, cls):
+            raise ValueError(f"필터는 dict 또는 RecipeFilters여야 합니다 ({type(filters).__name__})")
+        return None if filters.is_empty() else filters
+
+    def is_empty(self):
+        return all(value is None for value in (
+            self.max_minutes, self.min_minutes, self.difficulty, self.category, self.servings, self.max_calories
+        ))
+
+    def __repr__(self):
+        conditions = {key: value for key, value in vars(self).items() if value is not None}
+        return f"RecipeFilters({conditions})"
+
+    # ============ Chroma where ============
+
+    def to_where(self, indexed_fields):
+        """
+        Chroma where 절 생성
+
+        Args:
+            indexed_fields: 컬렉션에 인덱싱된 숫자형 필드 (RecipeMetadataStore.indexed_fields).
+                            재색인 전이라 필드가 없으면 해당 조건은 빼고 mask()로 후처리
+
+        Returns:
+            (where dict 또는 None, 모든 조건을 where로 처리했는지 여부)
+        """
+        clauses = []
+        complete = True
+
+        def numeric(field, operator, value):
+            nonlocal complete
+            if value is None:
+                return
+            if field in indexed_fields:
+                clauses.append({field: {operator: value}})
+            else:
+                complete = False
+
+        numeric('cooking_time_minutes', '$lte', self.max_minutes)
+        numeric('cooking_time_minutes', '$gte', self.min_minutes)
+        numeric('servings_count', '$eq', self.servings)
+        numeric('calories_kcal', '$lte', self.max_calories)
+
+        for field, values in (('difficulty', self.difficulty), ('category', self.category)):
+            if values is not None:
+                clauses.append({field: values[0]} if len(values) == 1 else {field: {'$in': values}})
+
+        if not clauses:
+            return None, complete
+        return (clauses[0] if len(clauses) == 1 else {'$and': clauses}), complete
+
+    # ============ 행 마스크 ============
+
+    def mask(self, store):
+        """메타데이터 스토어 행 순서의 불리언 마스크 (조건을 모두 만족하는 레시피만 True)"""
+        allowed = np.ones(len(store), dtype=bool)
+
+        # NaN 비교는 항상 False이므로 값이 없는 레시피는 자동으로 제외됨
+        if self.max_minutes is not None:
+            allowed &= store.cooking_time_minutes <= self.max_minutes
+        if self.min_minutes is not None:
+            allowed &= store.cooking_time_minutes >= self.min_minutes
+        if self.servings is not None:
+            allowed &= store.servings == self.servings
+        if self.max_calories is not None:
+            allowed &= store.calories <= self.max_calories
+
+        for codes, values, wanted in (
+            (store.category_codes, store.category_values, self.category),
+            (store.difficulty_codes, store.difficulty_values, self.difficulty),
+        ):
+            if wanted is not None:
+                wanted_codes = [code for code, value in enumerate(values) if value in wanted]
+                allowed &= np.isin(codes, wanted_codes)
+
+        return allowed
@@ -0,0 +1,94 @@
+"""
+modules.vector_db.hnsw
+작성자: 추윤서
+기능: Chroma HNSW 인덱스 파라미터(M / construction_ef / search_ef) 설정 도우미
+- Chroma 0.6은 HNSW 파라미터를 컬렉션 생성 시에만 받음 (modify로 바꾸면 반영되지 않고 hnsw 키가 사라짐)
+  → 생성 시 hnsw_metadata()로 지정하고, 바꾸려면 recreate_collection()으로 저장된 임베딩을 새 컬렉션에 복사
+- search_ef는 검색 시에도 적용 가능: hnswlib은 ef = max(search_ef, k)를 쓰므로
+  k를 search_ef까지 늘려 조회한 뒤 앞의 k개만 쓰면 같은 효과 (ChromaBackend 참고)
+- 튜닝 결과(tune_hnsw.py)는 컬렉션 메타데이터의 tuning:* 키에 기록
+"""
+# Chroma(hnswlib) 기본값
+HNSW_DEFAULTS = {"M": 16, "construction_ef": 100, "search_ef": 10}
+
+# 튜닝 결과 메타데이터 키
+TUNED_SEARCH_EF_KEY = "tuning:search_ef"
+TUNING_PREFIX = "tuning:"
+
+PAGE_SIZE = 1000
+
+
+def hnsw_metadata(space="cosine", M=None, construction_ef=None, search_ef=None, extra=None):
+    """
+    컬렉션 생성용 메타데이터 (지정한 값만 포함, 나머지는 Chroma 기본값)
+
+    Args:
+        space: 거리 함수 ("cosine", "l2", "ip", None이면 생략)
+        M: 노드당 연결 수 (클수록 recall/메모리 증가)
+        construction_ef: 인덱스 구축 시 탐색 폭 (클수록 구축이 느리고 그래프 품질 향상)
+        search_ef: 검색 시 탐색 폭 (클수록 recall 증가, 지연 증가)
+        extra: 함께 저장할 다른 메타데이터
+    """
+    metadata = dict(extra or {})
+    if space is not None:
+        metadata["hnsw:space"] = space
+    for key, value in (("M", M), ("construction_ef", construction_ef), ("search_ef", search_ef)):
+        if value is not None:
+            metadata[f"hnsw:{key}"] = int(value)
+    return metadata
+
+
+def collection_hnsw_params(collection):
+    """컬렉션 메타데이터의 HNSW 파라미터 (없으면 Chroma 기본값) + 튜닝된 search_ef"""
+    metadata = collection.metadata or {}
+    params = {key: metadata.get(f"hnsw:{key}", default) for key, default in HNSW_DEFAULTS.items()}
+    params["space"] = metadata.get("hnsw:space", "l2")
+    params["tuned_search_ef"] = metadata.get(TUNED_SEARCH_EF_KEY)
+    return params
+
+
+def default_search_ef(collection):
+    """검색기에서 쓸 search_ef: 튜닝 결과 > 생성 시 지정값 > None(컬렉션 설정 그대로)"""
+    metadata = collection.metadata or {}
+    return metadata.get(TUNED_SEARCH_EF_KEY, metadata.get("hnsw:search_ef"))
+
+
+def recreate_collection(client, collection, metadata, page_size=PAGE_SIZE, target_name=None):
+    """
+    저장된 임베딩/메타데이터/문서를 새 HNSW 설정의 컬렉션으로 복사한 뒤 같은 이름으로 교체 (재임베딩 없음)
+
+    Args:
+        target_name: 지정하면 기존 컬렉션은 그대로 두고 이 이름의 새 컬렉션으로 복사만 함
+                     (별칭 교체용 새 버전, collection_alias.py 참고)
+
+    Returns:
+        새 컬렉션
+    """
+    name = collection.name
+    staging_name = target_name or f"{name}__rebuild"
+    try:
+        client.delete_collection(staging_name)
+    except Exception:
+        pass
+    staging = client.create_collection(name=staging_name, metadata=metadata)
+
+    offset = 0
+    total = collection.count()
+    while offset < total:
+        page = collection.get(include=["embeddings", "metadatas", "documents"], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        staging.add(
+            ids=page['ids'],
+            embeddings=page['embeddings'],
+            metadatas=page['metadatas'],
+            documents=page['documents'] if any(doc is not None for doc in page['documents']) else None,
+        )
+        offset += len(page['ids'])
+        print(f"   복사 {offset}/{total}")
+
+    if target_name:
+        return staging
+    client.delete_collection(name)
+    staging.modify(name=name)
+    return client.get_collection(name)
@@ -0,0 +1,140 @@
+"""
+modules.vector_db.incremental
+작성자: 추윤서
+기능: 증분(incremental) / 재개 가능한 인덱스 빌드 도우미
+- 레코드마다 임베딩 텍스트의 해시(content_hash)를 메타데이터에 저장
+- 다시 빌드할 때 컬렉션의 해시와 비교해 새로 생기거나 바뀐 레시피만 임베딩(upsert)하고, 없어진 레시피는 삭제
+- 임베딩 텍스트는 같고 메타데이터(조리 시간 / 난이도 / URL 등)만 바뀐 레시피는 재임베딩 없이 메타데이터만 교체
+  → 재빌드 시간이 전체 레시피 수가 아니라 바뀐 양에 비례
+- 배치가 끝날 때마다 해시와 함께 upsert하므로 컬렉션 자체가 체크포인트 역할을 하고,
+  BuildCheckpoint(JSON)에는 진행 상황을 기록해 중단된 빌드를 이어서 진행할 때 알려 줌
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+HASH_KEY = "content_hash"
+
+
+def content_hash(text):
+    """임베딩 텍스트 해시 (같은 텍스트면 같은 임베딩 → 다시 계산할 필요 없음)"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def load_existing_metadata(collection, page_size=1000):
+    """컬렉션의 {id: 메타데이터} (content_hash 포함, 해시가 없는 예전 레코드는 키 없음)"""
+    existing = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        for recipe_id, metadata in zip(page['ids'], page['metadatas']):
+            existing[recipe_id] = metadata or {}
+        offset += len(page['ids'])
+    return existing
+
+
+def plan_changes(ids, hashes, existing, metadatas=None):
+    """
+    입력 레코드와 컬렉션 비교
+
+    Args:
+        ids: 입력 레코드 id 리스트
+        hashes: 입력 레코드 content_hash 리스트
+        existing: load_existing_metadata() 결과
+        metadatas: 입력 레코드 메타데이터 (주면 텍스트는 같고 메타데이터만 바뀐 레코드를 'update'로 분류)
+
+    Returns:
+        {'upsert': [입력 행 번호, ...], 'update': [입력 행 번호, ...], 'delete': [id, ...],
+         'unchanged': int, 'added': int, 'changed': int, 'updated': int}
+        upsert는 재임베딩 대상, update는 메타데이터만 교체할 대상
+    """
+    upsert, update, added, changed = [], [], 0, 0
+    for row, (recipe_id, digest) in enumerate(zip(ids, hashes)):
+        if recipe_id not in existing:
+            added += 1
+        elif existing[recipe_id].get(HASH_KEY) != digest:
+            changed += 1
+        else:
+            if metadatas is not None and metadatas[row] != existing[recipe_id]:
+                update.append(row)
+            continue
+        upsert.append(row)
+    wanted = set(ids)
+    delete = [recipe_id for recipe_id in existing if recipe_id not in wanted]
+    return {
+        'upsert': upsert,
+        'update': update,
+        'delete': delete,
+        'unchanged': len(ids) - len(upsert) - len(update),
+        'added': added,
+        'changed': changed,
+        'updated': len(update),
+    }
+
+
+def has_removed_keys(stored, metadata):
+    """저장된 메타데이터에 새 메타데이터에는 없는 키가 있는지 (예: 빠진 blog_url)"""
+    return bool(set(stored or {}) - set(metadata))
+
+
+def update_metadata(collection, ids, metadatas, existing, batch_size=1000):
+    """
+    임베딩은 그대로 두고 메타데이터만 교체 (재임베딩 없음)
+
+    Chroma update / upsert는 메타데이터를 병합하므로(빠진 키는 이전 값 유지, None 값은 거부)
+    없어진 키가 있는 레코드는 저장된 임베딩 / 문서로 delete → add 해서 다시 씀
+
+    Args:
+        existing: load_existing_metadata() 결과 (없어진 키 판단용)
+    """
+    merge = [i for i, recipe_id in enumerate(ids) if not has_removed_keys(existing.get(recipe_id), metadatas[i])]
+    merge_set = set(merge)
+    rewrite = [i for i in range(len(ids)) if i not in merge_set]
+    for start in range(0, len(merge), batch_size):
+        chunk = merge[start:start + batch_size]
+        collection.update(ids=[ids[i] for i in chunk], metadatas=[metadatas[i] for i in chunk])
+    for start in range(0, len(rewrite), batch_size):
+        new_metadata = {ids[i]: metadatas[i] for i in rewrite[start:start + batch_size]}
+        page = collection.get(ids=list(new_metadata), include=["embeddings", "documents"])
+        if not page['ids']:
+            continue
+        collection.delete(ids=page['ids'])
+        collection.add(
+            ids=page['ids'],
+            embeddings=page['embeddings'],
+            documents=page['documents'],
+            metadatas=[new_metadata[recipe_id] for recipe_id in page['ids']],
+        )
+
+
+def delete_ids(collection, ids, batch_size=1000):
+    for start in range(0, len(ids), batch_size):
+        collection.delete(ids=ids[start:start + batch_size])
+
+
+class BuildCheckpoint:
+    """빌드 진행 상황 JSON (원자적 교체로 저장, 중단 시에도 마지막 상태가 남음)"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.state = {}
+
+    def load(self):
+        """이전 상태 (없거나 깨졌으면 빈 dict)"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save(self, **updates):
+        self.state.update(updates, updated_at=time.time())
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,142 @@
+"""
+modules.vector_db.ingredient_vectors
+작성자: 추윤서
+기능: 재료별 임베딩 테이블 (쿼리 벡터 합성용)
+- 쿼리는 항상 "요리명: , 재료: {재료들}" 고정 템플릿이므로,
+  재료 하나씩 넣은 템플릿 임베딩을 미리 계산해 두고 검색 시 조합하면 SentenceTransformer 호출이 필요 없음
+- 저장 형식: ingredient_vectors.npy (float32, 0번 행 = 빈 템플릿, 1번 행부터 재료 순서)
+            ingredient_vocab.json (모델명, 재료 목록)
+
+구축: python -m modules.vector_db.ingredient_vectors
+"""
+import argparse
+import json
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_DIR = "./modules/vector_db/ingredient_vectors"
+MODEL_NAME = "jhgan/ko-sroberta-multitask"
+VECTORS_FILE = "ingredient_vectors.npy"
+VOCAB_FILE = "ingredient_vocab.json"
+
+# 합성 방식
+# - mean: 재료별 템플릿 벡터의 평균 (재료 1개면 실제 인코딩과 동일)
+# - delta: 빈 템플릿 벡터 + 재료별 (템플릿 벡터 - 빈 템플릿) 합
+COMPOSE_MODES = ("mean", "delta")
+
+
+def build_query_text(ingredients):
+    """search.py / reindex.py와 동일한 쿼리 템플릿"""
+    return f"요리명: , 재료: {', '.join(ingredients)}"
+
+
+def build_vocabulary(recipes_file="data/recipes/raw_recipes.json", min_count=1):
+    """
+    원본 레시피 파일의 재료를 정규화(표준 재료명)하여 어휘 목록 생성
+
+    Returns:
+        등장 횟수 내림차순 재료 리스트
+    """
+    from scripts.scrapers.ingredient_normalizer import IngredientNormalizer
+
+    normalizer = IngredientNormalizer()
+    with open(recipes_file, 'r', encoding='utf-8') as f:
+        recipes = json.load(f)
+
+    counts = Counter()
+    for recipe in recipes:
+        canonical = recipe.get('ingredients_canonical')
+        if canonical is None:
+            canonical = [ing['canonical'] for ing in normalizer.normalize_recipe_ingredients(recipe.get('ingredients', []))]
+        counts.update(ing for ing in set(canonical) if ing)
+
+    return [ing for ing, count in counts.most_common() if count >= min_count]
+
+
+class IngredientVectorTable:
+    """재료별 임베딩 테이블 + 쿼리 벡터 합성"""
+
+    def __init__(self, vocab, vectors, template, model_name=MODEL_NAME):
+        """
+        Args:
+            vocab: 재료 리스트
+            vectors: (len(vocab), dim) float32 - 재료 하나만 넣은 쿼리 템플릿의 임베딩
+            template: (dim,) float32 - 재료 없는 빈 템플릿의 임베딩
+        """
+        self.vocab = list(vocab)
+        self.index = {ing: i for i, ing in enumerate(self.vocab)}
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.template = np.asarray(template, dtype=np.float32)
+        self.model_name = model_name
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def __contains__(self, ingredient):
+        return ingredient in self.index
+
+    @classmethod
+    def build(cls, model, vocab, batch_size=256):
+        """모델로 재료별 템플릿 임베딩을 한 번에 계산"""
+        texts = [build_query_text([])] + [build_query_text([ing]) for ing in vocab]
+        encoded = np.asarray(model.encode(texts, batch_size=batch_size, show_progress_bar=True), dtype=np.float32)
+        return cls(vocab, encoded[1:], encoded[0])
+
+    def save(self, out_dir=DEFAULT_DIR):
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        np.save(out_dir / VECTORS_FILE, np.vstack([self.template[None, :], self.vectors]).astype(np.float32))
+        with open(out_dir / VOCAB_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'model_name': self.model_name, 'vocab': self.vocab}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path=DEFAULT_DIR, mmap=True):
+        path = Path(path)
+        with open(path / VOCAB_FILE, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        table = np.load(path / VECTORS_FILE, mmap_mode='r' if mmap else None)
+        return cls(info['vocab'], table[1:], table[0], model_name=info.get('model_name', MODEL_NAME))
+
+    def compose(self, ingredients, mode="mean"):
+        """
+        재료 리스트로 쿼리 벡터 합성 (모델 호출 없음)
+
+        Returns:
+            (dim,) float32 벡터. 사전에 없는 재료가 있으면 None (모델 인코딩으로 대체해야 함)
+        """
+        if not ingredients:
+            return self.template.copy()
+
+        rows = [self.index.get(ing) for ing in ingredients]
+        if any(row is None for row in rows):
+            return None
+
+        parts = self.vectors[rows]
+        if mode == "delta":
+            return self.template + (parts - self.template).sum(axis=0)
+        return parts.mean(axis=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="재료별 임베딩 테이블 구축")
+    parser.add_argument("--recipes", default="data/recipes/raw_recipes.json")
+    parser.add_argument("--out", default=DEFAULT_DIR)
+    parser.add_argument("--min-count", type=int, default=1, help="이 횟수 미만으로 등장한 재료는 제외")
+    parser.add_argument("--encoder", default=None, help="인코더 백엔드 (torch / onnx-int8, 검색에 쓰는 것과 같아야 함)")
+    args = parser.parse_args()
+
+    from modules.vector_db.encoders import load_encoder
+
+    vocab = build_vocabulary(args.recipes, min_count=args.min_count)
+    print(f"🚀 재료 {len(vocab)}종 임베딩 계산 시작...")
+
+    model = load_encoder(args.encoder, MODEL_NAME)
+    table = IngredientVectorTable.build(model, vocab)
+    table.save(args.out)
+    print(f"✨ 완료! {args.out}/{VECTORS_FILE} ({table.vectors.shape[0]} x {table.vectors.shape[1]}, float32)")
+
+
+if __name__ == "__main__":
+    main()
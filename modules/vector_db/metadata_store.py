@@ -0,0 +1,294 @@
+"""
+modules.vector_db.metadata_store
+작성자: 추윤서
+기능: Chroma 레시피 컬렉션의 메타데이터를 한 번만 읽어 배열 기반으로 보관하는 사이드 스토어
+- 재료 JSON은 로드 시점에 한 번만 파싱하여 정수 id(CSR 배열)로 보관
+- 정제된 요리명(규칙 기반 + 미리 계산된 LLM 정제명), 숫자형 필드(조리시간/인분/칼로리)도 미리 계산
+- 컬렉션이 바뀌면(id/개수/DB 파일 수정 시각 변경) reloaded()로 새 스토어를 만들어 참조만 교체
+  (로드 중인 컬럼을 다른 쿼리가 읽지 않도록 기존 스토어는 바꾸지 않음)
+"""
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+# 컬렉션을 나눠 읽을 페이지 크기
+PAGE_SIZE = 1000
+
+# 인덱싱 시 추가하는 숫자형 필드 → 원본 문자열 필드 (Chroma where 범위 비교용)
+NUMERIC_FIELDS = {
+    'cooking_time_minutes': 'cooking_time',
+    'servings_count': 'servings',
+    'calories_kcal': 'calories',
+}
+
+
+def parse_minutes(value):
+    """'30분 이내', '1시간 30분' 같은 조리시간 문자열을 분 단위 숫자로 변환 (실패 시 NaN)"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return float('nan')
+
+    hours = re.search(r'(\d+)\s*시간', value)
+    minutes = re.search(r'(\d+)\s*분', value)
+    if not hours and not minutes:
+        return float('nan')
+
+    total = 0.0
+    if hours:
+        total += int(hours.group(1)) * 60
+    if minutes:
+        total += int(minutes.group(1))
+    return total
+
+
+def parse_number(value):
+    """'2', '2인분', 350 같은 값을 숫자로 변환 (실패 시 NaN)"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = re.search(r'\d+(\.\d+)?', value)
+        if match:
+            return float(match.group())
+    return float('nan')
+
+
+def numeric_metadata(metadata):
+    """
+    원본 메타데이터에서 숫자형 필터 필드 계산 (vectordb_builder.py / reindex.py에서 인덱싱 시 사용)
+    - 파싱 실패, 칼로리 0(미상) 같은 값은 넣지 않음 (Chroma 메타데이터는 None 불가)
+    """
+    numeric = {}
+    minutes = parse_minutes(metadata.get('cooking_time'))
+    if minutes == minutes:
+        numeric['cooking_time_minutes'] = int(minutes)
+    servings = parse_number(metadata.get('servings'))
+    if servings == servings:
+        numeric['servings_count'] = int(servings)
+    calories = parse_number(metadata.get('calories'))
+    if calories == calories and calories > 0:
+        numeric['calories_kcal'] = float(calories)
+    return numeric
+
+
+def chroma_db_mtime(db_path):
+    """
+    Chroma DB 파일(chroma.sqlite3) 수정 시각 (ns, 경로가 없거나 파일이 없으면 None)
+    - add/upsert/update/delete마다 바뀌고 읽기에는 바뀌지 않음 → 개수가 같은 변경도 감지하는 변경 표시
+    """
+    if db_path is None:
+        return None
+    try:
+        return os.stat(os.path.join(db_path, "chroma.sqlite3")).st_mtime_ns
+    except OSError:
+        return None
+
+
+class RecipeMetadataStore:
+    """레시피 메타데이터 컬럼형 저장소 (recipe id 기준)"""
+
+    def __init__(self, name_cleaner=None, refresh_interval=30.0, db_path=None):
+        """
+        Args:
+            name_cleaner: 요리명 정제 함수 (예: RecipeSearcher.clean_recipe_name)
+            refresh_interval: 컬렉션 변경 여부를 확인하는 최소 간격(초)
+            db_path: Chroma DB 경로. 주어지면 chroma.sqlite3 수정 시각도 지문에 포함
+                     (개수가 그대로인 메타데이터만의 변경 - upsert / precompute_names 등 - 감지용)
+        """
+        self.name_cleaner = name_cleaner
+        self.refresh_interval = refresh_interval
+        self.db_path = db_path
+        self._fingerprint = None
+        self._last_checked = 0.0
+        self._reset()
+
+    def _reset(self):
+        """모든 컬럼 초기화"""
+        self.ids = []
+        self.row_of = {}
+        self.names = []
+        self.cleaned_names = []
+        self.urls = []
+
+        # 인덱싱 시 미리 계산된 LLM 정제 요리명 (원본 요리명 → 정제 요리명)
+        self.llm_names = {}
+
+        # 재료: 문자열 ↔ 정수 id 인터닝 + CSR(indptr, indices) 배열
+        self.vocab = {}
+        self.vocab_list = []
+        self.ingredient_indptr = np.zeros(1, dtype=np.int64)
+        self.ingredient_indices = np.zeros(0, dtype=np.int32)
+
+        # 숫자형 필드 (미상은 NaN)
+        # indexed_fields: 값이 있는 모든 레시피에 인덱싱된 숫자형 필드 (Chroma where로 바로 필터 가능)
+        self.indexed_fields = set()
+        self.cooking_time_minutes = np.zeros(0, dtype=np.float32)
+        self.servings = np.zeros(0, dtype=np.float32)
+        self.calories = np.zeros(0, dtype=np.float32)
+
+        # 범주형 필드 (코드 배열 + 코드표)
+        self.category_codes = np.zeros(0, dtype=np.int16)
+        self.category_values = []
+        self.difficulty_codes = np.zeros(0, dtype=np.int16)
+        self.difficulty_values = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def loaded(self):
+        return self._fingerprint is not None
+
+    # ============ 로드 / 무효화 ============
+
+    def fingerprint(self, collection):
+        """
+        컬렉션 변경 감지용 지문 (컬렉션 id + 데이터 개수 + chroma.sqlite3 수정 시각)
+        - Chroma는 읽기에는 DB 파일을 건드리지 않고 add/upsert/update/delete마다 수정 시각이 바뀜
+          (같은 DB의 다른 컬렉션 변경도 다시 로드를 일으키지만 로드는 백그라운드라 검색에는 영향 없음)
+        """
+        return (str(collection.id), collection.count(), chroma_db_mtime(self.db_path))
+
+    def load(self, collection):
+        """컬렉션 메타데이터를 페이지 단위로 읽어 컬럼형 배열로 구성"""
+        start = time.perf_counter()
+        fingerprint = self.fingerprint(collection)
+        self._reset()
+
+        indptr = [0]
+        indices = []
+        cooking_times, servings, calories = [], [], []
+        category_codes, difficulty_codes = [], []
+        category_map, difficulty_map = {}, {}
+        unindexed = dict.fromkeys(NUMERIC_FIELDS, 0)
+
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=PAGE_SIZE, offset=offset)
+            if not page['ids']:
+                break
+
+            for recipe_id, metadata in zip(page['ids'], page['metadatas']):
+                metadata = metadata or {}
+                self.row_of[recipe_id] = len(self.ids)
+                self.ids.append(recipe_id)
+
+                raw_name = metadata.get('name', '')
+                self.names.append(raw_name)
+                self.cleaned_names.append(self.name_cleaner(raw_name) if self.name_cleaner else raw_name)
+                self.urls.append(metadata.get('blog_url', '정보 없음'))
+                if metadata.get('llm_name'):
+                    self.llm_names[raw_name] = metadata['llm_name']
+
+                # 재료 JSON은 여기서 한 번만 파싱 (레시피 내 중복은 제거, 순서 유지)
+                try:
+                    ingredients = json.loads(metadata.get('ingredients', '[]'))
+                except (TypeError, ValueError):
+                    ingredients = []
+                for ing in dict.fromkeys(ingredients):
+                    if ing not in self.vocab:
+                        self.vocab[ing] = len(self.vocab_list)
+                        self.vocab_list.append(ing)
+                    indices.append(self.vocab[ing])
+                indptr.append(len(indices))
+
+                # 원본 값은 있는데 숫자형 필드가 없는 레시피 수 (재색인 전 컬렉션)
+                for field, value in numeric_metadata(metadata).items():
+                    unindexed[field] += field not in metadata
+                cooking_times.append(parse_minutes(metadata.get('cooking_time_minutes', metadata.get('cooking_time'))))
+                servings.append(parse_number(metadata.get('servings_count', metadata.get('servings'))))
+                calories.append(parse_number(metadata.get('calories_kcal', metadata.get('calories'))))
+                category_codes.append(category_map.setdefault(metadata.get('category', '기타'), len(category_map)))
+                difficulty_codes.append(difficulty_map.setdefault(metadata.get('difficulty', '보통'), len(difficulty_map)))
+
+            offset += len(page['ids'])
+
+        self.ingredient_indptr = np.asarray(indptr, dtype=np.int64)
+        self.ingredient_indices = np.asarray(indices, dtype=np.int32)
+        self.cooking_time_minutes = np.asarray(cooking_times, dtype=np.float32)
+        self.servings = np.asarray(servings, dtype=np.float32)
+        self.calories = np.asarray(calories, dtype=np.float32)
+        self.calories[self.calories <= 0] = np.nan  # 0은 칼로리 정보 없음
+        self.indexed_fields = {field for field, count in unindexed.items() if count == 0}
+        self.category_codes = np.asarray(category_codes, dtype=np.int16)
+        self.category_values = list(category_map)
+        self.difficulty_codes = np.asarray(difficulty_codes, dtype=np.int16)
+        self.difficulty_values = list(difficulty_map)
+
+        self._fingerprint = fingerprint
+        self._last_checked = time.monotonic()
+        elapsed = time.perf_counter() - start
+        print(f"✅ 메타데이터 스토어 로드 완료 ({len(self.ids)}개, 재료 {len(self.vocab_list)}종, {elapsed:.2f}s)")
+
+    def invalidate(self):
+        """강제 무효화: 다음 is_stale 호출 때 True"""
+        self._fingerprint = None
+
+    def is_stale(self, collection, force_check=False):
+        """
+        스토어를 만든 뒤 컬렉션이 바뀌었는지 (쿼리마다 호출)
+        (count 조회 비용을 줄이기 위해 refresh_interval 간격으로만 확인)
+        """
+        now = time.monotonic()
+        if self.loaded and not force_check and now - self._last_checked < self.refresh_interval:
+            return False
+
+        self._last_checked = now
+        return not self.loaded or self.fingerprint(collection) != self._fingerprint
+
+    def reloaded(self, collection):
+        """같은 설정의 새 스토어에 collection을 로드해 반환 (이 스토어는 그대로, 호출한 쪽이 참조 교체)"""
+        store = RecipeMetadataStore(
+            name_cleaner=self.name_cleaner, refresh_interval=self.refresh_interval, db_path=self.db_path
+        )
+        store.load(collection)
+        return store
+
+    # ============ 조회 ============
+
+    def rows_for(self, recipe_ids):
+        """recipe id 리스트를 행 번호 배열로 변환 (없는 id는 -1)"""
+        return np.fromiter(
+            (self.row_of.get(recipe_id, -1) for recipe_id in recipe_ids),
+            dtype=np.int64,
+            count=len(recipe_ids)
+        )
+
+    def ingredients_of(self, row):
+        """행 번호의 재료 문자열 리스트"""
+        start, end = self.ingredient_indptr[row], self.ingredient_indptr[row + 1]
+        return [self.vocab_list[i] for i in self.ingredient_indices[start:end]]
+
+    def keyword_match_counts(self, rows, user_ingredients):
+        """
+        각 행에 사용자 재료가 몇 개 포함되는지 계산 (JSON 파싱 없이 CSR 배열 연산만 사용)
+        - user_ingredients는 중복 제거된 재료를 받는다고 가정 (RecipeSearcher.canonicalize_ingredients),
+          같은 재료가 여러 번 들어오면 그 횟수만큼 집계
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        n_rows = len(rows)
+        if n_rows == 0 or not user_ingredients:
+            return np.zeros(n_rows, dtype=np.float64)
+
+        # 재료 id별 가중치 (사전에 없는 재료는 어떤 레시피와도 매칭되지 않음)
+        weights = np.zeros(len(self.vocab_list), dtype=np.float64)
+        for ing in user_ingredients:
+            idx = self.vocab.get(ing)
+            if idx is not None:
+                weights[idx] += 1
+
+        starts = self.ingredient_indptr[rows]
+        lengths = self.ingredient_indptr[rows + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.zeros(n_rows, dtype=np.float64)
+
+        # 각 행의 CSR 구간을 한 번에 모으기 (repeat + arange 트릭)
+        row_positions = np.repeat(np.arange(n_rows), lengths)
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        flat = self.ingredient_indices[np.repeat(starts, lengths) + offsets]
+
+        return np.bincount(row_positions, weights=weights[flat], minlength=n_rows)
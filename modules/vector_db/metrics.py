@@ -0,0 +1,272 @@
+"""
+modules.vector_db.metrics
+작성자: 추윤서
+기능: 레시피 검색 단계별 지연/후보 수/캐시 히트 계측
+- QueryTrace: 검색 1회(또는 배치 1회)의 단계별 시간(encode/query/rerank/clean_names/total)과 카운터 기록
+- 싱크(교체 가능):
+    MetricsRegistry  프로세스 내 히스토그램/카운터 집계 + Prometheus 텍스트 내보내기
+    JsonLinesSink    검색 1회당 JSON 한 줄씩 파일에 추가 (오프라인 분석용)
+    CompositeSink    여러 싱크에 동시에 기록
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# 단계별 지연(초) 버킷
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 쿼리당 후보 수 버킷
+COUNT_BUCKETS = (0, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+# QueryTrace 카운터 중 캐시 히트/미스 → (캐시 이름, 결과)
+CACHE_COUNTERS = {
+    'embedding_hit': ('embedding', 'hit'),
+    'embedding_miss': ('embedding', 'miss'),
+    'name_precomputed': ('name', 'hit'),
+    'name_cache_hit': ('name', 'hit'),
+    'name_miss': ('name', 'miss'),
+}
+# QueryTrace 카운터 중 쿼리당 후보 수 히스토그램으로 기록할 항목
+CANDIDATE_COUNTERS = ('fetched', 'scored', 'rejected', 'returned')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """라벨별 누적 버킷 히스토그램 (Prometheus histogram 형식)"""
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series['buckets'][i] += 1
+        series['sum'] += value
+        series['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series['buckets']):
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+    def quantile(self, q, **labels):
+        """버킷 경계 기준 근사 분위수 (해당 버킷의 상한값)"""
+        series = self._series.get(tuple(sorted(labels.items())))
+        if not series or not series['count']:
+            return None
+        target = q * series['count']
+        for bound, count in zip(self.buckets, series['buckets']):
+            if count >= target:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        return {
+            ",".join(f"{k}={v}" for k, v in key): {
+                'count': series['count'],
+                'avg': round(series['sum'] / series['count'], 6) if series['count'] else 0.0,
+                'p50': self.quantile(0.5, **dict(key)),
+                'p95': self.quantile(0.95, **dict(key)),
+            }
+            for key, series in sorted(self._series.items())
+        }
+
+
+class Counter:
+    """라벨별 누적 카운터"""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+
+    def inc(self, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + value
+
+    def get(self, **labels):
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+    def snapshot(self):
+        return {",".join(f"{k}={v}" for k, v in key): value for key, value in sorted(self._values.items())}
+
+
+class QueryTrace:
+    """검색 1회(배치 1회)의 단계별 시간과 카운터"""
+
+    def __init__(self, kind="hybrid_search", queries=1):
+        self.kind = kind
+        self.queries = queries
+        self.stages = {}
+        self.counts = {}
+        self.labels = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """단계 시간 측정 (같은 단계를 여러 번 실행하면 합산)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def add(self, name, value=1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def finish(self):
+        """전체 시간 기록 후 싱크에 넘길 레코드 반환"""
+        self.stages['total'] = time.perf_counter() - self._start
+        return {
+            'ts': round(time.time(), 3),
+            'kind': self.kind,
+            'queries': self.queries,
+            'stages': {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            'counts': dict(self.counts),
+            **self.labels,
+        }
+
+
+class MetricsSink:
+    """계측 레코드 싱크 공통 인터페이스"""
+
+    def record(self, record):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MetricsRegistry(MetricsSink):
+    """프로세스 내 집계 (히스토그램/카운터) + Prometheus 텍스트 내보내기"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self.stage_seconds = self.histogram(
+            "recipe_search_stage_seconds", "Recipe search stage latency in seconds", LATENCY_BUCKETS
+        )
+        self.candidates = self.histogram(
+            "recipe_search_candidates", "Candidates fetched/scored/rejected/returned per query", COUNT_BUCKETS
+        )
+        self.queries = self.counter("recipe_search_queries_total", "Recipe search queries")
+        self.cache = self.counter("recipe_search_cache_total", "Recipe search cache lookups")
+        self.events = self.counter("recipe_search_events_total", "Other recipe search counters (llm, fallback, ...)")
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, help_text, buckets)
+            return self._metrics[name]
+
+    def counter(self, name, help_text):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, help_text)
+            return self._metrics[name]
+
+    def record(self, record):
+        kind = record.get('kind', 'hybrid_search')
+        queries = max(record.get('queries', 1), 1)
+        with self._lock:
+            self.queries.inc(queries, kind=kind)
+            for stage, seconds in record.get('stages', {}).items():
+                self.stage_seconds.observe(seconds, kind=kind, stage=stage)
+            for name, value in record.get('counts', {}).items():
+                if name in CACHE_COUNTERS:
+                    cache, result = CACHE_COUNTERS[name]
+                    self.cache.inc(value, cache=cache, result=result)
+                elif name in CANDIDATE_COUNTERS:
+                    self.candidates.observe(value / queries, kind=kind, stage=name)
+                else:
+                    self.events.inc(value, kind=kind, event=name)
+
+    def cache_hit_rate(self, cache):
+        with self._lock:
+            hits = self.cache.get(cache=cache, result='hit')
+            misses = self.cache.get(cache=cache, result='miss')
+        return round(hits / (hits + misses), 4) if hits + misses else 0.0
+
+    def to_prometheus(self):
+        """Prometheus text exposition format"""
+        with self._lock:
+            lines = []
+            for metric in self._metrics.values():
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """JSON 직렬화 가능한 요약 (단계별 평균/p50/p95, 카운터, 캐시 히트율)"""
+        with self._lock:
+            snapshot = {name: metric.snapshot() for name, metric in self._metrics.items()}
+        snapshot['cache_hit_rate'] = {cache: self.cache_hit_rate(cache) for cache in ('embedding', 'name')}
+        return snapshot
+
+
+class JsonLinesSink(MetricsSink):
+    """검색 1회당 JSON 한 줄씩 파일에 추가"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def record(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class CompositeSink(MetricsSink):
+    """여러 싱크에 같은 레코드 기록"""
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def record(self, record):
+        for sink in self.sinks:
+            sink.record(record)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+# 프로세스 기본 레지스트리
+_default_registry = MetricsRegistry()
+
+
+def get_registry():
+    return _default_registry
@@ -0,0 +1,173 @@
+"""
+modules.vector_db.micro_batcher
+작성자: 추윤서
+기능: 동시에 들어온 검색 요청을 몇 ms 동안 모아 hybrid_search_many 한 번으로 처리
+- 요청마다 따로 인코딩/조회하지 않고 배치로 encode + collection.query
+- n_results와 필터가 같은 요청끼리 묶음 (hybrid_search_many는 필터를 공통 적용)
+- 워커 스레드 여러 개가 같은 큐에서 배치를 가져가므로 LLM 정제가 길어져도 다음 배치가 막히지 않음
+"""
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from modules.vector_db.filters import RecipeFilters
+
+
+class _SearchRequest:
+    __slots__ = ("ingredients", "n_results", "filters", "future", "enqueued_at")
+
+    def __init__(self, ingredients, n_results, filters):
+        self.ingredients = ingredients
+        self.n_results = n_results
+        self.filters = filters
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """RecipeSearcher 앞단의 요청 마이크로 배처"""
+
+    def __init__(self, searcher, max_batch_size=32, max_wait_ms=5.0, workers=2):
+        """
+        Args:
+            searcher: RecipeSearcher (hybrid_search_many 사용)
+            max_batch_size: 배치 하나에 담을 최대 요청 수
+            max_wait_ms: 첫 요청이 들어온 뒤 다른 요청을 기다리는 최대 시간(ms)
+            workers: 배치를 처리하는 워커 스레드 수
+        """
+        self.searcher = searcher
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'batches': 0, 'max_batch': 0, 'queue_wait_s': 0.0, 'errors': 0}
+        self._closed = False
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"search-batch-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, ingredients, n_results=5, filters=None):
+        """
+        검색 요청 등록
+
+        Returns:
+            concurrent.futures.Future (결과: hybrid_search 결과 리스트)
+
+        Raises:
+            ValueError: 잘못된 필터 (RecipeFilters.coerce)
+        """
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        # 필터는 등록 시점에 검증/정규화 (같은 조건의 dict와 RecipeFilters가 같은 그룹으로 묶임)
+        request = _SearchRequest(list(ingredients), n_results, RecipeFilters.coerce(filters))
+        self._queue.put(request)
+        return request.future
+
+    def search(self, ingredients, n_results=5, filters=None, timeout=None):
+        """동기 호출용: 요청 등록 후 결과를 기다림"""
+        return self.submit(ingredients, n_results, filters).result(timeout=timeout)
+
+    # ============ 워커 ============
+
+    def _collect(self, first):
+        """첫 요청 이후 max_wait 동안(또는 배치가 찰 때까지) 요청을 더 모음"""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                # 종료 신호는 다른 워커를 위해 되돌려 놓음
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _worker(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._queue.put(None)
+                return
+            batch = self._collect(first)
+            try:
+                self._run(batch)
+            except Exception as e:
+                # 워커 스레드는 죽지 않고, 결과를 못 받은 요청만 실패 처리
+                print(f"❌ 배치 처리 오류: {e}")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    @staticmethod
+    def _group_key(request):
+        filters = request.filters
+        if filters is not None and not isinstance(filters, dict):
+            filters = vars(filters)
+        return request.n_results, json.dumps(filters, sort_keys=True, ensure_ascii=False)
+
+    def _run(self, batch):
+        started = time.perf_counter()
+        groups = {}
+        errors = 0
+        for request in batch:
+            try:
+                key = self._group_key(request)
+            except Exception as e:
+                # 직렬화할 수 없는 필터 등 - 이 요청만 실패
+                print(f"❌ 잘못된 검색 요청: {e}")
+                errors += 1
+                request.future.set_exception(e)
+                continue
+            groups.setdefault(key, []).append(request)
+
+        for (n_results, _), requests in groups.items():
+            try:
+                results = self.searcher.hybrid_search_many(
+                    [request.ingredients for request in requests],
+                    n_results=n_results,
+                    filters=requests[0].filters,
+                )
+                for request, result in zip(requests, results):
+                    request.future.set_result(result)
+            except Exception as e:
+                print(f"❌ 배치 검색 실패 ({len(requests)}건): {e}")
+                errors += len(requests)
+                for request in requests:
+                    request.future.set_exception(e)
+
+        with self._lock:
+            self._stats['requests'] += len(batch)
+            self._stats['batches'] += 1
+            self._stats['max_batch'] = max(self._stats['max_batch'], len(batch))
+            self._stats['queue_wait_s'] += sum(started - request.enqueued_at for request in batch)
+            self._stats['errors'] += errors
+
+    # ============ 통계 / 종료 ============
+
+    def stats(self):
+        """배치 통계 (평균 배치 크기, 평균 대기 시간 등)"""
+        with self._lock:
+            stats = dict(self._stats)
+        requests = stats['requests'] or 1
+        stats['avg_batch'] = round(stats['requests'] / (stats['batches'] or 1), 2)
+        stats['avg_queue_wait_ms'] = round(stats.pop('queue_wait_s') / requests * 1000, 2)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    def close(self, timeout=5.0):
+        """남은 요청을 처리한 뒤 워커 종료"""
+        self._closed = True
+        self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=timeout)
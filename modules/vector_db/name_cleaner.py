@@ -0,0 +1,320 @@
+"""
+modules.vector_db.name_cleaner
+작성자: 추윤서
+기능: 요리명 정제 (규칙 기반 / OpenAI 기반) + 정제 결과 영구 캐시(SQLite)
+- 레시피 제목은 재색인 전까지 바뀌지 않으므로 한 번 정제한 결과를 계속 재사용
+- 캐시 미스는 스레드 풀에서 동시에 정제하고, 마감 시간을 넘기면 규칙 기반으로 대체
+"""
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+SYSTEM_PROMPT = "당신은 요리 명칭 정제 전문가입니다. 핵심 요리명만 추출하고, 수식어와 조리방법 관련 단어는 모두 제거합니다."
+
+USER_PROMPT_TEMPLATE = """레시피 제목에서 핵심 요리명만 추출하세요.
+
+제거할 것:
+- 숫자, 날짜, 에피소드 번호
+- 수식어(맛있는, 간단한, 아삭한, 입맛돋구는 등)
+- 조리방법 관련 단어(만드는법, 레시피, 만들기, 황금레시피 등)
+- 특수문자(!,.,.. 등)
+
+예시:
+입력: [176.오트밀과일빵(2025.11.7)]
+출력: 오트밀과일빵
+
+입력: [[만개백과] EP. 18 가끔 생각나는 야채샐러드빵]
+출력: 야채샐러드빵
+
+입력: [에어프라이어 요리 양파햄치즈빵 만드는 법 너무 맛있잖아]
+출력: 양파햄치즈빵
+
+입력: [아삭한 콩나물무침 레시피 만들기]
+출력: 콩나물무침
+
+입력: [입맛 돋구는 양파덮밥 레시피!]
+출력: 양파덮밥
+
+입력: [{raw_name}]
+출력:"""
+
+
+def clean_recipe_name(name):
+    """
+    [고도화된 정제] 자취생용 수식어 제거 (어순 유지)
+    """
+    # 1. 특수문자를 공백으로 변환 (괄호, 대괄호, 점 등)
+    name = re.sub(r'[\[\]().,\-_]', ' ', name)
+    
+    # 2. 숫자와 날짜 패턴 제거 (예: 176, 2025.11.7, EP 18)
+    name = re.sub(r'\d+\.?\d*\.?\d*', ' ', name)
+    name = re.sub(r'ep\s*\d+|episode\s*\d+', ' ', name, flags=re.IGNORECASE)
+    
+    # 3. 소문자 변환
+    name = name.lower()
+    
+    # 4. 노이즈 단어 제거
+    stop_words = [
+        '레시피', '만들기', '방법', '황금레시피', '간단', '초간단', '아삭한', '맛있는', 
+        '꿀팁', '집밥', '반찬', '양념', '젓국', '하얀', '식감이', '매력적인', '단짠', 
+        '입맛돋궈주는', '새콤아삭', '든든한', '최고의', '끓이는법', '끓이기', '조리법',
+        '요리법', '쉬운', '빠른', '특급', '비법', '황금', '꿀', '백선생', '알토란',
+        '입맛', '돋구는', '간단하지만', '특별한', '영양만점', '초스피드', '속성',
+        '만개백과', '가끔', '생각나는', '너무', '맛있잖아', '에어프라이어', '요리',
+        '만드는', '법', '법', 'ep', 'episode'
+    ]
+    
+    words = name.split()
+    # 어순 유지하면서 불용어만 제거
+    cleaned_words = [w for w in words if w.strip() and w not in stop_words]
+    
+    # 중복 제거하되 순서는 유지
+    unique_words = []
+    for w in cleaned_words:
+        if w not in unique_words and len(w) > 0:
+            unique_words.append(w)
+    
+    result = " ".join(unique_words).strip()
+    
+    # 결과가 비어있으면 원본의 첫 단어라도 반환
+    if not result and words:
+        result = words[0]
+            
+    return result
+
+
+class LLMNameCleaner:
+    """OpenAI API를 사용하여 환각 현상을 방지하고 핵심 요리명만 정확히 추출"""
+
+    def __init__(self, openai_client, model="gpt-4o-mini"):
+        self.client = openai_client
+        self.model = model
+
+    def request(self, raw_name):
+        """
+        OpenAI API 호출 후 후처리/검증
+
+        Returns:
+            정제된 요리명 (API 미사용, 오류, 결과 불량이면 None)
+        """
+        if self.client is None:
+            return None
+
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": USER_PROMPT_TEMPLATE.format(raw_name=raw_name)}
+                ],
+                max_tokens=20,
+                temperature=0.0,
+            )
+
+            refined = response.choices[0].message.content.strip()
+
+            # 후처리: 불필요한 텍스트 및 특수문자 제거
+            refined = re.sub(r'출력:|결과:|->|:|\*|```|!|\.|…', '', refined).strip()
+            refined = refined.split('\n')[0].strip()
+
+            # 추가 정제: 남은 불필요한 단어 제거
+            noise_words = ['레시피', '만들기', '만드는법', '황금레시피']
+            for word in noise_words:
+                refined = refined.replace(word, '').strip()
+
+            # 검증: 결과가 유효한지 확인
+            if refined and len(refined) >= 2 and not refined.isdigit():
+                print(f"✅ OpenAI 정제: '{raw_name}' -> '{refined}'")
+                return refined
+
+            print(f"⚠️ OpenAI 결과 불량: '{refined}' -> 규칙 기반으로 대체")
+            return None
+
+        except Exception as e:
+            print(f"⚠️ OpenAI API 오류: {e}")
+            return None
+
+
+class CleanedNameCache:
+    """원본 요리명 → 정제된 요리명 영구 캐시 (로컬 SQLite 파일)"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cleaned_names ("
+            "raw_name TEXT PRIMARY KEY, cleaned_name TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cleaned_names").fetchone()[0]
+
+    def get(self, raw_name):
+        """캐시 조회 (없으면 None)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cleaned_name FROM cleaned_names WHERE raw_name = ?", (raw_name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, raw_names):
+        """여러 요리명을 한 번에 조회 → {원본: 정제} (캐시에 있는 것만)"""
+        raw_names = list(dict.fromkeys(raw_names))
+        found = {}
+        with self._lock:
+            # SQLite 변수 개수 제한을 피하기 위해 나눠서 조회
+            for i in range(0, len(raw_names), 500):
+                chunk = raw_names[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT raw_name, cleaned_name FROM cleaned_names WHERE raw_name IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def put(self, raw_name, cleaned_name):
+        """정제 결과 저장"""
+        self.put_many([(raw_name, cleaned_name)])
+
+    def put_many(self, pairs):
+        """(원본, 정제) 쌍 여러 개를 한 트랜잭션으로 저장"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cleaned_names (raw_name, cleaned_name) VALUES (?, ?)",
+                list(pairs)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """저장된 정제 결과 전체 삭제 (벤치마크의 콜드 캐시 측정용)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM cleaned_names")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ConcurrentNameCleaner:
+    """
+    캐시 미스 요리명을 스레드 풀에서 동시에 정제
+    - 마감 시간(deadline) 안에 끝나지 않은 이름은 규칙 기반 결과를 즉시 반환
+    - 이미 실행 중인 LLM 요청은 끝까지 진행되어 캐시에 저장되고, 아직 시작하지 못한 요청은 취소
+    - 동시에 걸려 있는 요청 수는 max_pending개로 제한 (초과분은 바로 규칙 기반 처리)
+    - 같은 이름이 이미 요청 중이면 새로 보내지 않고 그 요청을 기다림
+    """
+
+    def __init__(self, cleaner, cache, fallback=clean_recipe_name, max_workers=5, max_pending=None):
+        """
+        Args:
+            cleaner: LLMNameCleaner
+            cache: CleanedNameCache
+            fallback: 규칙 기반 정제 함수 (예: RecipeSearcher.clean_recipe_name)
+            max_workers: 동시에 보낼 OpenAI 요청 수
+            max_pending: 실행 중 + 대기 중인 요청 상한 (기본: max_workers * 4)
+        """
+        self.cleaner = cleaner
+        self.cache = cache
+        self.fallback = fallback
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-clean")
+        self._slots = threading.BoundedSemaphore(max_pending or max_workers * 4)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _clean_and_cache(self, raw_name):
+        """LLM 정제 후 성공한 결과만 캐시에 저장 (워커 스레드에서 실행)"""
+        refined = self.cleaner.request(raw_name)
+        if refined is None:
+            return None
+        try:
+            self.cache.put(raw_name, refined)
+        except Exception as e:
+            # 캐시 저장 실패는 이번 결과에 영향 없음
+            print(f"⚠️ 정제 결과 캐시 저장 실패: {e}")
+        return refined
+
+    def _submit(self, raw_name):
+        """요청 중인 future 재사용 또는 새로 제출 (상한 초과 시 None)"""
+        with self._lock:
+            future = self._pending.get(raw_name)
+            if future is not None:
+                return future
+            if not self._slots.acquire(blocking=False):
+                return None
+            future = self.executor.submit(self._clean_and_cache, raw_name)
+            self._pending[raw_name] = future
+        future.add_done_callback(lambda f: self._release(raw_name, f))
+        return future
+
+    def _release(self, raw_name, future):
+        with self._lock:
+            if self._pending.get(raw_name) is future:
+                del self._pending[raw_name]
+        self._slots.release()
+
+    def clean_many(self, raw_names, deadline=None):
+        """
+        여러 요리명을 동시에 정제
+
+        Args:
+            raw_names: 정제할 원본 요리명 리스트 (캐시 미스만 넘기는 것을 권장)
+            deadline: time.perf_counter() 기준 마감 시각 (None이면 모두 끝날 때까지 대기)
+
+        Returns:
+            ({원본: 정제}, {'llm': 성공 수, 'failed': 실패 수, 'timed_out': 마감 초과 수, 'busy': 상한 초과 수})
+        """
+        raw_names = list(dict.fromkeys(raw_names))
+        stats = {'llm': 0, 'failed': 0, 'timed_out': 0, 'busy': 0}
+        if not raw_names:
+            return {}, stats
+
+        cleaned = {}
+        futures = {}
+        for raw_name in raw_names:
+            future = self._submit(raw_name)
+            if future is None:
+                # 밀린 요청이 상한에 도달: 큐에 더 쌓지 않고 규칙 기반 처리
+                stats['busy'] += 1
+                cleaned[raw_name] = self.fallback(raw_name)
+            else:
+                futures[future] = raw_name
+        if stats['busy']:
+            print(f"⚠️ LLM 정제 요청 상한 초과: {stats['busy']}개 규칙 기반 처리")
+
+        timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+        done, not_done = wait(futures, timeout=timeout)
+
+        for future in done:
+            raw_name = futures[future]
+            try:
+                refined = future.result()
+            except Exception as e:
+                print(f"⚠️ LLM 정제 오류: '{raw_name}' ({e})")
+                refined = None
+            if refined is None:
+                stats['failed'] += 1
+                cleaned[raw_name] = self.fallback(raw_name)
+            else:
+                stats['llm'] += 1
+                cleaned[raw_name] = refined
+
+        # 마감 초과: 기다리지 않고 규칙 기반 결과 반환
+        # 아직 시작하지 못한 요청은 취소, 실행 중인 요청은 끝나면 캐시에 저장됨
+        for future in not_done:
+            raw_name = futures[future]
+            future.cancel()
+            stats['timed_out'] += 1
+            print(f"⏱️ LLM 정제 시간 초과: '{raw_name}' -> 규칙 기반 처리")
+            cleaned[raw_name] = self.fallback(raw_name)
+
+        return cleaned, stats
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,278 @@
+"""
+modules.vector_db.openai_embeddings
+작성자: 추윤서
+기능: OpenAI 임베딩 배치/동시 요청 + 레이트 리밋 (VectorDBBuilder용)
+- 요청 1회에 텍스트 여러 개(input 리스트)를 보내고, 동시에 최대 max_workers개 요청
+- 토큰 버킷(요청 수 / 토큰 수) 2개로 전송 속도 제한. 응답의 x-ratelimit-* 헤더로 한도/남은 양을 계속 보정
+  (고정 sleep 대신 실제 계정 한도에 맞춰 속도 조절)
+- 429/5xx/연결 오류는 지수 백오프(+지터)로 재시도, 400(잘못된 입력)은 배치를 반으로 나눠 문제 입력만 실패 처리
+- 401/403/404(API 키 / 권한 / 모델 이름)는 모든 배치가 같은 이유로 실패하므로 바로 예외 전달
+  → 실패한 항목은 0 벡터 대신 None으로 돌려주고 호출 측에서 제외
+"""
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import openai
+
+DEFAULT_MODEL = "text-embedding-3-small"
+
+# 재시도할 오류 (그 외 오류는 배치를 나눠 문제 입력을 찾음)
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+# 모든 배치에서 똑같이 실패하는 설정 오류 (API 키 / 권한 / 모델 이름) → 더 보내지 않고 예외 전달
+FATAL_ERRORS = (
+    openai.AuthenticationError,
+    openai.PermissionDeniedError,
+    openai.NotFoundError,
+)
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+
+
+def parse_reset(value):
+    """x-ratelimit-reset-* 값("1s", "6m0s", "20ms") → 초"""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(str(value))
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def estimate_tokens(text):
+    """토큰 수 추정 (한글은 대략 글자당 1토큰 → 글자 수로 넉넉하게 잡음)"""
+    return max(1, len(text))
+
+
+class TokenBucket:
+    """분당 한도 토큰 버킷 (capacity가 None이면 제한 없음 - 첫 응답 헤더로 설정됨)"""
+
+    def __init__(self, per_minute=None):
+        self._lock = threading.Lock()
+        self.capacity = None
+        self.rate = None
+        self.tokens = 0.0
+        self._updated = time.monotonic()
+        if per_minute:
+            self.set_limit(per_minute)
+
+    def set_limit(self, per_minute):
+        with self._lock:
+            self._refill()
+            first = self.capacity is None
+            self.capacity = float(per_minute)
+            self.rate = self.capacity / 60.0
+            self.tokens = self.capacity if first else min(self.tokens, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.capacity is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1):
+        """토큰이 찰 때까지 대기 후 차감 (한도보다 큰 요청은 버킷이 가득 찼을 때 통과)"""
+        while True:
+            with self._lock:
+                if self.capacity is None:
+                    return 0.0
+                self._refill()
+                needed = min(amount, self.capacity)
+                if self.tokens >= needed:
+                    self.tokens -= amount
+                    return 0.0
+                wait_seconds = (needed - self.tokens) / self.rate
+            time.sleep(min(wait_seconds, 1.0))
+
+    def sync(self, limit=None, remaining=None):
+        """응답 헤더의 한도/남은 양 반영 (로컬 추정보다 서버 값이 적으면 서버 값 사용)"""
+        if limit:
+            if self.capacity != float(limit):
+                self.set_limit(limit)
+        if remaining is not None:
+            with self._lock:
+                if self.capacity is not None:
+                    self._refill()
+                    self.tokens = min(self.tokens, float(remaining))
+
+    def drain(self):
+        """429 응답 시 버킷 비우기 (한도가 다시 찰 때까지 새 요청 대기)"""
+        with self._lock:
+            if self.capacity is not None:
+                self.tokens = 0.0
+                self._updated = time.monotonic()
+
+
+class RateLimiter:
+    """요청 수(RPM) + 토큰 수(TPM) 토큰 버킷"""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def acquire(self, tokens):
+        self.requests.acquire(1)
+        self.tokens.acquire(tokens)
+
+    def update(self, headers):
+        """x-ratelimit-{limit,remaining}-{requests,tokens} 헤더 반영"""
+        def _int(name):
+            value = headers.get(name)
+            try:
+                return int(float(value)) if value is not None else None
+            except ValueError:
+                return None
+
+        self.requests.sync(_int('x-ratelimit-limit-requests'), _int('x-ratelimit-remaining-requests'))
+        self.tokens.sync(_int('x-ratelimit-limit-tokens'), _int('x-ratelimit-remaining-tokens'))
+
+    def drain(self):
+        self.requests.drain()
+        self.tokens.drain()
+
+
+class BatchEmbedder:
+    """텍스트 리스트를 배치/동시 요청으로 임베딩"""
+
+    def __init__(
+        self,
+        client,
+        model=DEFAULT_MODEL,
+        batch_size=100,
+        max_workers=4,
+        max_retries=6,
+        backoff_base=1.0,
+        backoff_max=60.0,
+        requests_per_minute=None,
+        tokens_per_minute=None
+    ):
+        """
+        Args:
+            client: OpenAI 클라이언트 (재시도는 여기서 하므로 SDK 자체 재시도는 끔)
+            batch_size: 요청 1회당 입력 수 (API 최대 2048)
+            max_workers: 동시에 보낼 요청 수
+            max_retries: 배치당 재시도 횟수
+            backoff_base, backoff_max: 지수 백오프 시작/최대 대기(초)
+            requests_per_minute, tokens_per_minute: 초기 한도 (None이면 첫 응답 헤더로 설정)
+        """
+        self.client = client.with_options(max_retries=0)
+        self.model = model
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'rate_limited': 0, 'splits': 0, 'embedded': 0, 'failed': 0}
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    def _backoff(self, attempt, error):
+        """재시도 대기 시간: retry-after 헤더 우선, 없으면 지수 백오프 + 지터"""
+        response = getattr(error, 'response', None)
+        if response is not None:
+            retry_after_ms = response.headers.get('retry-after-ms')
+            retry_after = parse_reset(f"{retry_after_ms}ms") if retry_after_ms \
+                else parse_reset(response.headers.get('retry-after'))
+            if retry_after:
+                return min(retry_after, self.backoff_max)
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    def _request(self, texts):
+        """요청 1회 (레이트 리밋 대기 → 호출 → 헤더로 버킷 보정)"""
+        self.limiter.acquire(sum(estimate_tokens(text) for text in texts))
+        self._count('requests')
+        raw = self.client.embeddings.with_raw_response.create(model=self.model, input=texts)
+        self.limiter.update(raw.headers)
+        response = raw.parse()
+        vectors = [None] * len(texts)
+        for item in response.data:
+            vectors[item.index] = item.embedding
+        return vectors
+
+    def _embed_batch(self, texts):
+        """배치 1개 임베딩 (재시도 / 분할 포함), 실패한 항목은 None"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                vectors = self._request(texts)
+                self._count('embedded', sum(vector is not None for vector in vectors))
+                self._count('failed', sum(vector is None for vector in vectors))
+                return vectors
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, openai.RateLimitError):
+                    self._count('rate_limited')
+                    self.limiter.drain()
+                if attempt == self.max_retries:
+                    print(f"❌ 임베딩 재시도 초과 ({len(texts)}개): {e}")
+                    break
+                self._count('retries')
+                time.sleep(self._backoff(attempt, e))
+            except FATAL_ERRORS as e:
+                print(f"❌ 임베딩 설정 오류 - 중단합니다: {e}")
+                raise
+            except openai.BadRequestError as e:
+                # 입력 문제 (너무 긴 입력 등) → 반으로 나눠 문제 입력만 실패 처리
+                if len(texts) == 1:
+                    print(f"❌ 임베딩 실패: {e}")
+                    break
+                self._count('splits')
+                middle = len(texts) // 2
+                return self._embed_batch(texts[:middle]) + self._embed_batch(texts[middle:])
+            except Exception as e:
+                # 그 밖의 오류는 나눠도 같은 결과 → 배치 전체를 한 번만 실패 처리 (다음 빌드에서 다시 시도)
+                print(f"❌ 임베딩 실패 ({len(texts)}개): {e}")
+                break
+        self._count('failed', len(texts))
+        return [None] * len(texts)
+
+    def embed_batches(self, texts):
+        """
+        배치가 끝나는 순서대로 (시작 위치, 벡터 리스트) 반환 (진행 중 요청 수는 max_workers x 2로 제한)
+
+        Yields:
+            (start, vectors) - vectors[i]는 texts[start + i]의 임베딩 또는 None(실패)
+        """
+        starts = iter(range(0, len(texts), self.batch_size))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {}
+
+            def _submit():
+                start = next(starts, None)
+                if start is None:
+                    return False
+                future = executor.submit(self._embed_batch, texts[start:start + self.batch_size])
+                pending[future] = start
+                return True
+
+            for _ in range(self.max_workers * 2):
+                if not _submit():
+                    break
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start = pending.pop(future)
+                    yield start, future.result()
+                    _submit()
+
+    def embed(self, texts):
+        """전체 텍스트 임베딩 (입력 순서 유지, 실패한 항목은 None)"""
+        vectors = [None] * len(texts)
+        for start, batch in self.embed_batches(texts):
+            vectors[start:start + len(batch)] = batch
+        return vectors
@@ -0,0 +1,108 @@
+"""
+추윤서
+# 요리명 LLM 정제 결과 미리 계산 (인덱싱 시 1회 실행)
+# 컬렉션 전체 요리명을 gpt-4o-mini로 정제하여 메타데이터(llm_name)와 로컬 캐시에 저장
+# → 검색 시에는 이미 알고 있는 레시피에 대해 LLM을 호출하지 않음
+
+실행: python -m modules.vector_db.precompute_names [--force]
+"""
+import argparse
+import os
+
+import chromadb
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from modules.vector_db.collection_alias import resolve_collection
+from modules.vector_db.name_cleaner import CleanedNameCache, LLMNameCleaner
+
+load_dotenv()
+
+DB_PATH = "./modules/vector_db/vectordb_recipes"
+COL_NAME = "recipes_local_cosine"
+
+
+def precompute_clean_names(collection, cleaner, cache, page_size=500, force=False):
+    """
+    컬렉션의 모든 요리명을 정제하여 메타데이터 'llm_name'에 기록
+
+    Args:
+        collection: Chroma 컬렉션
+        cleaner: LLMNameCleaner
+        cache: CleanedNameCache (캐시 히트면 LLM 호출 생략)
+        page_size: 한 번에 읽고 갱신할 레코드 수
+        force: 이미 llm_name이 있는 레코드도 다시 계산
+
+    Returns:
+        {'total', 'updated', 'cache_hits', 'llm_calls', 'failed'}
+    """
+    stats = {'total': 0, 'updated': 0, 'cache_hits': 0, 'llm_calls': 0, 'failed': 0}
+    resolved = {}
+
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+
+        update_ids, update_metadatas, new_pairs = [], [], []
+        for recipe_id, metadata in zip(page['ids'], page['metadatas']):
+            stats['total'] += 1
+            raw_name = (metadata or {}).get('name')
+            if not raw_name or (metadata.get('llm_name') and not force):
+                continue
+
+            if raw_name not in resolved:
+                cleaned = cache.get(raw_name)
+                if cleaned:
+                    stats['cache_hits'] += 1
+                else:
+                    stats['llm_calls'] += 1
+                    cleaned = cleaner.request(raw_name)
+                    if cleaned:
+                        new_pairs.append((raw_name, cleaned))
+                resolved[raw_name] = cleaned
+
+            if resolved[raw_name] is None:
+                stats['failed'] += 1
+                continue
+
+            update_ids.append(recipe_id)
+            update_metadatas.append({'llm_name': resolved[raw_name]})
+
+        # 페이지 단위로 캐시/메타데이터 일괄 반영 (update는 기존 메타데이터에 병합됨)
+        if new_pairs:
+            cache.put_many(new_pairs)
+        if update_ids:
+            collection.update(ids=update_ids, metadatas=update_metadatas)
+            stats['updated'] += len(update_ids)
+
+        offset += len(page['ids'])
+        print(f"✅ {offset}개 확인 (갱신 {stats['updated']}개, LLM 호출 {stats['llm_calls']}회)")
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="요리명 LLM 정제 결과 미리 계산")
+    parser.add_argument("--db-path", default=DB_PATH)
+    parser.add_argument("--collection", default=COL_NAME)
+    parser.add_argument("--force", action="store_true", help="이미 계산된 llm_name도 다시 계산")
+    args = parser.parse_args()
+
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        print("❌ OPENAI_API_KEY가 필요합니다")
+        return
+
+    client = chromadb.PersistentClient(path=args.db_path)
+    collection = resolve_collection(client, args.db_path, args.collection)
+    cache = CleanedNameCache(os.path.join(args.db_path, "cleaned_names.sqlite3"))
+
+    print(f"🚀 '{args.collection}' 요리명 정제 시작... (캐시 {len(cache)}개)")
+    stats = precompute_clean_names(collection, LLMNameCleaner(OpenAI(api_key=api_key)), cache, force=args.force)
+    print(f"✨ 완료! {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+modules.vector_db.query_cache
+작성자: 추윤서
+기능: 쿼리 임베딩용 크기 제한 LRU 캐시 (히트/미스 카운터 포함)
+- 같은 냉장고 재료 조합(순서만 다른 경우 포함)은 모델을 다시 돌리지 않음
+"""
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """크기 제한 LRU 캐시 (스레드 안전)"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """캐시 조회 (없으면 None) - 조회된 항목은 가장 최근으로 이동"""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """저장 후 크기를 넘으면 가장 오래된 항목부터 제거"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """히트/미스 통계"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
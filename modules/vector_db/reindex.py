@@ -4,48 +4,420 @@
 # 기존 DB (1536차원) -> 로컬 모델(768차원) 으로 다시 임베딩
 
 # 거리 측정 방식 : 코사인 유사도
+
+# 큰 배치로 인코딩 (선택: 프로세스 풀로 모든 CPU 코어 사용) + 배치마다 add 한 번으로 일괄 저장
+# 기존 컬렉션은 limit/offset 페이지로 스트리밍 (읽기 스레드 → 인코딩 → 쓰기 스레드, 크기 제한 큐로 메모리 일정)
+# 진행률 / 처리량(개/s) / 남은 시간 출력
+# 무중단 교체: 새 버전 컬렉션(recipes_local_cosine__v<시각>)에 만든 뒤 별칭만 교체 → 실행 중인 검색기는 다음 쿼리부터 새 버전
+#             이전 버전은 --keep개만 남기고 삭제 (collection_alias.py 참고)
+실행: python -m modules.vector_db.reindex [--batch-size 256] [--workers 4]
 """
+import argparse
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import chromadb
-import json
-from sentence_transformers import SentenceTransformer
+import numpy as np
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from modules.vector_db.collection_alias import KEEP_PREVIOUS, CollectionAliases, versioned_name
+from modules.vector_db.embedding_cache import DEFAULT_DIR as EMBEDDING_CACHE_DIR, EmbeddingCache
+from modules.vector_db.encoders import MODEL_NAME, load_encoder
+from modules.vector_db.hnsw import hnsw_metadata
+from modules.vector_db.incremental import HASH_KEY, content_hash
+from modules.vector_db.metadata_store import numeric_metadata
+from modules.vector_db.name_cleaner import CleanedNameCache, LLMNameCleaner
+from modules.vector_db.precompute_names import precompute_clean_names
+
+load_dotenv()
 
 # 1. 설정
 DB_PATH = "./modules/vector_db/vectordb_recipes"
+OLD_COL_NAME = "recipes_1000"
 NEW_COL_NAME = "recipes_local_cosine"
 
-model = SentenceTransformer('jhgan/ko-sroberta-multitask')
-client = chromadb.PersistentClient(path=DB_PATH)
-
-# 2. 기존 데이터 (recipes_1000)
-old_col = client.get_collection(name="recipes_1000")
-all_data = old_col.get()
-
-# 3. 초기화
-try:
-    client.delete_collection(NEW_COL_NAME)
-except:
-    pass
-
-# 4. 새 컬렉션 생성 (거리 측정 방식을 'cosine'으로)
-new_col = client.create_collection(
-    name=NEW_COL_NAME,
-    metadata={"hnsw:space": "cosine"} # 코사인 유사도 사용 설정
-)
-
-# 5. 재임베딩 및 저장
-print(f"🚀 {NEW_COL_NAME} 컬렉션 생성 및 재색인 시작...")
-for i in range(len(all_data['ids'])):
-    metadata = all_data['metadatas'][i]
-    text_to_embed = f"요리명: {metadata['name']}, 재료: {metadata['ingredients']}"
-    
-    vector = model.encode(text_to_embed).tolist()
-    
-    new_col.add(
-        embeddings=[vector],
-        metadatas=[metadata],
-        ids=[all_data['ids'][i]]
+# HNSW 파라미터: 환경변수 HNSW_M / HNSW_CONSTRUCTION_EF / HNSW_SEARCH_EF (없으면 Chroma 기본값)
+# 레시피가 많아지면 python -m modules.vector_db.tune_hnsw 로 recall/지연을 비교해 고르세요
+HNSW_PARAMS = {
+    key: int(os.getenv(env)) if os.getenv(env) else None
+    for key, env in (("M", "HNSW_M"), ("construction_ef", "HNSW_CONSTRUCTION_EF"), ("search_ef", "HNSW_SEARCH_EF"))
+}
+
+# 배치 크기 / 인코딩 프로세스 수: 환경변수 REINDEX_BATCH_SIZE / REINDEX_WORKERS (1이면 현재 프로세스에서 인코딩)
+BATCH_SIZE = int(os.getenv('REINDEX_BATCH_SIZE', '256'))
+WORKERS = int(os.getenv('REINDEX_WORKERS', '1'))
+
+
+def embedding_text(metadata):
+    return f"요리명: {metadata['name']}, 재료: {metadata['ingredients']}"
+
+
+# ============ 인코딩 (프로세스 풀) ============
+
+_worker_model = None
+
+
+def _init_worker(backend, threads):
+    """워커 프로세스마다 인코더를 한 번 로드 (코어를 워커끼리 나눠 씀)"""
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_model = load_encoder(backend)
+
+
+def _encode_in_worker(texts, batch_size):
+    return _worker_model.encode(texts, batch_size=batch_size)
+
+
+class BatchEncoder:
+    """
+    텍스트 배치 인코딩 (캐시 미스만 인코딩, 결과는 입력 배치 순서대로)
+    - workers <= 1: 현재 프로세스에서 model.encode
+    - workers > 1: spawn 프로세스 풀에 배치를 미리 여러 개 보내 두고 순서대로 받음 (인코딩과 저장이 겹침)
+    """
+
+    def __init__(self, backend=None, workers=1, cache=None, encode_batch_size=64):
+        self.backend = backend or os.getenv('ENCODER_BACKEND', 'torch')
+        self.workers = max(1, workers)
+        self.cache = cache
+        self.encode_batch_size = encode_batch_size
+        self.cache_key = f"{MODEL_NAME}:{self.backend}"
+        self.encoded = 0
+        self.executor = None
+        self.model = None
+        if self.workers > 1:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.backend, threads),
+            )
+        else:
+            self.model = load_encoder(self.backend)
+
+    def _submit(self, texts):
+        """(캐시 결과, 미스 텍스트, 인코딩 future 또는 결과)"""
+        cached = self.cache.get_many(self.cache_key, texts) if self.cache is not None else [None] * len(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        if not missing:
+            return cached, missing, None
+        if self.executor is not None:
+            # 워커 수만큼 나눠 보내 배치 하나도 모든 코어에서 인코딩
+            step = -(-len(missing) // self.workers)
+            futures = [
+                self.executor.submit(_encode_in_worker, missing[i:i + step], self.encode_batch_size)
+                for i in range(0, len(missing), step)
+            ]
+            return cached, missing, futures
+        return cached, missing, [self.model.encode(missing, batch_size=self.encode_batch_size)]
+
+    def _collect(self, texts, cached, missing, pending):
+        if missing:
+            parts = [part.result() if hasattr(part, 'result') else part for part in pending]
+            vectors = [vector for part in parts for vector in part]
+            if self.cache is not None:
+                self.cache.put_many(self.cache_key, missing, vectors)
+            by_text = dict(zip(missing, vectors))
+            cached = [by_text[text] if vector is None else vector for text, vector in zip(texts, cached)]
+            self.encoded += len(missing)
+        return cached
+
+    def encode_batches(self, batches, prefetch=2):
+        """
+        Args:
+            batches: 텍스트 리스트의 iterable
+            prefetch: 결과를 기다리는 동안 미리 보내 둘 배치 수 (프로세스 풀일 때)
+
+        Yields:
+            배치 순서대로 벡터 리스트
+        """
+        queue = deque()
+        ahead = prefetch if self.executor is not None else 0
+        for texts in batches:
+            queue.append((texts, *self._submit(texts)))
+            while len(queue) > ahead:
+                yield self._collect(*queue.popleft())
+        while queue:
+            yield self._collect(*queue.popleft())
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+class ProgressReporter:
+    """진행률 / 처리량 / 남은 시간 출력"""
+
+    def __init__(self, total, label="재색인", interval=2.0):
+        self.total = total
+        self.label = label
+        self.interval = interval
+        self.done = 0
+        self.start = time.perf_counter()
+        self._last_print = 0.0
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.start
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def update(self, count):
+        self.done += count
+        now = time.perf_counter()
+        if now - self._last_print < self.interval and self.done < self.total:
+            return
+        self._last_print = now
+        rate = self.rate()
+        eta = (self.total - self.done) / rate if rate > 0 else 0.0
+        print(f"✅ {self.label} {self.done}/{self.total} ({rate:.0f}개/s, 남은 시간 {eta:.0f}s)")
+
+
+# ============ 스트리밍 파이프라인 (읽기 → 인코딩 → 쓰기) ============
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+_DONE = object()
+
+
+def iter_pages(collection, page_size):
+    """limit/offset 페이지 단위로 (ids, metadatas) 읽기 (전체를 한 번에 메모리에 올리지 않음)"""
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        if not page['ids']:
+            return
+        yield page['ids'], page['metadatas']
+        offset += len(page['ids'])
+
+
+def background(iterable, maxsize=2):
+    """iterable을 별도 스레드에서 미리 읽어 크기 제한 큐로 넘기는 generator (읽기 I/O와 인코딩이 겹침)"""
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run():
+        try:
+            for item in iterable:
+                if not _put(item):
+                    return
+            _put(_DONE)
+        except BaseException as e:
+            _put(_Failure(e))
+
+    thread = threading.Thread(target=_run, name="reindex-reader", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+
+
+class BackgroundWriter:
+    """크기 제한 큐에서 배치를 꺼내 add (쓰기가 밀리면 submit이 대기 → 메모리 제한)"""
+
+    def __init__(self, collection, maxsize=2, on_written=None):
+        self.collection = collection
+        self.on_written = on_written
+        self.error = None
+        self._items = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, name="reindex-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._items.get()
+            if item is _DONE:
+                return
+            if self.error is not None:
+                continue
+            ids, vectors, metadatas = item
+            try:
+                self.collection.add(
+                    embeddings=np.asarray(vectors, dtype=np.float32),
+                    metadatas=metadatas,
+                    ids=ids
+                )
+                if self.on_written:
+                    self.on_written(len(ids))
+            except Exception as e:
+                self.error = e
+
+    def submit(self, ids, vectors, metadatas):
+        if self.error is not None:
+            raise self.error
+        self._items.put((ids, vectors, metadatas))
+
+    def close(self):
+        """남은 배치를 모두 쓴 뒤 종료 (쓰기 오류가 있었으면 다시 발생)"""
+        self._items.put(_DONE)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+def prepare_page(metadatas):
+    """페이지 메타데이터 보강 후 임베딩 텍스트 반환"""
+    texts = []
+    for metadata in metadatas:
+        # 필터 검색용 숫자형 필드 추가 (cooking_time_minutes 등, 기존 컬렉션에 없던 경우)
+        metadata.update(numeric_metadata(metadata))
+        text = embedding_text(metadata)
+        metadata[HASH_KEY] = content_hash(text)
+        texts.append(text)
+    return texts
+
+
+# ============ 재색인 ============
+
+def reindex(client, old_name=OLD_COL_NAME, new_name=NEW_COL_NAME, batch_size=BATCH_SIZE, encoder=None,
+            queue_size=2):
+    """
+    기존 컬렉션 레시피를 로컬 모델로 다시 임베딩해 새 코사인 컬렉션에 저장
+    - 읽기(페이지) / 인코딩 / 쓰기를 크기 제한 큐로 연결해 동시에 진행 → 메모리는 배치 몇 개 분량으로 일정
+
+    Args:
+        encoder: BatchEncoder
+        queue_size: 읽기 → 인코딩, 인코딩 → 쓰기 사이 큐에 쌓아 둘 최대 배치 수
+
+    Returns:
+        {'total', 'encoded', 'seconds', 'per_second', 'collection'}
+    """
+    # 2. 기존 데이터 (recipes_1000) - 페이지 단위로 스트리밍
+    old_col = client.get_collection(name=old_name)
+    total = old_col.count()
+
+    # 3. 초기화 (같은 이름이 남아 있으면 삭제 - 보통은 새 버전 이름이라 없음)
+    try:
+        client.delete_collection(new_name)
+    except Exception:
+        pass
+
+    # 4. 새 컬렉션 생성 (거리 측정 방식을 'cosine'으로)
+    new_col = client.create_collection(
+        name=new_name,
+        metadata=hnsw_metadata("cosine", **HNSW_PARAMS) # 코사인 유사도 사용 설정
+    )
+
+    # 5. 재임베딩 및 저장 (배치 단위 인코딩 + 일괄 add)
+    # Chroma 한 번의 add 최대 크기를 넘지 않게
+    batch_size = min(batch_size, client.get_max_batch_size())
+    progress = ProgressReporter(total)
+    print(f"🚀 {new_name} 컬렉션 생성 및 재색인 시작... ({total}개, 배치 {batch_size}, 워커 {encoder.workers})")
+
+    # 인코딩 중인 페이지의 ids/metadatas (encode_batches는 입력 순서대로 결과를 돌려줌)
+    in_flight = deque()
+
+    def page_texts():
+        for ids, metadatas in background(iter_pages(old_col, batch_size), maxsize=queue_size):
+            texts = prepare_page(metadatas)
+            in_flight.append((ids, metadatas))
+            yield texts
+
+    writer = BackgroundWriter(new_col, maxsize=queue_size, on_written=progress.update)
+    try:
+        for vectors in encoder.encode_batches(page_texts()):
+            ids, metadatas = in_flight.popleft()
+            writer.submit(ids, vectors, metadatas)
+    finally:
+        writer.close()
+
+    seconds = time.perf_counter() - progress.start
+    return {
+        'total': progress.done,
+        'encoded': encoder.encoded,
+        'seconds': round(seconds, 2),
+        'per_second': round(progress.rate(), 1),
+        'collection': new_col,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 모델로 레시피 재색인")
+    parser.add_argument("--db-path", default=DB_PATH)
+    parser.add_argument("--source", default=OLD_COL_NAME, help="기존 컬렉션")
+    parser.add_argument("--target", default=NEW_COL_NAME, help="새 코사인 컬렉션 별칭 (실제 컬렉션은 별칭__v<시각>)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="읽기/인코딩/저장 배치 크기")
+    parser.add_argument("--queue-size", type=int, default=2, help="단계 사이 큐에 쌓아 둘 최대 배치 수")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="인코딩 프로세스 수 (0이면 CPU 코어 수)")
+    parser.add_argument("--encoder", default=None, help="인코더 백엔드 (기본: 환경변수 ENCODER_BACKEND)")
+    parser.add_argument("--no-cache", action="store_true", help="임베딩 캐시 사용 안 함")
+    parser.add_argument("--keep", type=int, default=KEEP_PREVIOUS, help="교체 후 남겨 둘 이전 버전 수")
+    args = parser.parse_args()
+
+    # 인코더 백엔드: 환경변수 ENCODER_BACKEND ("torch" 기본, "onnx-int8")
+    # 임베딩 캐시: 환경변수 EMBEDDING_CACHE_DIR (텍스트가 그대로면 인코딩 없이 캐시에서 읽음)
+    embedding_cache = None if args.no_cache else EmbeddingCache(os.getenv('EMBEDDING_CACHE_DIR', EMBEDDING_CACHE_DIR))
+    encoder = BatchEncoder(
+        backend=args.encoder,
+        workers=args.workers or os.cpu_count() or 1,
+        cache=embedding_cache,
     )
-    if (i+1) % 200 == 0:
-        print(f"✅ {i+1}개 완료...")
+    client = chromadb.PersistentClient(path=args.db_path)
+    aliases = CollectionAliases(args.db_path)
+    version = versioned_name(args.target)
+    try:
+        stats = reindex(client, args.source, version, args.batch_size, encoder, queue_size=args.queue_size)
+        new_col = stats.pop('collection')
+
+        # 6. 요리명 LLM 정제 결과 미리 계산 (검색 시 LLM 호출 제거) - 교체 전에 새 버전을 완성
+        if os.getenv('OPENAI_API_KEY'):
+            print("🪄 요리명 정제 결과를 메타데이터에 미리 저장합니다...")
+            precompute_clean_names(
+                new_col,
+                LLMNameCleaner(OpenAI(api_key=os.getenv('OPENAI_API_KEY'))),
+                CleanedNameCache(os.path.join(args.db_path, "cleaned_names.sqlite3"))
+            )
+        else:
+            print("⚠️ OPENAI_API_KEY not found - 요리명 정제는 'python -m modules.vector_db.precompute_names'로 나중에 실행하세요")
+    except BaseException:
+        # 만들다 만 버전은 버림 (별칭은 그대로 → 검색은 기존 버전으로 계속)
+        print(f"❌ 재색인 실패 - '{version}' 삭제, '{args.target}'은 기존 버전 유지")
+        try:
+            client.delete_collection(version)
+        except Exception:
+            pass
+        raise
+    finally:
+        encoder.close()
+
+    # 7. 별칭 교체 (원자적) + 이전 버전 정리
+    previous = aliases.switch(args.target, version)
+    print(f"🔁 '{args.target}': '{previous}' → '{version}' (실행 중인 검색기는 다음 쿼리부터 새 버전 사용)")
+    deleted = aliases.garbage_collect(client, args.target, keep=args.keep)
+    if deleted:
+        print(f"🧹 이전 버전 삭제: {deleted}")
+
+    print(f"✨ 완료! {stats}")
+    if embedding_cache is not None:
+        print(f"💾 임베딩 캐시: {embedding_cache.stats()}")
+
 
-print(f"✨ 완료! 이제 search.py에서 '{NEW_COL_NAME}'을 사용하세요.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -2,159 +2,475 @@
 modules.vector_db.search
 작성자: 추윤서
 기능: 자취생/1인 가구 맞춤형 레시피 정제 및 중복 제거 검색 엔진
+- chromadb / sentence_transformers / openai는 warmup()에서 지연 import (모듈 import는 가벼움)
+- 컬렉션은 별칭(collection_alias.py)을 따라 로드하고, 재색인으로 별칭이 바뀌면 재시작 없이 새 버전으로 교체
 """
-import chromadb
-import json
 import re
 import os
-from sentence_transformers import SentenceTransformer
+import threading
+import time
+import numpy as np
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from modules.vector_db.backends import create_backend
+from modules.vector_db.collection_alias import CollectionAliases
+from modules.vector_db.encoders import load_encoder
+from modules.vector_db.filters import RecipeFilters
+from modules.vector_db.hnsw import default_search_ef
+from modules.vector_db.ingredient_vectors import (
+    DEFAULT_DIR as INGREDIENT_VECTORS_DIR,
+    IngredientVectorTable,
+    build_query_text,
+)
+from modules.vector_db.metadata_store import RecipeMetadataStore
+from modules.vector_db.metrics import QueryTrace, get_registry
+from modules.vector_db.query_cache import LRUCache
+from modules.vector_db.name_cleaner import (
+    CleanedNameCache,
+    ConcurrentNameCleaner,
+    LLMNameCleaner,
+    clean_recipe_name,
+)
 
 load_dotenv()
 
+# 검색기가 따라가는 컬렉션 별칭 (reindex.py가 새 버전을 만든 뒤 교체)
+COLLECTION_ALIAS = "recipes_local_cosine"
+# 컬렉션 교체가 실패했을 때 다시 시도하기까지 기다리는 시간(초)
+SWAP_RETRY_SECONDS = 5.0
+
 class RecipeSearcher:
-    def __init__(self, db_path="./modules/vector_db/vectordb_recipes"):
+    def __init__(
+        self,
+        db_path="./modules/vector_db/vectordb_recipes",
+        name_cache_path=None,
+        openai_client=None,
+        latency_budget=3.0,
+        llm_workers=5,
+        embedding_cache_size=1024,
+        query_mode="model",
+        compose_mode="mean",
+        ingredient_vectors_path=INGREDIENT_VECTORS_DIR,
+        backend="chroma",
+        numpy_index_path=None,
+        background_warmup=False,
+        warmup_wait=0.0,
+        encoder=None,
+        overfetch_steps=(4, 15, 40),
+        metrics=None,
+        hnsw_search_ef=None,
+        backend_options=None
+    ):
         """
         초기화: 로컬 임베딩 모델 로드 및 ChromaDB 연결
+
+        Args:
+            openai_client: 직접 주입할 OpenAI 클라이언트 (로컬 스텁 테스트용)
+            latency_budget: 검색 1회의 전체 지연 시간 예산(초). 넘기면 LLM 정제 대신 규칙 기반 사용
+            llm_workers: 동시에 보낼 LLM 정제 요청 수
+            embedding_cache_size: 쿼리 임베딩 LRU 캐시 크기 (재료 조합 단위)
+            query_mode: "model"(SentenceTransformer 인코딩) 또는 "composed"(재료별 벡터 합성, 모델 호출 없음)
+            compose_mode: 합성 방식 ("mean" 또는 "delta", ingredient_vectors.py 참고)
+            ingredient_vectors_path: 재료별 임베딩 테이블 경로
+            backend: 벡터 검색 백엔드 ("chroma", "numpy", "ivf"(압축 인덱스, 대용량용), backends.py 참고)
+            numpy_index_path: NumPy 백엔드 인덱스 경로 (기본: db_path/numpy_index)
+            background_warmup: True면 모델/DB 로드를 백그라운드 스레드에서 진행하고 바로 반환
+            warmup_wait: 워밍업 중 들어온 검색이 모델 로드를 기다리는 최대 시간(초).
+                         넘기면 키워드 매칭만으로 순위를 매김
+            encoder: 쿼리 인코더 백엔드 ("torch" 또는 "onnx-int8", None이면 환경변수 ENCODER_BACKEND, encoders.py 참고)
+                     또는 encode()를 가진 인코더 객체 (벤치마크용 인코더 주입)
+            overfetch_steps: 후보 추출 배수 단계 (n_results x 배수). 첫 단계로 조회한 뒤
+                             다양성 필터 후 n_results개가 안 되는 쿼리만 다음 단계로 넓혀 다시 조회
+            metrics: 검색 계측 싱크 (metrics.py 참고, 기본: 프로세스 공용 MetricsRegistry)
+            hnsw_search_ef: Chroma 백엔드 HNSW 탐색 폭 (클수록 recall 증가/지연 증가).
+                            None이면 컬렉션 메타데이터의 튜닝 결과(tune_hnsw.py) 또는 생성 시 값 사용
+            backend_options: ivf 백엔드 설정 dict (kind "pq"/"sq8", nlist, m, nprobe, shortlist)
         """
+        self.db_path = db_path
+        self.latency_budget = latency_budget
+        self.warmup_wait = warmup_wait
+        self._openai_client_override = openai_client
+        self._query_mode = query_mode
+        self._ingredient_vectors_path = ingredient_vectors_path
+        self._backend_name = backend
+        self._backend_options = backend_options
+        self._numpy_index_path = numpy_index_path or os.path.join(db_path, "numpy_index")
+        self._encoder_backend = encoder
+        self.hnsw_search_ef = hnsw_search_ef
+        self._hnsw_search_ef_override = hnsw_search_ef
+        self.overfetch_steps = tuple(overfetch_steps)
+        self.metrics = metrics if metrics is not None else get_registry()
+
+        # 워밍업 전에도 바로 쓸 수 있는 가벼운 구성요소
+        self.model = None
+        self.openai_client = None
+        self.ingredient_table = None
+        self.compose_mode = compose_mode
+
+        # 정렬된 재료 조합 → 쿼리 임베딩 (같은 재료를 순서만 바꿔 입력해도 재사용)
+        self.embedding_cache = LRUCache(maxsize=embedding_cache_size)
+
+        # 요리명 정제 결과 영구 캐시 (원본 요리명 → 정제된 요리명)
+        self.llm_cleaner = LLMNameCleaner(None)
+        self.name_cache = CleanedNameCache(name_cache_path or os.path.join(db_path, "cleaned_names.sqlite3"))
+        self.name_pool = ConcurrentNameCleaner(
+            self.llm_cleaner, self.name_cache, self.clean_recipe_name, max_workers=llm_workers
+        )
+
+        # 메타데이터 사이드 스토어 (재료 JSON 파싱/이름 정제를 로드 시 한 번만 수행)
+        self.metadata_store = RecipeMetadataStore(name_cleaner=self.clean_recipe_name, db_path=db_path)
+
+        # 적응형 후보 추출 누적 통계 (fetch_stats() 참고)
+        self.last_fetch_stats = []
+        self._fetch_totals = {'queries': 0, 'fetched': 0, 'scored': 0, 'rejected': 0, 'widened': 0, 'short': 0}
+        self._stats_lock = threading.Lock()
+
+        # NumPy 백엔드 필터용: 백엔드 행 → 스토어 행 매핑 캐시 ((키, 매핑) 한 번에 교체)
+        self._backend_rows = (None, None)
+        self._warned_unindexed = False
+
+        # 컬렉션 별칭: 파일 mtime이 바뀌면 새 버전을 백그라운드에서 로드해 교체
+        # 같은 컬렉션의 내용이 바뀌어도 새 스토어/백엔드를 백그라운드에서 만든 뒤 교체 (한 번에 하나만)
+        self.aliases = CollectionAliases(db_path)
+        self._alias_mtime = None
+        self._swap_lock = threading.Lock()
+        self._swap_thread = None
+        self._swap_retry_at = 0.0
+        self.collection_swaps = 0
+        self.collection_refreshes = 0
+
+        # 워밍업 상태: 인덱스(DB+메타데이터+백엔드) 준비 / 모델 준비 / 첫 실패 (검색 시 예외로 전달)
+        self.startup_timings = {}
+        self.warmup_error = None
+        self._index_ready = threading.Event()
+        self._model_ready = threading.Event()
+        self._warmup_thread = None
 
-        # 1. HuggingFace의 한국어 특화 모델 (768차원)
-        self.model = SentenceTransformer('jhgan/ko-sroberta-multitask', device='cpu')
+        self.warmup(background=background_warmup)
 
-        # 2. OpenAI API 설정
+    # ============ 워밍업 ============
+
+    def _timed_phase(self, name, func, optional=False):
+        """
+        워밍업 단계 실행 + 소요 시간 기록 (실패해도 다음 단계 진행)
+        optional이 아닌 단계의 첫 실패는 warmup_error에 기록 → 검색 시 예외로 전달
+        """
+        start = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            print(f"❌ 워밍업 단계 실패 [{name}]: {e}")
+            if not optional and self.warmup_error is None:
+                self.warmup_error = e
+        finally:
+            self.startup_timings[name] = round(time.perf_counter() - start, 3)
+
+    def _connect_openai(self):
+        # OpenAI API 설정
         api_key = os.getenv('OPENAI_API_KEY')
-        if api_key:
-            self.openai_client = OpenAI(api_key=api_key)
+        if self._openai_client_override is not None:
+            self.openai_client = self._openai_client_override
+        elif api_key:
+            from openai import OpenAI
+
+            # 마감 초과 후에도 백그라운드 요청이 워커를 오래 붙잡지 않도록 타임아웃 제한
+            self.openai_client = OpenAI(api_key=api_key, timeout=10.0, max_retries=1)
             print("✅ OpenAI API 연결 완료")
         else:
             print("⚠️ OPENAI_API_KEY not found - LLM 정제 기능이 제한됩니다")
             self.openai_client = None
+        self.llm_cleaner.client = self.openai_client
+
+    def _connect_chroma(self):
+        import chromadb
 
-        # 3. ChromaDB 클라이언트 연결
-        self.client = chromadb.PersistentClient(path=db_path)
+        # ChromaDB 클라이언트 연결
+        self.client = chromadb.PersistentClient(path=self.db_path)
 
-        # 4. 컬렉션 로드
+        # 컬렉션 로드 (별칭이 가리키는 현재 버전)
         try:
-            self.collection = self.client.get_collection(name="recipes_local_cosine")
-            print(f"✅ 'recipes_local_cosine' 컬렉션 로드 완료. (데이터: {self.collection.count()}개)")
+            self._alias_mtime = self.aliases.mtime()
+            name = self.aliases.resolve(COLLECTION_ALIAS)
+            self.collection = self.client.get_collection(name=name)
+            print(f"✅ '{name}' 컬렉션 로드 완료. (데이터: {self.collection.count()}개)")
         except Exception as e:
             print(f"❌ 컬렉션 로드 실패: {e}")
-    
-    def clean_with_llm(self, raw_name):
-        """OpenAI API를 사용하여 환각 현상을 방지하고 핵심 요리명만 정확히 추출"""
-        
-        # OpenAI를 사용할 수 없으면 규칙 기반으로 대체
-        if self.openai_client is None:
-            print(f"⚠️ OpenAI 미사용: '{raw_name}' -> 규칙 기반 처리")
-            return self.clean_recipe_name(raw_name)
-        
-        # OpenAI API용 프롬프트 (더 명확한 지시사항)
-        prompt = f"""레시피 제목에서 핵심 요리명만 추출하세요.
+            # 별칭 mtime을 비워 두면 이후 쿼리에서 교체(로드)를 다시 시도 (check_collection_version)
+            self._alias_mtime = None
+
+    def _load_metadata_store(self):
+        # 메타데이터 사이드 스토어 로드
+        if hasattr(self, 'collection'):
+            self.metadata_store = self.metadata_store.reloaded(self.collection)
+
+    def _load_backend(self):
+        # 벡터 검색 백엔드 (기본: Chroma HNSW, 선택: NumPy 정확 검색)
+        if hasattr(self, 'collection'):
+            if self.hnsw_search_ef is None:
+                self.hnsw_search_ef = default_search_ef(self.collection)
+            self.backend = create_backend(
+                self._backend_name, self.collection, self._backend_index_path(self.collection.name),
+                search_ef=self.hnsw_search_ef, options=self._backend_options, db_path=self.db_path
+            )
+            print(f"✅ 검색 백엔드: {self.backend.name}")
 
-제거할 것:
-- 숫자, 날짜, 에피소드 번호
-- 수식어(맛있는, 간단한, 아삭한, 입맛돋구는 등)
-- 조리방법 관련 단어(만드는법, 레시피, 만들기, 황금레시피 등)
-- 특수문자(!,.,.. 등)
+    def _backend_index_path(self, collection_name):
+        # 버전 컬렉션은 버전별 NumPy 인덱스 (교체 중에도 이전 버전 인덱스 파일을 덮어쓰지 않음)
+        if collection_name == COLLECTION_ALIAS:
+            return self._numpy_index_path
+        return os.path.join(self._numpy_index_path, collection_name)
 
-예시:
-입력: [176.오트밀과일빵(2025.11.7)]
-출력: 오트밀과일빵
+    # ============ 컬렉션 버전 교체 ============
 
-입력: [[만개백과] EP. 18 가끔 생각나는 야채샐러드빵]
-출력: 야채샐러드빵
+    def check_collection_version(self):
+        """
+        별칭 파일이 바뀌었으면 새 버전 로드를 백그라운드로 시작 (쿼리마다 호출, 평소에는 stat 한 번)
+        - 로드가 끝날 때까지 현재 버전으로 계속 검색
+        - 교체가 실패하면 별칭 mtime을 되돌려 SWAP_RETRY_SECONDS 뒤 쿼리에서 다시 시도
 
-입력: [에어프라이어 요리 양파햄치즈빵 만드는 법 너무 맛있잖아]
-출력: 양파햄치즈빵
+        Returns:
+            교체 스레드 (새로 시작하지 않았으면 None)
+        """
+        mtime = self.aliases.mtime()
+        if mtime == self._alias_mtime or time.monotonic() < self._swap_retry_at:
+            return None
+        with self._swap_lock:
+            if mtime == self._alias_mtime or self._background_busy():
+                return None
+            previous = self._alias_mtime
+            self._alias_mtime = mtime
+            return self._start_background(lambda: self._swap_collection(mtime, previous), "recipe-searcher-swap")
 
-입력: [아삭한 콩나물무침 레시피 만들기]
-출력: 콩나물무침
+    def check_collection_updates(self, force_check=False):
+        """
+        현재 컬렉션의 내용이 바뀌었으면(추가/삭제/메타데이터 갱신) 새 스토어/백엔드 로드를 백그라운드로 시작
+        (쿼리마다 호출, refresh_interval 간격으로만 확인 - 로드가 끝날 때까지 이전 데이터로 검색)
 
-입력: [입맛 돋구는 양파덮밥 레시피!]
-출력: 양파덮밥
+        Returns:
+            갱신 스레드 (새로 시작하지 않았으면 None)
+        """
+        if not hasattr(self, 'collection') or not self.metadata_store.is_stale(self.collection, force_check):
+            return None
+        with self._swap_lock:
+            if self._background_busy():
+                return None
+            return self._start_background(self._refresh_collection, "recipe-searcher-refresh")
 
-입력: [{raw_name}]
-출력:"""
+    def _background_busy(self):
+        return self._swap_thread is not None and self._swap_thread.is_alive()
 
+    def _start_background(self, target, name):
+        # _swap_lock 안에서 호출 (교체 / 갱신 스레드는 한 번에 하나만)
+        self._swap_thread = threading.Thread(target=target, name=name, daemon=True)
+        self._swap_thread.start()
+        return self._swap_thread
+
+    def _refresh_collection(self):
+        collection = self.collection
+        try:
+            start = time.perf_counter()
+            store = self.metadata_store.reloaded(collection)
+            backend = self.backend.refreshed(collection)
+        except Exception as e:
+            print(f"❌ 컬렉션 갱신 실패 - 이전 데이터로 계속 검색: {e}")
+            return
+
+        if collection is not self.collection:
+            return
+        self.metadata_store = store
+        self.backend = backend
+        self.collection_refreshes += 1
+        print(f"🔁 컬렉션 갱신: '{collection.name}' ({len(store)}개, {time.perf_counter() - start:.2f}s)")
+
+    def _swap_collection(self, mtime=None, previous_mtime=None):
         try:
-            # OpenAI API 호출
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "당신은 요리 명칭 정제 전문가입니다. 핵심 요리명만 추출하고, 수식어와 조리방법 관련 단어는 모두 제거합니다."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=20,
-                temperature=0.0,
+            name = self.aliases.resolve(COLLECTION_ALIAS)
+            current = getattr(self, 'collection', None)
+            if current is not None and name == current.name:
+                return
+            start = time.perf_counter()
+            collection = self.client.get_collection(name=name)
+            store = self.metadata_store.reloaded(collection)
+            search_ef = self._hnsw_search_ef_override
+            if search_ef is None:
+                search_ef = default_search_ef(collection)
+            backend = create_backend(
+                self._backend_name, collection, self._backend_index_path(name), search_ef=search_ef,
+                options=self._backend_options, db_path=self.db_path
             )
-            
-            refined = response.choices[0].message.content.strip()
-            
-            # 후처리: 불필요한 텍스트 및 특수문자 제거
-            refined = re.sub(r'출력:|결과:|->|:|\*|```|!|\.|…', '', refined).strip()
-            refined = refined.split('\n')[0].strip()
-            
-            # 추가 정제: 남은 불필요한 단어 제거
-            noise_words = ['레시피', '만들기', '만드는법', '황금레시피']
-            for word in noise_words:
-                refined = refined.replace(word, '').strip()
-            
-            # 검증: 결과가 유효한지 확인
-            if refined and len(refined) >= 2 and not refined.isdigit():
-                print(f"✅ OpenAI 정제: '{raw_name}' -> '{refined}'")
-                return refined
-            else:
-                print(f"⚠️ OpenAI 결과 불량: '{refined}' -> 규칙 기반으로 대체")
-                return self.clean_recipe_name(raw_name)
-            
+
+            # 교체 전에 쿼리 한 번 (HNSW 인덱스 로드 등 첫 쿼리 초기화 비용을 실제 요청 대신 지불)
+            probe = collection.get(include=["embeddings"], limit=1)
+            if probe['ids']:
+                backend.query([probe['embeddings'][0]], 1)
         except Exception as e:
-            print(f"⚠️ OpenAI API 오류: {e}")
-            print(f"   '{raw_name}' -> 규칙 기반 처리")
-            return self.clean_recipe_name(raw_name)
+            print(f"❌ 컬렉션 교체 실패 - 이전 버전으로 계속 검색 ({SWAP_RETRY_SECONDS:.0f}초 뒤 재시도): {e}")
+            with self._swap_lock:
+                # 그사이 별칭이 다시 바뀌지 않았으면 되돌려서 다음 쿼리가 다시 교체를 시도하게 함
+                if self._alias_mtime == mtime:
+                    self._alias_mtime = previous_mtime
+                self._swap_retry_at = time.monotonic() + SWAP_RETRY_SECONDS
+            return
+
+        # 새 버전이 모두 준비된 뒤 참조만 교체 (재색인은 같은 recipe id를 쓰므로 교체 순간 진행 중인 쿼리도 안전)
+        self.metadata_store = store
+        self.backend = backend
+        self.collection = collection
+        self.hnsw_search_ef = search_ef
+        self.collection_swaps += 1
+        print(f"🔁 컬렉션 교체: '{name}' ({collection.count()}개, {time.perf_counter() - start:.2f}s)")
+
+    def _load_model(self):
+        # HuggingFace의 한국어 특화 모델 (768차원, torch 또는 ONNX int8)
+        if hasattr(self._encoder_backend, "encode"):
+            self.model = self._encoder_backend
+        else:
+            self.model = load_encoder(self._encoder_backend)
+        print(f"✅ 인코더 백엔드: {getattr(self.model, 'name', type(self.model).__name__)}")
+
+        # 재료 벡터 합성 모드: 사전에 없는 재료가 섞인 쿼리만 모델로 인코딩
+        if self._query_mode == "composed":
+            try:
+                self.ingredient_table = IngredientVectorTable.load(self._ingredient_vectors_path)
+                print(f"✅ 재료 벡터 테이블 로드 완료 ({len(self.ingredient_table)}종)")
+            except Exception as e:
+                print(f"⚠️ 재료 벡터 테이블 로드 실패 - 모델 인코딩 사용: {e}")
+
+    def _warm_model(self):
+        # 첫 encode 호출의 초기화 비용을 사용자 요청 전에 미리 지불
+        if self.model is not None:
+            self.model.encode(build_query_text(["감자"]))
+
+    def _run_warmup(self):
+        start = time.perf_counter()
+        try:
+            self._timed_phase("openai", self._connect_openai, optional=True)
+            self._timed_phase("chroma_connect", self._connect_chroma)
+            self._timed_phase("metadata_store", self._load_metadata_store)
+            self._timed_phase("backend", self._load_backend)
+        finally:
+            self._index_ready.set()
+
+        try:
+            self._timed_phase("model_load", self._load_model)
+            self._timed_phase("model_warmup", self._warm_model)
+        finally:
+            self._model_ready.set()
+
+        self.startup_timings["total"] = round(time.perf_counter() - start, 3)
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.startup_timings.items())
+        print(f"⏱️ RecipeSearcher 워밍업 완료: {phases}")
+
+    def warmup(self, background=True):
+        """
+        모델/DB 로드 (단계별 시간은 self.startup_timings에 기록)
+
+        Args:
+            background: True면 백그라운드 스레드에서 실행하고 바로 반환
+        """
+        if self._warmup_thread is not None:
+            return self._warmup_thread
+        if not background:
+            self._run_warmup()
+            self._raise_warmup_error()
+            return None
+
+        self._warmup_thread = threading.Thread(target=self._run_warmup, name="recipe-searcher-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+
+    @property
+    def ready(self):
+        """모델까지 모두 문제없이 준비되었는지"""
+        return self._model_ready.is_set() and self.warmup_error is None
+
+    def wait_until_ready(self, timeout=None):
+        """인덱스와 모델 준비를 합쳐서 최대 timeout초 기다림 (준비되면 True)"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        if not self._index_ready.wait(timeout):
+            return False
+        remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+        return self._model_ready.wait(remaining)
+
+    def _raise_warmup_error(self):
+        if self.warmup_error is not None:
+            raise RuntimeError(f"RecipeSearcher 워밍업 실패: {self.warmup_error}") from self.warmup_error
+
+    def _wait_for_search(self):
+        """
+        검색 전 대기: 인덱스는 준비될 때까지, 모델은 최대 warmup_wait초
+        워밍업이 실패했으면 빈 결과 대신 예외 (호출 측 mock 대체 등이 동작하도록)
+
+        Returns:
+            모델 준비 여부 (False면 키워드 매칭으로 임시 순위)
+        """
+        self._index_ready.wait()
+        self._raise_warmup_error()
+        ready = self._model_ready.wait(self.warmup_wait)
+        self._raise_warmup_error()
+        return ready
+
+    def clean_with_llm(self, raw_name):
+        """
+        정제 결과 캐시를 먼저 조회하고, 캐시 미스일 때만 OpenAI API로 핵심 요리명 추출
+        (인덱싱 시 미리 계산된 llm_name 메타데이터 → 로컬 SQLite 캐시 → OpenAI 순서)
+        """
+        return self.clean_names([raw_name])[raw_name]
+
+    def clean_names(self, raw_names, deadline=None, trace=None):
+        """
+        여러 요리명을 한 번에 정제
+        - 캐시 히트는 바로 사용, 캐시 미스는 OpenAI에 동시 요청
+        - deadline(time.perf_counter 기준)까지 끝나지 않은 이름은 규칙 기반 결과로 즉시 반환
+
+        Returns:
+            {원본 요리명: 정제된 요리명}
+        """
+        cleaned = {}
+        misses = []
+        for raw_name in dict.fromkeys(raw_names):
+            precomputed = self.metadata_store.llm_names.get(raw_name)
+            if precomputed:
+                cleaned[raw_name] = precomputed
+            else:
+                misses.append(raw_name)
+
+        precomputed_count = len(cleaned)
+        if misses:
+            cleaned.update(self.name_cache.get_many(misses))
+            misses = [raw_name for raw_name in misses if raw_name not in cleaned]
+
+        if trace is not None:
+            trace.add('name_precomputed', precomputed_count)
+            trace.add('name_cache_hit', len(cleaned) - precomputed_count)
+            trace.add('name_miss', len(misses))
+
+        if not misses:
+            return cleaned
+
+        # OpenAI를 사용할 수 없으면 규칙 기반으로 대체
+        if self.openai_client is None:
+            for raw_name in misses:
+                print(f"⚠️ OpenAI 미사용: '{raw_name}' -> 규칙 기반 처리")
+                cleaned[raw_name] = self.clean_recipe_name(raw_name)
+            if trace is not None:
+                trace.add('name_rule_based', len(misses))
+            return cleaned
+
+        llm_cleaned, llm_stats = self.name_pool.clean_many(misses, deadline=deadline)
+        cleaned.update(llm_cleaned)
+        if trace is not None:
+            trace.add('llm', llm_stats['llm'])
+            trace.add('llm_failed', llm_stats['failed'])
+            trace.add('llm_timed_out', llm_stats['timed_out'])
+            trace.add('llm_busy', llm_stats['busy'])
+        return cleaned
 
     def clean_recipe_name(self, name):
         """
         [고도화된 정제] 자취생용 수식어 제거 (어순 유지)
         """
-        # 1. 특수문자를 공백으로 변환 (괄호, 대괄호, 점 등)
-        name = re.sub(r'[\[\]().,\-_]', ' ', name)
-        
-        # 2. 숫자와 날짜 패턴 제거 (예: 176, 2025.11.7, EP 18)
-        name = re.sub(r'\d+\.?\d*\.?\d*', ' ', name)
-        name = re.sub(r'ep\s*\d+|episode\s*\d+', ' ', name, flags=re.IGNORECASE)
-        
-        # 3. 소문자 변환
-        name = name.lower()
-        
-        # 4. 노이즈 단어 제거
-        stop_words = [
-            '레시피', '만들기', '방법', '황금레시피', '간단', '초간단', '아삭한', '맛있는', 
-            '꿀팁', '집밥', '반찬', '양념', '젓국', '하얀', '식감이', '매력적인', '단짠', 
-            '입맛돋궈주는', '새콤아삭', '든든한', '최고의', '끓이는법', '끓이기', '조리법',
-            '요리법', '쉬운', '빠른', '특급', '비법', '황금', '꿀', '백선생', '알토란',
-            '입맛', '돋구는', '간단하지만', '특별한', '영양만점', '초스피드', '속성',
-            '만개백과', '가끔', '생각나는', '너무', '맛있잖아', '에어프라이어', '요리',
-            '만드는', '법', '법', 'ep', 'episode'
-        ]
-        
-        words = name.split()
-        # 어순 유지하면서 불용어만 제거
-        cleaned_words = [w for w in words if w.strip() and w not in stop_words]
-        
-        # 중복 제거하되 순서는 유지
-        unique_words = []
-        for w in cleaned_words:
-            if w not in unique_words and len(w) > 0:
-                unique_words.append(w)
-        
-        result = " ".join(unique_words).strip()
-        
-        # 결과가 비어있으면 원본의 첫 단어라도 반환
-        if not result and words:
-            result = words[0]
-                
-        return result
+        return clean_recipe_name(name)
 
     def is_too_similar(self, new_name, existing_names, threshold=0.6):
         """
@@ -183,63 +499,356 @@ class RecipeSearcher:
             print(f"임베딩 생성 실패: {e}")
             return None
 
-    def hybrid_search(self, user_ingredients, n_results=5):
+    def get_embeddings(self, texts: list) -> list:
+        """여러 쿼리를 한 번의 encode 호출로 임베딩 생성 (배치)"""
+        try:
+            return self.model.encode(texts).tolist()
+        except Exception as e:
+            print(f"배치 임베딩 생성 실패: {e}")
+            return None
+
+    def compose_query_embedding(self, ingredients):
+        """재료별 벡터 테이블로 쿼리 임베딩 합성 (합성 모드가 아니거나 모르는 재료가 있으면 None)"""
+        if self.ingredient_table is None:
+            return None
+        vector = self.ingredient_table.compose(ingredients, mode=self.compose_mode)
+        return None if vector is None else vector.tolist()
+
+    def get_query_embedding(self, ingredients, trace=None):
+        """정렬된 재료 조합 기준 LRU 캐시를 거쳐 쿼리 임베딩 생성"""
+        cached = self.embedding_cache.get(ingredients)
+        if trace is not None:
+            trace.add('embedding_hit' if cached is not None else 'embedding_miss')
+        if cached is not None:
+            return cached
+
+        vector = self.compose_query_embedding(ingredients)
+        if vector is None:
+            vector = self.get_embedding(self.build_query_text(ingredients))
+        if vector is not None:
+            self.embedding_cache.put(ingredients, vector)
+        return vector
+
+    def get_query_embeddings(self, ingredient_sets, trace=None):
+        """여러 재료 조합의 쿼리 임베딩 (캐시 미스만 모아서 한 번의 encode 호출)"""
+        vectors = [self.embedding_cache.get(ingredients) for ingredients in ingredient_sets]
+        misses = list(dict.fromkeys(
+            ingredients for ingredients, vector in zip(ingredient_sets, vectors) if vector is None
+        ))
+        if trace is not None:
+            trace.add('embedding_hit', len(ingredient_sets) - len(misses))
+            trace.add('embedding_miss', len(misses))
+        if not misses:
+            return vectors
+
+        encoded = {}
+        for ingredients in misses:
+            vector = self.compose_query_embedding(ingredients)
+            if vector is not None:
+                encoded[ingredients] = vector
+
+        to_encode = [ingredients for ingredients in misses if ingredients not in encoded]
+        if to_encode:
+            model_vectors = self.get_embeddings([self.build_query_text(ingredients) for ingredients in to_encode])
+            if model_vectors is None:
+                return None
+            encoded.update(zip(to_encode, model_vectors))
+
+        for ingredients, vector in encoded.items():
+            self.embedding_cache.put(ingredients, vector)
+        return [encoded[ingredients] if vector is None else vector for ingredients, vector in zip(ingredient_sets, vectors)]
+
+    @staticmethod
+    def canonicalize_ingredients(user_ingredients):
+        """재료 리스트를 순서와 무관한 키로 변환 (공백 제거, 중복 제거, 정렬된 튜플)"""
+        return tuple(sorted({ing.strip() for ing in user_ingredients if ing and ing.strip()}))
+
+    @staticmethod
+    def build_query_text(user_ingredients):
+        """reindex.py와 동일한 형식의 쿼리 문자열 생성"""
+        return build_query_text(user_ingredients)
+
+    def compute_scores(self, user_ingredients, distances, rows, store=None):
         """
-        벡터 유사도(60%) + 키워드 매칭(40%) + 자취생용 다양성 필터
+        후보 전체의 벡터 점수와 키워드 점수를 NumPy 배열 연산으로 한 번에 계산
+        (키워드 매칭은 메타데이터 스토어의 정수 id CSR 배열로 수행)
+        - store: rows를 만든 스토어 (기본: 현재 스토어)
         """
-        # 로컬 모델용: reindex.py와 동일한 형식으로 쿼리 생성
-        ingredients_text = ", ".join(user_ingredients)
-        query_text = f"요리명: , 재료: {ingredients_text}"
-        query_vector = self.get_embedding(query_text)
+        vector_scores = 1 - np.asarray(distances, dtype=np.float64)
 
-        if query_vector is None:
-            print("⚠️ 임베딩 생성 실패, 빈 결과 반환")
+        if not user_ingredients or len(vector_scores) == 0:
+            return vector_scores * 0.6
+
+        store = store if store is not None else self.metadata_store
+        match_counts = store.keyword_match_counts(rows, user_ingredients)
+        keyword_scores = match_counts / len(user_ingredients)
+        return (vector_scores * 0.6) + (keyword_scores * 0.4)
+
+    def query_candidates(self, query_vectors, n_candidates, filters=None):
+        """
+        검색 백엔드에서 후보 id와 거리만 조회 (메타데이터는 사이드 스토어에서 읽음)
+        - filters가 있으면 Chroma where 절 / NumPy 행 마스크로 검색 단계에서 후보를 줄임
+        """
+        self.check_collection_version()
+        self.check_collection_updates()
+        # 백그라운드 교체와 겹쳐도 한 쿼리 안에서는 같은 백엔드/스토어 사용
+        backend = self.backend
+        store = self.metadata_store
+        if filters is None:
+            return backend.query(query_vectors, n_candidates)
+
+        if backend.filter_mode == "where":
+            where, complete = filters.to_where(store.indexed_fields)
+            if not complete and not self._warned_unindexed:
+                print("⚠️ 숫자형 필터 필드(cooking_time_minutes 등)가 없는 컬렉션 - 순위 단계에서 거릅니다 (reindex.py 재실행 권장)")
+                self._warned_unindexed = True
+            return backend.query(query_vectors, n_candidates, where=where)
+        return backend.query(query_vectors, n_candidates, mask=self._backend_mask(filters, backend, store))
+
+    def _backend_mask(self, filters, backend, store):
+        """스토어 행 기준 필터 마스크를 백엔드 행 순서로 변환"""
+        key = (id(backend.ids), id(store.ids))  # 백엔드 갱신 / 스토어 재로드 시 새 리스트로 바뀜
+        cached_key, rows = self._backend_rows
+        if cached_key != key:
+            rows = store.rows_for(backend.ids)
+            self._backend_rows = (key, rows)
+        return (rows >= 0) & filters.mask(store)[np.maximum(rows, 0)]
+
+    def rank_candidates(self, user_ingredients, ids, distances, n_results=5, stats=None, allowed=None, store=None):
+        """
+        검색 후보에 하이브리드 점수를 매기고 다양성 필터를 적용해 상위 n_results개 선택
+        (stats가 주어지면 점수 계산 행 수와 다양성 필터 탈락 수를 기록)
+        - allowed: store 행 기준 필터 마스크 (검색 단계에서 다 거르지 못한 조건의 후처리)
+        - store: 이 쿼리에서 쓰는 메타데이터 스토어 (기본: 현재 스토어)
+        """
+        store = store if store is not None else self.metadata_store
+        rows = store.rows_for(ids)
+
+        # 스토어 로드 이후 추가된 레시피가 섞여 있으면 바로 갱신 확인 (이번 쿼리에서는 제외)
+        if (rows < 0).any():
+            self.check_collection_updates(force_check=True)
+
+        known = rows >= 0
+        if allowed is not None:
+            known &= allowed[np.maximum(rows, 0)]
+        rows = rows[known]
+        distances = np.asarray(distances, dtype=np.float64)[known]
+        final_scores = self.compute_scores(user_ingredients, distances, rows, store)
+        if stats is not None:
+            stats['scored'] += len(rows)
+        return self.select_diverse(rows, final_scores, n_results, stats, store)
+
+    def rank_by_keywords(self, user_ingredients, n_results=5, filters=None):
+        """
+        모델 워밍업 전 임시 순위: 전체 레시피를 키워드 매칭 점수만으로 정렬
+        """
+        store = self.metadata_store
+        rows = np.arange(len(store)) if filters is None else np.flatnonzero(filters.mask(store))
+        if not user_ingredients or len(rows) == 0:
             return []
-        
-        # 중복을 걸러내고도 5개를 채우기 위해 충분한 후보(75개) 추출
-        results = self.collection.query(
-            query_embeddings=[query_vector],
-            n_results=n_results * 15 
-        )
-        
+
+        keyword_scores = store.keyword_match_counts(rows, user_ingredients) / len(user_ingredients)
+        order = np.argsort(-keyword_scores, kind="stable")[:n_results * 15]
+        return self.select_diverse(rows[order], keyword_scores[order], n_results, store=store)
+
+    def select_diverse(self, rows, final_scores, n_results=5, stats=None, store=None):
+        """점수가 매겨진 후보를 순서대로 보며 다양성 필터 적용 (store: rows를 만든 스토어, 기본: 현재 스토어)"""
+        store = store if store is not None else self.metadata_store
         hybrid_results = []
-        final_names = [] 
+        final_names = []
+        rejected = 0
+
+        for i, row in enumerate(rows):
+            cleaned_name = store.cleaned_names[row]
 
-        for i in range(len(results['ids'][0])):
-            metadata = results['metadatas'][0][i]
-            raw_name = metadata['name']
-            cleaned_name = self.clean_recipe_name(raw_name)
-            
             # 기존 결과와 너무 비슷하면 건너뜀 (다양성 확보)
             if self.is_too_similar(cleaned_name, final_names):
+                rejected += 1
                 continue
-            
-            recipe_ingredients = json.loads(metadata['ingredients'])
-            vector_score = 1 - results['distances'][0][i]
-            match_count = sum(1 for ing in user_ingredients if ing in recipe_ingredients)
-            keyword_score = match_count / len(user_ingredients) if user_ingredients else 0
-            
-            final_score = (vector_score * 0.6) + (keyword_score * 0.4)
-            
+
             hybrid_results.append({
                 "name": cleaned_name,
-                "original_name": raw_name,
-                "score": round(final_score * 100, 2),
-                "ingredients": recipe_ingredients,
-                "url": metadata.get('blog_url', '정보 없음')
+                "original_name": store.names[row],
+                "score": round(float(final_scores[i]) * 100, 2),
+                "ingredients": store.ingredients_of(row),
+                "url": store.urls[row]
             })
             final_names.append(cleaned_name)
-            
+
             if len(hybrid_results) == n_results:
                 break
-        
-        # 반환 직전 최종 5개에 대해서만 OpenAI LLM 정제 수행
+
+        if stats is not None:
+            stats['rejected'] = rejected
+        return hybrid_results
+
+    def fetch_and_rank(self, ingredient_sets, query_vectors, n_results=5, filters=None, trace=None):
+        """
+        적응형 후보 추출 + 순위 산정
+        - overfetch_steps 첫 단계(기본 n_results x 4)로 조회해 점수/다양성 필터 적용
+        - 다양성 필터 후 n_results개가 안 되는 쿼리만 모아 다음 단계 후보 수로 다시 조회
+        - 요청한 후보 수보다 적게 나오면 컬렉션을 다 본 것이므로 더 넓히지 않음
+
+        Returns:
+            (쿼리별 결과 리스트, 쿼리별 통계 {'fetched', 'scored', 'rejected', 'rounds', 'returned'})
+        """
+        trace = trace if trace is not None else QueryTrace()
+        all_results = [[] for _ in ingredient_sets]
+        stats = [{'fetched': 0, 'scored': 0, 'rejected': 0, 'rounds': 0} for _ in ingredient_sets]
+        pending = list(range(len(ingredient_sets)))
+
+        for multiplier in self.overfetch_steps:
+            n_candidates = n_results * multiplier
+            with trace.stage('query'):
+                results = self.query_candidates([query_vectors[q] for q in pending], n_candidates, filters)
+
+            still_short = []
+            with trace.stage('rerank'):
+                store = self.metadata_store
+                allowed = None if filters is None else filters.mask(store)
+                for i, q in enumerate(pending):
+                    ids = results['ids'][i]
+                    stats[q]['fetched'] += len(ids)
+                    stats[q]['rounds'] += 1
+                    all_results[q] = self.rank_candidates(
+                        ingredient_sets[q], ids, results['distances'][i], n_results, stats[q], allowed, store
+                    )
+                    if len(all_results[q]) < n_results and len(ids) >= n_candidates:
+                        still_short.append(q)
+
+            pending = still_short
+            if not pending:
+                break
+
+        for q, stat in enumerate(stats):
+            stat['returned'] = len(all_results[q])
+            for key in ('fetched', 'scored', 'rejected', 'returned'):
+                trace.add(key, stat[key])
+            trace.add('widened', int(stat['rounds'] > 1))
+        self._record_fetch_stats(stats, n_results)
+        return all_results, stats
+
+    def _record_fetch_stats(self, stats, n_results):
+        with self._stats_lock:
+            self.last_fetch_stats = stats
+            totals = self._fetch_totals
+            for stat in stats:
+                totals['queries'] += 1
+                totals['fetched'] += stat['fetched']
+                totals['scored'] += stat['scored']
+                totals['rejected'] += stat['rejected']
+                totals['widened'] += int(stat['rounds'] > 1)
+                totals['short'] += stat['returned'] < n_results
+
+    def fetch_stats(self):
+        """적응형 후보 추출 누적 통계 (쿼리당 평균 조회/점수 계산/탈락 수, 재조회 비율)"""
+        with self._stats_lock:
+            totals = dict(self._fetch_totals)
+        queries = totals['queries'] or 1
+        return {
+            **totals,
+            'avg_fetched': round(totals['fetched'] / queries, 2),
+            'avg_scored': round(totals['scored'] / queries, 2),
+            'avg_rejected': round(totals['rejected'] / queries, 2),
+            'widen_rate': round(totals['widened'] / queries, 4),
+        }
+
+    def refine_names(self, hybrid_results, deadline=None, trace=None):
+        """최종 결과에 대해서만 OpenAI LLM 요리명 정제 수행 (동시 요청, 마감 시간 적용)"""
         print("🪄 유튜브 검색 최적화를 위해 요리명을 정제 중입니다...")
+        trace = trace if trace is not None else QueryTrace()
+        with trace.stage('clean_names'):
+            cleaned = self.clean_names([res['original_name'] for res in hybrid_results], deadline=deadline, trace=trace)
         for res in hybrid_results:
-            res['name'] = self.clean_with_llm(res['original_name'])
-
+            res['name'] = cleaned[res['original_name']]
         return hybrid_results
 
+    def hybrid_search(self, user_ingredients, n_results=5, latency_budget=None, filters=None):
+        """
+        벡터 유사도(60%) + 키워드 매칭(40%) + 자취생용 다양성 필터
+        - latency_budget(초) 안에 정제되지 않은 요리명은 규칙 기반 결과로 반환
+        - filters: RecipeFilters 또는 dict (예: {"max_minutes": 20, "difficulty": "쉬움", "servings": 1})
+        """
+        trace = QueryTrace("hybrid_search")
+        filters = RecipeFilters.coerce(filters)
+        deadline = time.perf_counter() + (latency_budget if latency_budget is not None else self.latency_budget)
+
+        # 로컬 모델용: reindex.py와 동일한 형식으로 쿼리 생성 (정렬된 재료 조합 기준 캐시)
+        user_ingredients = self.canonicalize_ingredients(user_ingredients)
+
+        # 워밍업 중이면 모델을 최대 warmup_wait초 기다리고, 그래도 안 되면 키워드 매칭만으로 순위 산정
+        if not self._wait_for_search():
+            print("⏳ 모델 워밍업 중 - 키워드 매칭 결과를 반환합니다")
+            trace.add('keyword_fallback')
+            with trace.stage('rerank'):
+                hybrid_results = self.rank_by_keywords(user_ingredients, n_results, filters)
+            return self.finish_trace(trace, self.refine_names(hybrid_results, deadline=deadline, trace=trace))
+
+        with trace.stage('encode'):
+            query_vector = self.get_query_embedding(user_ingredients, trace=trace)
+
+        if query_vector is None:
+            print("⚠️ 임베딩 생성 실패, 빈 결과 반환")
+            trace.add('encode_failed')
+            return self.finish_trace(trace, [])
+        
+        # 적은 후보(기본 20개)로 시작해 중복을 걸러내고 5개가 안 되면 후보를 넓혀 다시 조회
+        (hybrid_results,), _ = self.fetch_and_rank([user_ingredients], [query_vector], n_results, filters, trace)
+
+        # 반환 직전 최종 5개에 대해서만 OpenAI LLM 정제 수행
+        return self.finish_trace(trace, self.refine_names(hybrid_results, deadline=deadline, trace=trace))
+
+    def hybrid_search_many(self, list_of_ingredient_lists, n_results=5, latency_budget=None, filters=None):
+        """
+        여러 사용자의 재료 리스트를 한 번에 검색 (피크 시간대 배치 처리용)
+        - 모든 쿼리를 한 번의 encode 호출로 임베딩
+        - 한 번의 collection.query에 여러 query_embeddings 전달
+        - filters는 모든 쿼리에 공통 적용
+        """
+        filters = RecipeFilters.coerce(filters)
+        if not list_of_ingredient_lists:
+            return []
+
+        trace = QueryTrace("hybrid_search_many", queries=len(list_of_ingredient_lists))
+        deadline = time.perf_counter() + (latency_budget if latency_budget is not None else self.latency_budget)
+
+        list_of_ingredient_lists = [self.canonicalize_ingredients(ings) for ings in list_of_ingredient_lists]
+
+        if not self._wait_for_search():
+            print("⏳ 모델 워밍업 중 - 키워드 매칭 결과를 반환합니다")
+            trace.add('keyword_fallback', len(list_of_ingredient_lists))
+            with trace.stage('rerank'):
+                all_results = [self.rank_by_keywords(ings, n_results, filters) for ings in list_of_ingredient_lists]
+            self.refine_names(
+                [res for hybrid_results in all_results for res in hybrid_results], deadline=deadline, trace=trace
+            )
+            return self.finish_trace(trace, all_results)
+
+        with trace.stage('encode'):
+            query_vectors = self.get_query_embeddings(list_of_ingredient_lists, trace=trace)
+
+        if query_vectors is None:
+            print("⚠️ 배치 임베딩 생성 실패, 빈 결과 반환")
+            trace.add('encode_failed', len(list_of_ingredient_lists))
+            return self.finish_trace(trace, [[] for _ in list_of_ingredient_lists])
+
+        # 부족한 쿼리만 모아서 넓힌 후보 수로 한 번에 다시 조회
+        all_results, _ = self.fetch_and_rank(list_of_ingredient_lists, query_vectors, n_results, filters, trace)
+
+        # 모든 쿼리의 최종 후보를 한 번에 정제 (같은 요리명은 한 번만 요청)
+        self.refine_names(
+            [res for hybrid_results in all_results for res in hybrid_results], deadline=deadline, trace=trace
+        )
+        return self.finish_trace(trace, all_results)
+
+    def finish_trace(self, trace, results):
+        """검색 계측 레코드를 싱크에 기록 (계측 실패가 검색 결과에 영향을 주지 않도록 예외 무시)"""
+        try:
+            self.metrics.record(trace.finish())
+        except Exception as e:
+            print(f"⚠️ 검색 계측 기록 실패: {e}")
+        return results
+
 # --- 테스트 및 통합용 출력 코드 ---
 if __name__ == "__main__":
     searcher = RecipeSearcher()
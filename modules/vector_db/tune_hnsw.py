@@ -0,0 +1,269 @@
+"""
+modules.vector_db.tune_hnsw
+작성자: 추윤서
+기능: HNSW 파라미터(M / construction_ef / search_ef) 자동 튜닝
+- 컬렉션에 저장된 임베딩으로 임시 인덱스를 조합별로 만들어 held-out 쿼리의 recall@k와 쿼리 지연을 측정
+  (정답: 정규화 벡터 정확 검색 상위 k개)
+- search_ef는 검색 시 k를 늘리는 방식으로 적용되므로(hnsw.py) 같은 (M, construction_ef) 인덱스에서 한 번에 비교
+- recall↑ / 지연↓ 기준 파레토 최적 조합을 고르고, 목표 recall을 넘는 가장 빠른 조합으로
+  컬렉션을 다시 만들어(재임베딩 없음) HNSW 설정과 tuning:* 메타데이터를 기록
+  → RecipeSearcher는 tuning:search_ef를 기본 탐색 폭으로 사용
+
+쿼리 종류:
+    recipes      컬렉션 레시피 일부를 인덱스에서 빼고 그 임베딩을 쿼리로 사용 (모델 불필요)
+    ingredients  레시피 재료 2~5개 조합을 검색 쿼리 문장으로 인코딩 (실제 hybrid_search와 같은 분포)
+
+실행:
+    python -m modules.vector_db.tune_hnsw                     # 측정 + 컬렉션 재생성
+    python -m modules.vector_db.tune_hnsw --dry-run --output hnsw_tuning.json
+    python -m modules.vector_db.tune_hnsw --M 16,32 --search-ef 40,80,160 --min-recall 0.98
+
+컬렉션은 새 버전(별칭__v<시각>)으로 복사한 뒤 별칭을 교체하므로 실행 중인 검색 서비스는 다음 쿼리부터 새 설정 사용
+(collection_alias.py 참고)
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+
+import chromadb
+import numpy as np
+
+from modules.vector_db.collection_alias import CollectionAliases, versioned_name
+from modules.vector_db.hnsw import TUNING_PREFIX, collection_hnsw_params, hnsw_metadata, recreate_collection
+
+DB_PATH = "./modules/vector_db/vectordb_recipes"
+COL_NAME = "recipes_local_cosine"
+
+# hybrid_search 첫 후보 추출 크기 (n_results 5 x overfetch 4)
+DEFAULT_K = 20
+
+
+def _int_list(text):
+    return [int(value) for value in text.split(",") if value.strip()]
+
+
+def _normalize(matrix):
+    return matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12)
+
+
+def load_embeddings(collection, page_size=1000, max_rows=None):
+    """컬렉션 임베딩/메타데이터를 페이지 단위로 읽기"""
+    total = collection.count() if max_rows is None else min(max_rows, collection.count())
+    ids, blocks, metadatas = [], [], []
+    offset = 0
+    while offset < total:
+        page = collection.get(
+            include=["embeddings", "metadatas"], limit=min(page_size, total - offset), offset=offset
+        )
+        if not page['ids']:
+            break
+        ids.extend(page['ids'])
+        blocks.append(np.asarray(page['embeddings'], dtype=np.float32))
+        metadatas.extend(page['metadatas'])
+        offset += len(page['ids'])
+    return ids, np.concatenate(blocks), metadatas
+
+
+def ingredient_queries(metadatas, n_queries, encoder=None, seed=0):
+    """레시피 재료 2~5개 조합을 검색 쿼리 문장으로 인코딩"""
+    from modules.vector_db.encoders import load_encoder
+    from modules.vector_db.ingredient_vectors import build_query_text
+
+    rng = random.Random(seed)
+    candidates = []
+    for metadata in metadatas:
+        try:
+            ingredients = json.loads((metadata or {}).get('ingredients', '[]'))
+        except (TypeError, ValueError):
+            continue
+        ingredients = [ing for ing in ingredients if isinstance(ing, str) and ing]
+        if len(ingredients) >= 2:
+            candidates.append(ingredients)
+    if not candidates:
+        raise ValueError("재료 정보가 있는 레시피가 없습니다 - --queries recipes를 사용하세요")
+
+    texts = []
+    for _ in range(n_queries):
+        ingredients = rng.choice(candidates)
+        texts.append(build_query_text(rng.sample(ingredients, rng.randint(2, min(5, len(ingredients))))))
+    model = load_encoder(encoder)
+    return np.asarray(model.encode(texts, batch_size=64), dtype=np.float32)
+
+
+def exact_top_k(base, queries, k):
+    """정규화 벡터 정확 검색 상위 k개 행 번호 (정답)"""
+    scores = _normalize(queries) @ _normalize(base).T
+    k = min(k, base.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(rows.tolist()) for rows in top]
+
+
+def build_index(client, base, space, M, construction_ef):
+    """임시 컬렉션에 인덱스 구축 (search_ef=1로 만들어 검색 시 k가 그대로 탐색 폭이 되게 함)"""
+    collection = client.create_collection(
+        name=f"hnsw_tune_{uuid.uuid4().hex[:12]}",
+        metadata=hnsw_metadata(space, M=M, construction_ef=construction_ef, search_ef=1),
+    )
+    batch_size = client.get_max_batch_size()
+    start = time.perf_counter()
+    for offset in range(0, len(base), batch_size):
+        block = base[offset:offset + batch_size]
+        collection.add(ids=[str(row) for row in range(offset, offset + len(block))], embeddings=block.tolist())
+    return collection, time.perf_counter() - start
+
+
+def measure(collection, queries, truth, k, search_ef):
+    """쿼리 1개씩 검색하며 recall@k와 지연(ms) 측정"""
+    fetch = max(k, search_ef)
+    recalls, latencies = [], []
+    for vector, expected in zip(queries.tolist(), truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[vector], n_results=fetch, include=["distances"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {int(row) for row in result['ids'][0][:k]}
+        recalls.append(len(found & expected) / len(expected))
+    return {
+        'recall': round(float(np.mean(recalls)), 4),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+    }
+
+
+def pareto_front(points):
+    """recall이 높고 p50 지연이 낮은 쪽으로 지배되지 않는 조합만 (지연 오름차순)"""
+    front = []
+    for point in sorted(points, key=lambda p: (p['p50_ms'], -p['recall'])):
+        if not front or point['recall'] > front[-1]['recall']:
+            front.append(point)
+    return front
+
+
+def choose(front, min_recall):
+    """목표 recall을 넘는 가장 빠른 조합, 없으면 recall이 가장 높은 조합"""
+    passing = [point for point in front if point['recall'] >= min_recall]
+    return passing[0] if passing else max(front, key=lambda p: p['recall'])
+
+
+def sweep(base, queries, k, M_values, construction_ef_values, search_ef_values, space="cosine"):
+    """모든 조합 측정 → 결과 리스트"""
+    truth = exact_top_k(base, queries, k)
+    client = chromadb.EphemeralClient()
+    results = []
+    for M in M_values:
+        for construction_ef in construction_ef_values:
+            collection, build_seconds = build_index(client, base, space, M, construction_ef)
+            try:
+                for search_ef in sorted(set(max(ef, k) for ef in search_ef_values)):
+                    point = {'M': M, 'construction_ef': construction_ef, 'search_ef': search_ef,
+                             'build_s': round(build_seconds, 2)}
+                    point.update(measure(collection, queries, truth, k, search_ef))
+                    results.append(point)
+                    print(f"   M={M:<3} construction_ef={construction_ef:<4} search_ef={search_ef:<4} "
+                          f"recall@{k}={point['recall']:.4f} p50={point['p50_ms']:.2f}ms")
+            finally:
+                client.delete_collection(collection.name)
+    return results
+
+
+def tuning_metadata(chosen, front, k, n_queries, query_source):
+    """컬렉션 메타데이터에 기록할 tuning:* 값 (Chroma 메타데이터는 스칼라만 허용 → 파레토 목록은 JSON 문자열)"""
+    return {
+        f"{TUNING_PREFIX}M": chosen['M'],
+        f"{TUNING_PREFIX}construction_ef": chosen['construction_ef'],
+        f"{TUNING_PREFIX}search_ef": chosen['search_ef'],
+        f"{TUNING_PREFIX}recall": chosen['recall'],
+        f"{TUNING_PREFIX}p50_ms": chosen['p50_ms'],
+        f"{TUNING_PREFIX}k": k,
+        f"{TUNING_PREFIX}queries": n_queries,
+        f"{TUNING_PREFIX}query_source": query_source,
+        f"{TUNING_PREFIX}pareto": json.dumps(front),
+        f"{TUNING_PREFIX}ts": int(time.time()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW 파라미터 튜닝 (recall/지연 파레토)")
+    parser.add_argument("--db-path", default=DB_PATH)
+    parser.add_argument("--collection", default=COL_NAME)
+    parser.add_argument("--queries", choices=["recipes", "ingredients"], default="recipes",
+                        help="held-out 쿼리 종류")
+    parser.add_argument("--n-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="recall 측정 기준 후보 수")
+    parser.add_argument("--M", type=_int_list, default=[8, 16, 32, 48])
+    parser.add_argument("--construction-ef", type=_int_list, default=[64, 128, 256])
+    parser.add_argument("--search-ef", type=_int_list, default=[20, 40, 80, 160, 320])
+    parser.add_argument("--min-recall", type=float, default=0.95, help="선택 기준 최소 recall@k")
+    parser.add_argument("--max-rows", type=int, default=None, help="튜닝에 쓸 최대 레시피 수 (대용량 샘플링)")
+    parser.add_argument("--encoder", default=None, help="--queries ingredients용 인코더 백엔드")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dry-run", action="store_true", help="측정만 하고 컬렉션은 그대로 둠")
+    parser.add_argument("--output", default=None, help="측정 결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=args.db_path)
+    aliases = CollectionAliases(args.db_path)
+    collection = client.get_collection(name=aliases.resolve(args.collection))
+    current = collection_hnsw_params(collection)
+    print(f"🔍 '{collection.name}' 현재 HNSW 설정: {current}")
+
+    ids, embeddings, metadatas = load_embeddings(collection, max_rows=args.max_rows)
+    rng = np.random.default_rng(args.seed)
+    if args.queries == "recipes":
+        # 쿼리로 쓸 레시피는 인덱스에서 제외 (자기 자신이 항상 1등이 되는 것 방지)
+        held_out = rng.choice(len(ids), size=min(args.n_queries, len(ids) // 10), replace=False)
+        keep = np.ones(len(ids), dtype=bool)
+        keep[held_out] = False
+        base, queries = embeddings[keep], embeddings[held_out]
+    else:
+        base = embeddings
+        queries = ingredient_queries(metadatas, args.n_queries, encoder=args.encoder, seed=args.seed)
+    print(f"🚀 인덱스 {len(base)}개 x {base.shape[1]}차원, 쿼리 {len(queries)}개 ({args.queries})")
+
+    results = sweep(base, queries, args.k, args.M, args.construction_ef, args.search_ef, space=current['space'])
+    front = pareto_front(results)
+    chosen = choose(front, args.min_recall)
+
+    print(f"\n📈 파레토 최적 조합 ({len(front)}개):")
+    for point in front:
+        mark = "👉" if point is chosen else "  "
+        print(f"{mark} M={point['M']:<3} construction_ef={point['construction_ef']:<4} "
+              f"search_ef={point['search_ef']:<4} recall={point['recall']:.4f} p50={point['p50_ms']:.2f}ms")
+
+    report = {
+        'collection': args.collection,
+        'rows': len(base),
+        'queries': len(queries),
+        'query_source': args.queries,
+        'k': args.k,
+        'current': current,
+        'results': results,
+        'pareto': front,
+        'chosen': chosen,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 저장: {args.output}")
+
+    if args.dry_run:
+        return
+
+    # HNSW 파라미터는 생성 시에만 적용되므로 선택한 설정으로 컬렉션을 다시 만듦 (기존 메타데이터는 유지)
+    extra = {key: value for key, value in (collection.metadata or {}).items()
+             if not key.startswith("hnsw:") and not key.startswith(TUNING_PREFIX)}
+    extra.update(tuning_metadata(chosen, front, args.k, len(queries), args.queries))
+    metadata = hnsw_metadata(current['space'], chosen['M'], chosen['construction_ef'], chosen['search_ef'], extra)
+    version = versioned_name(args.collection)
+    print(f"🔨 선택한 설정으로 '{version}' 만드는 중...")
+    collection = recreate_collection(client, collection, metadata, target_name=version)
+    aliases.switch(args.collection, version)
+    deleted = aliases.garbage_collect(client, args.collection)
+    if deleted:
+        print(f"🧹 이전 버전 삭제: {deleted}")
+    print(f"✨ 완료! '{args.collection}' → '{version}' {collection_hnsw_params(collection)}")
+
+
+if __name__ == "__main__":
+    main()
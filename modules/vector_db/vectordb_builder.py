@@ -13,6 +13,21 @@ from openai import OpenAI
 from dotenv import load_dotenv
 import time
 
+from modules.vector_db.embedding_cache import DEFAULT_DIR as EMBEDDING_CACHE_DIR, EmbeddingCache
+from modules.vector_db.hnsw import hnsw_metadata
+from modules.vector_db.incremental import (
+    HASH_KEY,
+    BuildCheckpoint,
+    content_hash,
+    delete_ids,
+    has_removed_keys,
+    load_existing_metadata,
+    plan_changes,
+    update_metadata,
+)
+from modules.vector_db.metadata_store import numeric_metadata
+from modules.vector_db.openai_embeddings import DEFAULT_MODEL, BatchEmbedder
+
 # .env 로드
 load_dotenv()
 
@@ -23,7 +38,15 @@ class VectorDBBuilder:
         self,
         openai_api_key: Optional[str] = None,
         vectordb_path: str = "./modules/vector_db/vectordb_recipes",
-        collection_name: str = "recipes_1000"
+        collection_name: str = "recipes_1000",
+        hnsw_M: Optional[int] = None,
+        hnsw_construction_ef: Optional[int] = None,
+        hnsw_search_ef: Optional[int] = None,
+        openai_base_url: Optional[str] = None,
+        max_concurrency: int = 4,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        embedding_cache_path: Optional[str] = EMBEDDING_CACHE_DIR
     ):
         """
         초기화
@@ -32,6 +55,13 @@ class VectorDBBuilder:
             openai_api_key: OpenAI API 키
             vectordb_path: Chroma DB 저장 경로
             collection_name: 컬렉션 이름
+            hnsw_M: HNSW 노드당 연결 수 (None이면 Chroma 기본값 16)
+            hnsw_construction_ef: HNSW 구축 탐색 폭 (None이면 100)
+            hnsw_search_ef: HNSW 검색 탐색 폭 (None이면 10)
+            openai_base_url: OpenAI 호환 서버 주소 (로컬 스텁 테스트용, 기본: OPENAI_BASE_URL 또는 공식 API)
+            max_concurrency: 동시에 보낼 임베딩 요청 수
+            requests_per_minute, tokens_per_minute: 초기 레이트 리밋 (None이면 응답 헤더로 자동 설정)
+            embedding_cache_path: reindex / RecipeEmbedder와 공유하는 임베딩 캐시 경로 (None이면 사용 안 함)
         """
         self.openai_api_key = openai_api_key or os.getenv('OPENAI_API_KEY')
         
@@ -39,7 +69,18 @@ class VectorDBBuilder:
             raise ValueError("OpenAI API key is required")
         
         # OpenAI 클라이언트
-        self.openai_client = OpenAI(api_key=self.openai_api_key)
+        self.openai_client = OpenAI(api_key=self.openai_api_key, base_url=openai_base_url)
+        
+        # 임베딩 요청 설정 (배치/동시 요청/레이트 리밋, openai_embeddings.py 참고)
+        self.max_concurrency = max_concurrency
+        self.rate_limits = {
+            "requests_per_minute": requests_per_minute,
+            "tokens_per_minute": tokens_per_minute
+        }
+        
+        # (모델, 텍스트 해시) → 임베딩 디스크 캐시 (embedding_cache.py 참고)
+        self.embedding_cache = EmbeddingCache(embedding_cache_path) if embedding_cache_path else None
+        self.cache_model_key = f"openai:{DEFAULT_MODEL}"
         
         # Chroma 클라이언트
         self.vectordb_path = Path(vectordb_path)
@@ -51,6 +92,13 @@ class VectorDBBuilder:
         self.collection_name = collection_name
         self.collection = None
         
+        # HNSW 파라미터 (컬렉션 생성 시에만 적용, hnsw.py 참고)
+        self.hnsw_params = {
+            "M": hnsw_M,
+            "construction_ef": hnsw_construction_ef,
+            "search_ef": hnsw_search_ef
+        }
+        
         print(f"✅ VectorDBBuilder initialized")
         print(f"   Vector DB: {self.vectordb_path}")
         print(f"   Collection: {self.collection_name}")
@@ -92,7 +140,7 @@ class VectorDBBuilder:
         
         return text
     
-    def get_embedding(self, text: str, model: str = "text-embedding-3-small") -> List[float]:
+    def get_embedding(self, text: str, model: str = DEFAULT_MODEL) -> List[float]:
         """
         텍스트를 임베딩 벡터로 변환
         
@@ -101,22 +149,53 @@ class VectorDBBuilder:
             model: OpenAI 임베딩 모델
             
         Returns:
-            임베딩 벡터
+            임베딩 벡터 (재시도 후에도 실패하면 None)
         """
-        try:
-            response = self.openai_client.embeddings.create(
-                model=model,
-                input=text
-            )
-            return response.data[0].embedding
-        except Exception as e:
-            print(f"❌ Error getting embedding: {e}")
-            return None
+        return self.get_embeddings([text], model=model)[0]
+    
+    def create_batch_embedder(self, batch_size: int = 100, model: str = DEFAULT_MODEL) -> BatchEmbedder:
+        """배치/동시 요청 임베딩기 생성"""
+        return BatchEmbedder(
+            self.openai_client,
+            model=model,
+            batch_size=batch_size,
+            max_workers=self.max_concurrency,
+            **self.rate_limits
+        )
+    
+    def get_embeddings(self, texts: List[str], batch_size: int = 100, model: str = DEFAULT_MODEL) -> List[Optional[List[float]]]:
+        """
+        여러 텍스트를 배치/동시 요청으로 임베딩
+        
+        Returns:
+            입력 순서의 임베딩 리스트 (실패한 항목은 None)
+        """
+        return self.create_batch_embedder(batch_size, model).embed(texts)
+    
+    def create_metadata(self, recipe: Dict) -> Dict:
+        """레시피 → Chroma 메타데이터"""
+        metadata = {
+            'name': recipe['name'],
+            'category': recipe.get('category', '기타'),
+            'difficulty': recipe.get('difficulty', '보통'),
+            'cooking_time': recipe.get('cooking_time', '알 수 없음'),
+            'servings': recipe.get('servings', 2),
+            'ingredients': json.dumps(recipe.get('ingredients_canonical', []), ensure_ascii=False),
+            'calories': recipe.get('calories') if recipe.get('calories') else 0,
+        }
+        # 필터 검색용 숫자형 필드 (cooking_time_minutes, servings_count, calories_kcal)
+        metadata.update(numeric_metadata(metadata))
+        
+        # 블로그 URL (있으면)
+        if recipe.get('blog_url'):
+            metadata['blog_url'] = recipe['blog_url']
+        
+        return metadata
     
     def build_vectordb(
         self,
         input_file: str = "data/recipes/normalized_recipes.json",
-        batch_size: int = 10,
+        batch_size: int = 100,
         force_rebuild: bool = False
     ):
         """
@@ -124,8 +203,8 @@ class VectorDBBuilder:
         
         Args:
             input_file: 정규화된 레시피 파일
-            batch_size: 배치 크기 (한번에 몇 개씩 임베딩)
-            force_rebuild: 기존 DB 삭제 후 재구축
+            batch_size: 배치 크기 (임베딩 요청 1회에 보낼 레시피 수, 동시에 max_concurrency개 요청)
+            force_rebuild: 기존 DB 삭제 후 재구축 (False면 새로 생기거나 바뀐 레시피만 반영)
         """
         input_path = Path(input_file)
         
@@ -141,102 +220,153 @@ class VectorDBBuilder:
         print(f"📊 BUILDING VECTOR DATABASE")
         print(f"{'='*60}")
         print(f"Total recipes: {len(recipes)}")
-        print(f"Batch size: {batch_size}")
-        print(f"Model: text-embedding-3-small")
+        print(f"Batch size: {batch_size} (concurrency {self.max_concurrency})")
+        print(f"Model: {DEFAULT_MODEL}")
         print(f"{'='*60}\n")
         
         # 컬렉션 생성/로드
-        existing_collections = [c.name for c in self.chroma_client.list_collections()]
-        
-        if self.collection_name in existing_collections:
-            if force_rebuild:
-                print(f"🗑️  Deleting existing collection: {self.collection_name}")
-                self.chroma_client.delete_collection(self.collection_name)
-            else:
-                print(f"⚠️  Collection already exists: {self.collection_name}")
-                print(f"    Use force_rebuild=True to rebuild")
-                self.collection = self.chroma_client.get_collection(self.collection_name)
-                return True
-        
-        # 새 컬렉션 생성
-        print(f"🔨 Creating new collection: {self.collection_name}")
-        self.collection = self.chroma_client.create_collection(
-            name=self.collection_name,
-            metadata={"description": "Korean recipes with normalized ingredients"}
-        )
+        try:
+            self.collection = self.chroma_client.get_collection(self.collection_name)
+        except Exception:
+            self.collection = None
+        
+        if self.collection is not None and force_rebuild:
+            print(f"🗑️  Deleting existing collection: {self.collection_name}")
+            self.chroma_client.delete_collection(self.collection_name)
+            self.collection = None
+        
+        if self.collection is not None:
+            # 기존 컬렉션: 바뀐 레시피만 증분 반영
+            print(f"♻️  Updating existing collection: {self.collection_name}")
+        else:
+            # 새 컬렉션 생성
+            print(f"🔨 Creating new collection: {self.collection_name}")
+            self.collection = self.chroma_client.create_collection(
+                name=self.collection_name,
+                metadata=hnsw_metadata(
+                    space=None,
+                    extra={"description": "Korean recipes with normalized ingredients"},
+                    **self.hnsw_params
+                )
+            )
         
-        # 배치 처리
-        total_batches = (len(recipes) + batch_size - 1) // batch_size
+        # 임베딩용 텍스트 / 메타데이터 / ID 준비
+        documents = [self.create_embedding_text(recipe) for recipe in recipes]
+        hashes = [content_hash(text) for text in documents]
+        metadatas = [self.create_metadata(recipe) for recipe in recipes]
+        for metadata, digest in zip(metadatas, hashes):
+            metadata[HASH_KEY] = digest
+        # ID (레시피 ID 또는 인덱스)
+        ids = [str(recipe.get('id', f"recipe_{i}")) for i, recipe in enumerate(recipes)]
+        
+        # 중복 ID는 마지막 레시피만 사용 (한 배치에 같은 ID가 있으면 upsert 실패)
+        last_row = {recipe_id: row for row, recipe_id in enumerate(ids)}
+        if len(last_row) < len(ids):
+            print(f"⚠️  Duplicate recipe IDs: {len(ids) - len(last_row)} (keeping the last one)")
+            rows = sorted(last_row.values())
+            documents, hashes, metadatas, ids = (
+                [values[row] for row in rows] for values in (documents, hashes, metadatas, ids)
+            )
         
-        for batch_idx in range(0, len(recipes), batch_size):
-            batch = recipes[batch_idx:batch_idx + batch_size]
-            batch_num = batch_idx // batch_size + 1
-            
-            print(f"\n📦 Batch {batch_num}/{total_batches}")
-            print(f"   Processing recipes {batch_idx + 1} to {min(batch_idx + batch_size, len(recipes))}")
-            
-            # 임베딩 생성
-            embeddings = []
-            documents = []
-            metadatas = []
-            ids = []
-            
-            for recipe in batch:
-                # 임베딩용 텍스트 생성
-                text = self.create_embedding_text(recipe)
-                documents.append(text)
-                
-                # 임베딩 생성
-                embedding = self.get_embedding(text)
-                if embedding:
-                    embeddings.append(embedding)
-                else:
-                    # 실패 시 빈 벡터 (차원 맞추기)
-                    embeddings.append([0.0] * 1536)
-                
-                # 메타데이터 준비
-                metadata = {
-                    'name': recipe['name'],
-                    'category': recipe.get('category', '기타'),
-                    'difficulty': recipe.get('difficulty', '보통'),
-                    'cooking_time': recipe.get('cooking_time', '알 수 없음'),
-                    'servings': recipe.get('servings', 2),
-                    'ingredients': json.dumps(recipe.get('ingredients_canonical', []), ensure_ascii=False),
-                    'calories': recipe.get('calories') if recipe.get('calories') else 0,
-                }
-                
-                # 블로그 URL (있으면)
-                if recipe.get('blog_url'):
-                    metadata['blog_url'] = recipe['blog_url']
-                
-                metadatas.append(metadata)
-                
-                # ID (레시피 ID 또는 인덱스)
-                recipe_id = recipe.get('id', f"recipe_{batch_idx + len(ids)}")
-                ids.append(str(recipe_id))
-            
-            # Chroma에 저장
+        # 컬렉션의 content_hash와 비교 → 새로 생기거나 바뀐 레시피만 임베딩, 없어진 레시피 삭제
+        # (텍스트는 같고 메타데이터만 바뀐 레시피는 재임베딩 없이 메타데이터만 교체)
+        existing = load_existing_metadata(self.collection)
+        plan = plan_changes(ids, hashes, existing, metadatas)
+        print(f"🧮 Changes: +{plan['added']} added, ~{plan['changed']} changed, "
+              f"*{plan['updated']} metadata only, -{len(plan['delete'])} removed, {plan['unchanged']} unchanged")
+        
+        # 진행 상황 체크포인트 (배치마다 해시와 함께 upsert하므로 중단돼도 다음 실행에서 이어서 진행)
+        checkpoint = BuildCheckpoint(self.vectordb_path / f"{self.collection_name}.build_checkpoint.json")
+        previous = checkpoint.load()
+        if previous.get('status') in ('running', 'partial'):
+            print(f"⏯️  Resuming previous build ({previous['status']}: {previous.get('done', 0)}/"
+                  f"{previous.get('to_embed', 0)} embedded, {previous.get('failed', 0)} failed)")
+        checkpoint.save(status='running', input_file=str(input_path), total=len(ids),
+                        to_embed=len(plan['upsert']), to_delete=len(plan['delete']), done=0, failed=0)
+        
+        if plan['delete']:
+            delete_ids(self.collection, plan['delete'])
+            print(f"🗑️  Deleted {len(plan['delete'])} removed recipes")
+        
+        if plan['update']:
+            update_metadata(self.collection, [ids[row] for row in plan['update']],
+                            [metadatas[row] for row in plan['update']], existing)
+            print(f"📝 Updated metadata of {plan['updated']} recipes (no re-embedding)")
+        
+        failed_ids = []
+        done = 0
+        start_time = time.time()
+        
+        def save(rows, vectors, label):
+            """임베딩된 레시피를 해시와 함께 upsert (배치 단위 체크포인트)"""
+            nonlocal done
             try:
-                self.collection.add(
-                    embeddings=embeddings,
-                    documents=documents,
-                    metadatas=metadatas,
-                    ids=ids
+                # upsert는 메타데이터를 병합하므로, 없어진 키(예: blog_url)가 있는 레코드는 먼저 삭제
+                stale = [ids[row] for row in rows if has_removed_keys(existing.get(ids[row]), metadatas[row])]
+                if stale:
+                    self.collection.delete(ids=stale)
+                self.collection.upsert(
+                    embeddings=vectors,
+                    documents=[documents[row] for row in rows],
+                    metadatas=[metadatas[row] for row in rows],
+                    ids=[ids[row] for row in rows]
                 )
-                print(f"   ✅ Batch {batch_num} saved")
+                done += len(rows)
             except Exception as e:
-                print(f"   ❌ Error saving batch {batch_num}: {e}")
+                print(f"   ❌ Error saving {label}: {e}")
+                failed_ids.extend(ids[row] for row in rows)
+            checkpoint.save(done=done, failed=len(failed_ids))
+        
+        # 임베딩 캐시에 있는 텍스트는 API 호출 없이 저장 (메타데이터만 바뀐 재빌드 / HNSW 변경 등)
+        targets = plan['upsert']
+        if self.embedding_cache is not None and targets:
+            cached = self.embedding_cache.get_many(self.cache_model_key, [documents[row] for row in targets])
+            hits = [(row, vector) for row, vector in zip(targets, cached) if vector is not None]
+            targets = [row for row, vector in zip(targets, cached) if vector is None]
+            for start in range(0, len(hits), batch_size):
+                chunk = hits[start:start + batch_size]
+                save([row for row, _ in chunk], [vector for _, vector in chunk], "cached embeddings")
+            if hits:
+                print(f"💾 Embedding cache: {len(hits)} reused, {len(targets)} to embed")
+        
+        # 배치 임베딩 (동시 요청, 끝나는 순서대로 Chroma에 저장)
+        embedder = self.create_batch_embedder(batch_size)
+        total_batches = (len(targets) + batch_size - 1) // batch_size
+        
+        for batch_num, (start, embeddings) in enumerate(
+            embedder.embed_batches([documents[row] for row in targets]), 1
+        ):
+            # 재시도 후에도 실패한 레시피는 0 벡터로 넣지 않고 제외 (다음 실행에서 다시 시도)
+            rows = [targets[start + i] for i, embedding in enumerate(embeddings) if embedding is not None]
+            vectors = [embedding for embedding in embeddings if embedding is not None]
+            failed_ids.extend(ids[targets[start + i]] for i, embedding in enumerate(embeddings) if embedding is None)
+            
+            # 캐시 + Chroma에 저장
+            if rows:
+                if self.embedding_cache is not None:
+                    self.embedding_cache.put_many(self.cache_model_key, [documents[row] for row in rows], vectors)
+                save(rows, vectors, f"batch {batch_num}")
             
-            # Rate limiting (API 호출 제한 고려)
-            time.sleep(0.5)
+            print(f"📦 Batch {batch_num}/{total_batches} saved ({done}/{len(plan['upsert'])}, "
+                  f"{time.time() - start_time:.1f}s)")
+        
+        checkpoint.save(status='completed' if not failed_ids else 'partial')
         
         print(f"\n{'='*60}")
         print(f"🎉 VECTOR DB BUILD COMPLETED!")
         print(f"{'='*60}")
-        print(f"Total recipes: {len(recipes)}")
+        print(f"Total recipes: {len(ids)}")
+        print(f"Upserted: {done} (failed {len(failed_ids)}, metadata only {plan['updated']}, unchanged {plan['unchanged']}, "
+              f"removed {len(plan['delete'])})")
+        print(f"Requests: {embedder.stats['requests']} (retries {embedder.stats['retries']}, "
+              f"rate limited {embedder.stats['rate_limited']})")
+        print(f"Elapsed: {time.time() - start_time:.1f}s")
         print(f"Collection: {self.collection_name}")
         print(f"Path: {self.vectordb_path}")
         print(f"{'='*60}\n")
+        if failed_ids:
+            print(f"⚠️  Failed recipe IDs (not saved, retried on next build): "
+                  f"{failed_ids[:20]}{' ...' if len(failed_ids) > 20 else ''}")
         
         return True
     
@@ -306,7 +436,7 @@ def main():
     print("\n🚀 Starting Vector DB build...")
     builder.build_vectordb(
         input_file="data/recipes/normalized_recipes.json",
-        batch_size=10,
+        batch_size=100,
         force_rebuild=False
     )
     
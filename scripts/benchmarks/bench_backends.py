@@ -0,0 +1,135 @@
+"""
+검색 백엔드 벤치마크: Chroma(HNSW) vs NumPy(메모리 맵 정확 검색)
+- 실제 레시피 임베딩(없으면 무작위 벡터)에 노이즈를 더해 1k / 100k / 1M 규모 합성 레시피 생성
+- 단건 쿼리 지연(p50/p95), 배치 쿼리 처리량, NumPy 정확 검색 대비 Chroma recall@k 측정
+
+실행: python -m scripts.benchmarks.bench_backends --sizes 1000,100000,1000000 --chroma-max 100000
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from modules.vector_db.backends import ChromaBackend, NumpyBackend
+
+
+def load_base_vectors(db_path, collection_name, dim):
+    """실제 컬렉션 임베딩을 합성 데이터의 씨앗으로 사용 (없으면 무작위)"""
+    try:
+        import chromadb
+        collection = chromadb.PersistentClient(path=db_path).get_collection(collection_name)
+        data = collection.get(include=["embeddings"])
+        base = np.asarray(data['embeddings'], dtype=np.float32)
+        print(f"✅ 씨앗 벡터: '{collection_name}' {base.shape}")
+    except Exception as e:
+        print(f"⚠️ 컬렉션을 읽을 수 없어 무작위 씨앗 벡터 사용: {e}")
+        base = np.random.default_rng(0).standard_normal((1000, dim)).astype(np.float32)
+    return base / (np.linalg.norm(base, axis=1, keepdims=True) + 1e-12)
+
+
+def synthesize(base, n, path, noise=0.15, seed=0, block=100000):
+    """씨앗 벡터 + 가우시안 노이즈로 n개 합성 벡터를 메모리 맵 .npy로 생성"""
+    rng = np.random.default_rng(seed)
+    matrix = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(n, base.shape[1]))
+    for start in range(0, n, block):
+        size = min(block, n - start)
+        rows = base[rng.integers(0, len(base), size)]
+        rows = rows + noise * rng.standard_normal(rows.shape).astype(np.float32) / np.sqrt(base.shape[1])
+        matrix[start:start + size] = rows / np.linalg.norm(rows, axis=1, keepdims=True)
+    matrix.flush()
+    del matrix
+    return np.load(path, mmap_mode='r')
+
+
+def time_queries(backend, queries, k, batch_size):
+    """단건 지연(ms) 분포와 배치 처리량(QPS)"""
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        backend.query(q[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        backend.query(queries[i:i + batch_size], k)
+    batch_qps = len(queries) / (time.perf_counter() - start)
+
+    return {
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+        'batch_qps': round(batch_qps, 1),
+    }
+
+
+def recall_at_k(result, truth, k):
+    return round(float(np.mean([len(set(a[:k]) & set(b[:k])) / k for a, b in zip(result['ids'], truth['ids'])])), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chroma vs NumPy 검색 백엔드 벤치마크")
+    parser.add_argument("--db-path", default="./modules/vector_db/vectordb_recipes")
+    parser.add_argument("--collection", default="recipes_local_cosine")
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--chroma-max", type=int, default=100000, help="이 규모를 넘으면 Chroma 측정 생략 (구축 시간)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=75, help="쿼리당 후보 수 (hybrid_search 기본값 5 * 15)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--output", default=None, help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    base = load_base_vectors(args.db_path, args.collection, args.dim)
+    rng = np.random.default_rng(1)
+    queries = base[rng.integers(0, len(base), args.queries)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(base.shape[1])
+    queries = queries.astype(np.float32)
+
+    report = []
+    for n in [int(x) for x in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"\n{'='*60}\n📦 합성 레시피 {n:,}개\n{'='*60}")
+            start = time.perf_counter()
+            matrix = synthesize(base, n, Path(tmp) / "embeddings.npy")
+            ids = [f"synthetic_{i}" for i in range(n)]
+            print(f"   생성: {time.perf_counter() - start:.1f}s ({matrix.nbytes / 1e6:.0f} MB)")
+
+            numpy_backend = NumpyBackend(ids, matrix)
+            truth = numpy_backend.query(queries, args.k)
+            row = {'size': n, 'numpy': time_queries(numpy_backend, queries, args.k, args.batch_size)}
+            row['numpy']['recall'] = 1.0
+            print(f"   [numpy]  {row['numpy']}")
+
+            if n <= args.chroma_max:
+                import chromadb
+                client = chromadb.PersistentClient(path=str(Path(tmp) / "chroma"))
+                collection = client.create_collection("bench", metadata={"hnsw:space": "cosine"})
+                start = time.perf_counter()
+                for i in range(0, n, 5000):
+                    collection.add(ids=ids[i:i + 5000], embeddings=np.asarray(matrix[i:i + 5000]).tolist())
+                build_s = time.perf_counter() - start
+
+                chroma_backend = ChromaBackend(collection)
+                row['chroma'] = time_queries(chroma_backend, queries, args.k, args.batch_size)
+                row['chroma']['recall'] = recall_at_k(chroma_backend.query(queries, args.k), truth, args.k)
+                row['chroma']['build_s'] = round(build_s, 1)
+                print(f"   [chroma] {row['chroma']}")
+                del client
+            else:
+                print(f"   [chroma] 생략 (--chroma-max {args.chroma_max:,})")
+
+            del numpy_backend, matrix
+            report.append(row)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'k': args.k, 'queries': args.queries, 'results': report}, f, indent=2)
+        print(f"\n💾 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+압축 인덱스(IVF + PQ / int8) 메모리 / recall 리포트
+- 실제 레시피 임베딩(없으면 무작위 벡터)으로 10만 / 100만 규모 합성 레시피 생성
+    blobs: 레시피마다 노이즈만 더한 복제본 (bench_backends.py와 같은 방식, 레시피 1개당 수백~수천 개의 거의 같은 벡터)
+    mix:   레시피 두 개를 무작위 비율로 섞고 작은 노이즈 추가 (레시피 사이를 연속적으로 채움)
+- 레시피당 메모리: float32 원본 / HNSW(M=16) 추정 / IVF 압축 코드(검색 시 상주 크기)
+- NumPy 정확 검색 대비 recall@k, 단건 지연(p50/p95)을 nprobe x shortlist 조합별로 측정
+  (shortlist 0 = 원본 재계산 없이 압축 점수만 사용)
+
+실행: python -m scripts.benchmarks.bench_compressed --sizes 100000,1000000 --output compressed_report.json
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from modules.vector_db.backends import IVFBackend, NumpyBackend
+from modules.vector_db.quantization import IVFIndex
+from scripts.benchmarks.bench_backends import load_base_vectors, recall_at_k, synthesize
+
+MB = 2 ** 20
+
+
+def synthesize_mixed(base, n, path, noise=0.05, seed=0, block=100000):
+    """레시피 두 개를 무작위 비율로 섞은 합성 벡터를 메모리 맵 .npy로 생성"""
+    rng = np.random.default_rng(seed)
+    matrix = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(n, base.shape[1]))
+    for start in range(0, n, block):
+        size = min(block, n - start)
+        weight = rng.random((size, 1), dtype=np.float32)
+        rows = weight * base[rng.integers(0, len(base), size)] + (1 - weight) * base[rng.integers(0, len(base), size)]
+        rows = rows + noise * rng.standard_normal(rows.shape).astype(np.float32) / np.sqrt(base.shape[1])
+        matrix[start:start + size] = rows / np.linalg.norm(rows, axis=1, keepdims=True)
+    matrix.flush()
+    del matrix
+    return np.load(path, mmap_mode='r')
+
+
+def hnsw_bytes_per_vector(dim, M=16):
+    """hnswlib 레벨 0 한 행 크기: 벡터 + 링크(2M개) + 링크 수 + 라벨 (상위 레벨 링크 제외)"""
+    return dim * 4 + (2 * M + 1) * 4 + 8
+
+
+def latency_ms(backend, queries, k):
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        backend.query(q[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return round(float(np.percentile(latencies, 50)), 3), round(float(np.percentile(latencies, 95)), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF + PQ / int8 압축 인덱스 메모리 / recall 리포트")
+    parser.add_argument("--db-path", default="./modules/vector_db/vectordb_recipes")
+    parser.add_argument("--collection", default="recipes_local_cosine")
+    parser.add_argument("--sizes", default="100000,1000000")
+    parser.add_argument("--kinds", default="pq,sq8")
+    parser.add_argument("--m", type=int, default=None, help="PQ 부분 벡터 수 (기본 dim / 8)")
+    parser.add_argument("--synthetic", default="mix", choices=["mix", "blobs"], help="합성 방식")
+    parser.add_argument("--nprobe", default="4,8,16,32")
+    parser.add_argument("--shortlist", default="0,100,400", help="원본으로 다시 계산할 후보 수 (0이면 재계산 없음)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20, help="쿼리당 후보 수 (hybrid_search 첫 단계 5 x 4)")
+    parser.add_argument("--noise", type=float, default=None, help="합성 레시피 노이즈 크기 (기본 mix 0.05 / blobs 0.15)")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--output", default=None, help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    base = load_base_vectors(args.db_path, args.collection, args.dim)
+    dim = base.shape[1]
+    rng = np.random.default_rng(1)
+    queries = base[rng.integers(0, len(base), args.queries)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(dim)
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+    nprobes = [int(x) for x in args.nprobe.split(",")]
+    shortlists = [int(x) for x in args.shortlist.split(",")]
+    report = []
+    for n in [int(x) for x in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"\n{'='*60}\n📦 합성 레시피 {n:,}개 x {dim}차원 ({args.synthetic})\n{'='*60}")
+            if args.synthetic == "mix":
+                matrix = synthesize_mixed(base, n, Path(tmp) / "embeddings.npy", noise=args.noise or 0.05)
+            else:
+                matrix = synthesize(base, n, Path(tmp) / "embeddings.npy", noise=args.noise or 0.15)
+            ids = [f"synthetic_{i}" for i in range(n)]
+
+            start = time.perf_counter()
+            truth = NumpyBackend(ids, matrix).query(queries, args.k)
+            exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+            row = {
+                'size': n,
+                'dim': dim,
+                'float32_mb': round(n * dim * 4 / MB, 1),
+                'hnsw_m16_mb': round(n * hnsw_bytes_per_vector(dim) / MB, 1),
+                'exact_ms_per_query': round(exact_ms, 2),
+                'indexes': [],
+            }
+            print(f"   float32 {row['float32_mb']:,} MB / HNSW(M=16) 약 {row['hnsw_m16_mb']:,} MB "
+                  f"/ 정확 검색 {exact_ms:.1f} ms/쿼리")
+
+            for kind in args.kinds.split(","):
+                start = time.perf_counter()
+                index = IVFIndex.build(matrix, kind=kind, m=args.m)
+                build_s = time.perf_counter() - start
+                memory = index.memory_bytes()
+                entry = {
+                    'kind': kind,
+                    'nlist': index.nlist,
+                    'code_bytes_per_recipe': int(index.codes.shape[1] * index.codes.itemsize),
+                    'resident_mb': round(memory / MB, 1),
+                    'bytes_per_recipe': round(memory / n, 1),
+                    'compression_vs_float32': round(n * dim * 4 / memory, 1),
+                    'build_s': round(build_s, 1),
+                    'results': [],
+                }
+                print(f"\n   [{kind}] 리스트 {index.nlist}개, 상주 {entry['resident_mb']} MB "
+                      f"(레시피당 {entry['bytes_per_recipe']} B, float32 대비 1/{entry['compression_vs_float32']}), "
+                      f"학습+인코딩 {build_s:.1f}s")
+
+                for nprobe in nprobes:
+                    for shortlist in shortlists:
+                        backend = IVFBackend(ids, index, raw=matrix if shortlist else None,
+                                             nprobe=nprobe, shortlist=shortlist or None)
+                        recall = recall_at_k(backend.query(queries, args.k), truth, args.k)
+                        p50, p95 = latency_ms(backend, queries, args.k)
+                        entry['results'].append({
+                            'nprobe': nprobe, 'shortlist': shortlist, 'recall': recall, 'p50_ms': p50, 'p95_ms': p95,
+                        })
+                        print(f"      nprobe={nprobe:<3} shortlist={shortlist:<4} recall@{args.k}={recall:.4f} "
+                              f"p50={p50:.2f}ms p95={p95:.2f}ms")
+                row['indexes'].append(entry)
+                del index
+
+            del matrix
+            report.append(row)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'k': args.k, 'queries': args.queries, 'synthetic': args.synthetic, 'noise': args.noise,
+                       'results': report}, f, indent=2)
+        print(f"\n💾 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+인코더 백엔드 벤치마크: SentenceTransformer(torch fp32) vs ONNX Runtime 동적 int8
+- 정합성: 같은 텍스트에 대한 두 백엔드 임베딩의 코사인 유사도 (평균/최소), 검색 상위 k 일치율
+- 처리량: 배치 크기별 초당 인코딩 문장 수 (단건 쿼리 지연 포함)
+- 텍스트는 raw_recipes.json에서 reindex.py(레시피) / search.py(쿼리)와 같은 템플릿으로 생성
+
+실행: python -m scripts.benchmarks.bench_encoders --texts 512 --min-cosine 0.99 --output encoders.json
+      (최소 코사인 유사도가 기준 미만이면 종료 코드 1)
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from modules.vector_db.encoders import DEFAULT_ONNX_DIR, OnnxInt8Encoder, TorchEncoder
+from modules.vector_db.ingredient_vectors import build_query_text
+
+
+def load_texts(recipes_file, n, seed=0):
+    """레시피 문서 텍스트와 재료 쿼리 텍스트(표준 재료명 1~4개)를 절반씩 섞어서 생성"""
+    from scripts.scrapers.ingredient_normalizer import IngredientNormalizer
+
+    normalizer = IngredientNormalizer()
+    with open(recipes_file, 'r', encoding='utf-8') as f:
+        recipes = json.load(f)
+
+    rng = random.Random(seed)
+    texts = []
+    for recipe in rng.sample(recipes, min(n, len(recipes))):
+        if len(texts) % 2 == 0:
+            texts.append(f"요리명: {recipe.get('name', '')}, 재료: {recipe.get('ingredients', '')}")
+            continue
+        canonical = [ing['canonical'] for ing in normalizer.normalize_recipe_ingredients(recipe.get('ingredients', []))]
+        canonical = list(dict.fromkeys(ing for ing in canonical if ing)) or ['밥']
+        texts.append(build_query_text(rng.sample(canonical, min(len(canonical), rng.randint(1, 4)))))
+    return texts
+
+
+def parity(reference, candidate, texts, k=10):
+    """두 백엔드 임베딩의 코사인 유사도와 텍스트 간 상위 k 이웃 일치율"""
+    a = np.asarray(reference.encode(texts, batch_size=32, normalize_embeddings=True), dtype=np.float32)
+    b = np.asarray(candidate.encode(texts, batch_size=32, normalize_embeddings=True), dtype=np.float32)
+    cosine = (a * b).sum(axis=1)
+
+    k = min(k, len(texts) - 1)
+    top_a = np.argsort(-(a @ a.T), axis=1)[:, 1:k + 1]
+    top_b = np.argsort(-(b @ b.T), axis=1)[:, 1:k + 1]
+    overlap = [len(set(x) & set(y)) / k for x, y in zip(top_a, top_b)] if k > 0 else [1.0]
+
+    return {
+        'mean_cosine': round(float(cosine.mean()), 5),
+        'min_cosine': round(float(cosine.min()), 5),
+        f'top{k}_overlap': round(float(np.mean(overlap)), 4),
+    }
+
+
+def throughput(encoder, texts, batch_sizes, single_queries=50):
+    """배치 크기별 texts/sec와 단건 인코딩 지연(ms)"""
+    encoder.encode(texts[:8])  # 워밍업
+
+    result = {}
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        encoder.encode(texts, batch_size=batch_size)
+        result[f'batch{batch_size}_texts_per_s'] = round(len(texts) / (time.perf_counter() - start), 1)
+
+    latencies = []
+    for text in texts[:single_queries]:
+        start = time.perf_counter()
+        encoder.encode(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+    result['single_p50_ms'] = round(float(np.percentile(latencies, 50)), 2)
+    result['single_p95_ms'] = round(float(np.percentile(latencies, 95)), 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="torch vs ONNX int8 인코더 정합성/처리량 벤치마크")
+    parser.add_argument("--recipes", default="data/recipes/raw_recipes.json")
+    parser.add_argument("--onnx-dir", default=DEFAULT_ONNX_DIR)
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-sizes", default="1,32")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="텍스트별 최소 코사인 유사도 기준")
+    parser.add_argument("--output", default=None, help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    texts = load_texts(args.recipes, args.texts)
+    batch_sizes = [int(x) for x in args.batch_sizes.split(",")]
+    print(f"📝 텍스트 {len(texts)}개")
+
+    torch_encoder = TorchEncoder()
+    onnx_encoder = OnnxInt8Encoder(model_dir=args.onnx_dir)
+
+    report = {'texts': len(texts), 'parity': parity(torch_encoder, onnx_encoder, texts)}
+    print(f"🔍 정합성: {report['parity']}")
+
+    for encoder in (torch_encoder, onnx_encoder):
+        report[encoder.name] = throughput(encoder, texts, batch_sizes)
+        print(f"⏱️ [{encoder.name}] {report[encoder.name]}")
+
+    for key in report['torch']:
+        if key.endswith('texts_per_s'):
+            print(f"   {key}: x{report['onnx-int8'][key] / report['torch'][key]:.2f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 저장: {args.output}")
+
+    if report['parity']['min_cosine'] < args.min_cosine:
+        print(f"❌ 최소 코사인 유사도 {report['parity']['min_cosine']} < {args.min_cosine}")
+        sys.exit(1)
+    print("✅ 정합성 기준 통과")
+
+
+if __name__ == "__main__":
+    main()
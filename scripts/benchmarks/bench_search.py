@@ -0,0 +1,352 @@
+"""
+레시피 검색 벤치마크 (재현 가능한 합성 컬렉션 + 로컬 LLM 스텁)
+- raw_recipes.json을 바탕으로 원하는 크기의 합성 레시피 컬렉션 생성
+  (재료 일부 삭제/추가, 조리시간 등 메타데이터는 원본 분포에서 추출, 같은 요리명의 변형이 섞여 다양성 필터도 동작)
+- 레시피 재료에서 2~5개를 뽑은 현실적인 재료 쿼리 생성 (일부는 레시피에 없는 재료 1개 추가)
+- 요리명 정제는 결정적인 로컬 OpenAI 스텁(openai_stub.py) 사용 - API 키/네트워크 불필요
+- 측정: 단건 hybrid_search 지연 p50/p95/p99, 순차/배치 QPS, 단계별 평균 지연,
+        정확 검색(NumpyBackend) 대비 후보 recall@k, 최종 결과 일치율
+- 결과는 JSON으로 저장 (커밋 해시 포함) → --baseline으로 이전 결과와 비교
+
+실행:
+    python -m scripts.benchmarks.bench_search --sizes 1000,10000 --output bench_search.json
+    python -m scripts.benchmarks.bench_search --encoder hash --sizes 100000      # 모델 없이 빠르게 (의미 없는 해시 임베딩)
+    python -m scripts.benchmarks.bench_search --baseline old.json --output new.json
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from modules.vector_db.backends import NumpyBackend
+from modules.vector_db.encoders import load_encoder
+from modules.vector_db.metadata_store import numeric_metadata
+from modules.vector_db.metrics import MetricsRegistry
+from scripts.benchmarks.openai_stub import OpenAIStubServer
+
+COLLECTION_NAME = "recipes_local_cosine"
+
+
+class HashingEncoder:
+    """
+    모델 없이 쓰는 결정적 해시 임베딩 (토큰별 고정 난수 벡터의 합)
+    - 검색 품질과는 무관하고, 파이프라인 지연/처리량만 빠르게 재현할 때 사용
+    """
+
+    name = "hash"
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self._token_vectors = {}
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _token_vector(self, token):
+        vector = self._token_vectors.get(token)
+        if vector is None:
+            seed = int(hashlib.md5(token.encode('utf-8')).hexdigest()[:8], 16)
+            vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            self._token_vectors[token] = vector
+        return vector
+
+    def _encode_one(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r'[가-힣A-Za-z0-9]+', text):
+            vector += self._token_vector(token)
+        return vector
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, normalize_embeddings=False, **kwargs):
+        single = isinstance(texts, str)
+        matrix = np.stack([self._encode_one(text) for text in ([texts] if single else texts)]) \
+            if (single or texts) else np.zeros((0, self.dim), dtype=np.float32)
+        if normalize_embeddings:
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+        return matrix[0] if single else matrix
+
+
+# ============ 합성 데이터 ============
+
+def load_base_recipes(recipes_file):
+    """원본 레시피 + 표준 재료명 리스트"""
+    from scripts.scrapers.ingredient_normalizer import IngredientNormalizer
+
+    normalizer = IngredientNormalizer()
+    with open(recipes_file, 'r', encoding='utf-8') as f:
+        recipes = json.load(f)
+
+    base = []
+    for recipe in recipes:
+        canonical = recipe.get('ingredients_canonical')
+        if canonical is None:
+            canonical = [ing['canonical'] for ing in normalizer.normalize_recipe_ingredients(recipe.get('ingredients', []))]
+        canonical = list(dict.fromkeys(ing for ing in canonical if ing))
+        if canonical:
+            base.append((recipe, canonical))
+    return base
+
+
+def synthesize_recipes(base, size, seed=0):
+    """
+    원본 레시피를 변형해 size개 합성 레시피 생성
+
+    Returns:
+        [(id, 요리명, 재료 리스트, 메타데이터), ...]
+    """
+    rng = random.Random(seed)
+    vocab = sorted({ing for _, canonical in base for ing in canonical})
+    cooking_times = [recipe.get('cooking_time', '알 수 없음') for recipe, _ in base]
+    difficulties = [recipe.get('difficulty', '보통') for recipe, _ in base]
+
+    synthetic = []
+    for i in range(size):
+        recipe, canonical = base[i % len(base)]
+        if i < len(base):
+            ingredients = list(canonical)
+            cooking_time, difficulty = recipe.get('cooking_time', '알 수 없음'), recipe.get('difficulty', '보통')
+        else:
+            # 재료 20% 삭제, 0~2개 추가, 메타데이터는 원본 분포에서 추출
+            ingredients = [ing for ing in canonical if rng.random() > 0.2] or canonical[:1]
+            ingredients += rng.sample(vocab, rng.randint(0, 2))
+            ingredients = list(dict.fromkeys(ingredients))
+            cooking_time, difficulty = rng.choice(cooking_times), rng.choice(difficulties)
+
+        metadata = {
+            'name': recipe['name'],
+            'category': recipe.get('category', '기타'),
+            'difficulty': difficulty,
+            'cooking_time': cooking_time,
+            'servings': recipe.get('servings', 2),
+            'ingredients': json.dumps(ingredients, ensure_ascii=False),
+            'calories': 0,
+            'blog_url': f"{recipe.get('blog_url', 'https://example.com/recipe')}?v={i}",
+        }
+        metadata.update(numeric_metadata(metadata))
+        synthetic.append((f"synthetic_{i}", recipe['name'], ingredients, metadata))
+    return synthetic
+
+
+def generate_queries(synthetic, n_queries, seed=1, noise_rate=0.3):
+    """레시피 재료에서 2~5개를 뽑아 쿼리 생성 (일부는 다른 레시피 재료 1개를 섞음)"""
+    rng = random.Random(seed)
+    candidates = [ingredients for _, _, ingredients, _ in synthetic if len(ingredients) >= 2]
+    queries = []
+    for _ in range(n_queries):
+        ingredients = rng.choice(candidates)
+        query = rng.sample(ingredients, rng.randint(2, min(5, len(ingredients))))
+        if rng.random() < noise_rate:
+            query.append(rng.choice(rng.choice(candidates)))
+        queries.append(list(dict.fromkeys(query)))
+    return queries
+
+
+def build_collection(db_path, synthetic, encoder, batch_size=256):
+    """합성 레시피를 reindex.py와 같은 텍스트 형식으로 임베딩해 Chroma 컬렉션 생성"""
+    import chromadb
+
+    client = chromadb.PersistentClient(path=str(db_path))
+    try:
+        client.delete_collection(COLLECTION_NAME)
+    except Exception:
+        pass
+    collection = client.create_collection(name=COLLECTION_NAME, metadata={"hnsw:space": "cosine"})
+    for start in range(0, len(synthetic), batch_size):
+        batch = synthetic[start:start + batch_size]
+        texts = [f"요리명: {metadata['name']}, 재료: {metadata['ingredients']}" for _, _, _, metadata in batch]
+        vectors = np.asarray(encoder.encode(texts, batch_size=batch_size), dtype=np.float32)
+        collection.add(
+            ids=[recipe_id for recipe_id, _, _, _ in batch],
+            embeddings=vectors.tolist(),
+            metadatas=[metadata for _, _, _, metadata in batch],
+        )
+    return collection
+
+
+# ============ 측정 ============
+
+def percentiles(latencies_ms):
+    return {f'p{p}_ms': round(float(np.percentile(latencies_ms, p)), 2) for p in (50, 95, 99)}
+
+
+def candidate_recall(searcher, exact_backend, queries, k):
+    """같은 쿼리 벡터로 HNSW(Chroma) 후보와 정확 검색 후보를 비교한 recall@k"""
+    vectors = searcher.get_query_embeddings([searcher.canonicalize_ingredients(q) for q in queries])
+    approx = searcher.backend.query(vectors, k)
+    exact = exact_backend.query(vectors, k)
+    recalls = [len(set(a) & set(e)) / max(len(e), 1) for a, e in zip(approx['ids'], exact['ids'])]
+    return round(float(np.mean(recalls)), 4)
+
+
+def result_overlap(approx_results, exact_results):
+    """최종 결과(원본 요리명+URL) 일치율"""
+    overlaps = []
+    for approx, exact in zip(approx_results, exact_results):
+        exact_urls = {res['url'] for res in exact}
+        if exact_urls:
+            overlaps.append(len({res['url'] for res in approx} & exact_urls) / len(exact_urls))
+    return round(float(np.mean(overlaps)), 4) if overlaps else None
+
+
+def run_size(args, base, encoder, size, work_dir, stub_url):
+    """합성 컬렉션 하나를 만들어 측정"""
+    from openai import OpenAI
+
+    from modules.vector_db.search import RecipeSearcher
+
+    db_path = Path(work_dir) / f"db_{size}"
+    synthetic = synthesize_recipes(base, size, seed=args.seed)
+    queries = generate_queries(synthetic, args.queries, seed=args.seed + 1)
+
+    start = time.perf_counter()
+    build_collection(db_path, synthetic, encoder)
+    build_s = time.perf_counter() - start
+    print(f"   컬렉션 구축: {build_s:.1f}s")
+
+    registry = MetricsRegistry()
+    quiet = io.StringIO()
+    with contextlib.redirect_stdout(quiet):
+        searcher = RecipeSearcher(
+            db_path=str(db_path),
+            openai_client=OpenAI(api_key="stub", base_url=stub_url, max_retries=0),
+            encoder=encoder,
+            backend=args.backend,
+            latency_budget=args.latency_budget,
+            metrics=registry,
+        )
+        exact = RecipeSearcher(
+            db_path=str(db_path),
+            openai_client=OpenAI(api_key="stub", base_url=stub_url, max_retries=0),
+            encoder=encoder,
+            backend="numpy",
+            metrics=MetricsRegistry(),
+        )
+
+        # 워밍업 (캐시 영향 최소화를 위해 측정 쿼리와 다른 쿼리 사용)
+        for query in generate_queries(synthetic, 10, seed=args.seed + 99):
+            searcher.hybrid_search(query, n_results=args.n_results)
+
+        latencies = []
+        approx_results = []
+        wall = time.perf_counter()
+        for query in queries:
+            t0 = time.perf_counter()
+            approx_results.append(searcher.hybrid_search(query, n_results=args.n_results))
+            latencies.append((time.perf_counter() - t0) * 1000)
+        sequential_qps = len(queries) / (time.perf_counter() - wall)
+
+        # 배치 처리량은 임베딩/이름 캐시를 비운 새 조회 기준
+        searcher.embedding_cache.clear()
+        searcher.name_cache.clear()
+        wall = time.perf_counter()
+        for i in range(0, len(queries), args.batch_size):
+            searcher.hybrid_search_many(queries[i:i + args.batch_size], n_results=args.n_results)
+        batch_qps = len(queries) / (time.perf_counter() - wall)
+
+        exact_results = exact.hybrid_search_many(queries, n_results=args.n_results)
+        exact_backend = exact.backend if isinstance(exact.backend, NumpyBackend) else None
+        recall = candidate_recall(searcher, exact_backend, queries, args.k) if exact_backend else None
+
+    stage_snapshot = registry.stage_seconds.snapshot()
+    stages = {
+        key.split("stage=")[1]: round(value['avg'] * 1000, 3)
+        for key, value in stage_snapshot.items() if key.startswith("kind=hybrid_search,")
+    }
+    row = {
+        'size': size,
+        'build_s': round(build_s, 1),
+        **percentiles(latencies),
+        'sequential_qps': round(sequential_qps, 1),
+        'batch_qps': round(batch_qps, 1),
+        f'candidate_recall@{args.k}': recall,
+        f'result_overlap@{args.n_results}': result_overlap(approx_results, exact_results),
+        'stage_avg_ms': stages,
+        'fetch': searcher.fetch_stats(),
+        'cache_hit_rate': registry.snapshot()['cache_hit_rate'],
+    }
+    searcher.name_pool.shutdown()
+    exact.name_pool.shutdown()
+    return row
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(report, baseline_path):
+    """이전 결과 JSON과 규모별 주요 지표 비교 출력"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {row['size']: row for row in json.load(f)['results']}
+    print(f"\n📊 기준 결과 대비 ({baseline_path})")
+    for row in report['results']:
+        old = baseline.get(row['size'])
+        if not old:
+            continue
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'sequential_qps', 'batch_qps'):
+            if old.get(key):
+                print(f"   [{row['size']:,}] {key}: {old[key]} → {row[key]} ({(row[key] - old[key]) / old[key] * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="레시피 검색 벤치마크 (합성 컬렉션 + 로컬 LLM 스텁)")
+    parser.add_argument("--recipes", default="data/recipes/raw_recipes.json")
+    parser.add_argument("--sizes", default="1000,10000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--n-results", type=int, default=5)
+    parser.add_argument("--k", type=int, default=20, help="후보 recall@k의 k")
+    parser.add_argument("--batch-size", type=int, default=16, help="hybrid_search_many 배치 크기")
+    parser.add_argument("--backend", default="chroma", help="측정할 검색 백엔드 (chroma / numpy)")
+    parser.add_argument("--encoder", default="torch", help="torch / onnx-int8 / hash")
+    parser.add_argument("--llm-delay", type=float, default=0.05, help="스텁 LLM 응답 지연(초)")
+    parser.add_argument("--latency-budget", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", default=None, help="합성 DB 경로 (기본: 임시 디렉터리, 실행 후 삭제)")
+    parser.add_argument("--baseline", default=None, help="비교할 이전 결과 JSON")
+    parser.add_argument("--output", default=None, help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    encoder = HashingEncoder() if args.encoder == "hash" else load_encoder(args.encoder)
+    base = load_base_recipes(args.recipes)
+    print(f"✅ 원본 레시피 {len(base)}개, 인코더 {args.encoder}")
+
+    stub = OpenAIStubServer(delay=args.llm_delay).start()
+    report = {
+        'commit': git_commit(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline', 'work_dir')},
+        'results': [],
+    }
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            work_dir = args.work_dir or tmp
+            for size in [int(x) for x in args.sizes.split(",")]:
+                print(f"\n{'='*60}\n📦 합성 레시피 {size:,}개\n{'='*60}")
+                row = run_size(args, base, encoder, size, work_dir, stub.base_url)
+                print(json.dumps(row, indent=2, ensure_ascii=False))
+                report['results'].append(row)
+    finally:
+        stub.stop()
+
+    if args.baseline:
+        compare(report, args.baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+VectorDBBuilder 배치/동시 임베딩 확인
+- 로컬 OpenAI 스텁 서버(openai_stub.py)의 /v1/embeddings로 실제 키/네트워크 없이 검증
+  1) 배치+동시 요청이 레시피 1개씩 순차 요청보다 빠른지 (요청 수 / 소요 시간)
+  2) 500 오류는 재시도로 복구되고, 재시도해도 실패하는 입력(400)만 제외되는지 (0 벡터 없음)
+  3) 분당 한도가 있을 때 응답 헤더로 토큰 버킷이 설정되어 429 없이(또는 retry-after를 지켜) 모두 저장되는지
+  4) 증분 빌드: 바뀐/새 레시피만 임베딩하고 없어진 레시피는 삭제, 실패했던 레시피는 다음 실행에서 이어서 처리
+  5) 임베딩 캐시: 텍스트가 그대로인 전체 재빌드(force_rebuild, HNSW 변경 등)는 API 호출 없음
+
+실행: python -m scripts.benchmarks.embedding_build_check
+"""
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from modules.vector_db.vectordb_builder import VectorDBBuilder
+from scripts.benchmarks.openai_stub import OpenAIStubServer
+
+INGREDIENTS = ["감자", "양파", "돼지고기", "김치", "두부", "계란", "대파", "마늘", "애호박", "당근"]
+
+
+def check(label, ok, detail=""):
+    print(f"{'✅' if ok else '❌'} {label} {detail}")
+    return ok
+
+
+def make_recipes(n, bad_every=None):
+    recipes = []
+    for i in range(n):
+        name = f"테스트요리{i}" + ("불량입력" if bad_every and i % bad_every == 0 else "")
+        recipes.append({
+            'id': f"recipe_{i}",
+            'name': name,
+            'category': '반찬',
+            'ingredients_canonical': [INGREDIENTS[(i + j) % len(INGREDIENTS)] for j in range(3)],
+            'description': f"{name} 설명",
+        })
+    return recipes
+
+
+def build(tmp, server, recipes, batch_size, concurrency, name, force_rebuild=True, **kw):
+    input_file = Path(tmp) / f"{name}.json"
+    with open(input_file, 'w', encoding='utf-8') as f:
+        json.dump(recipes, f, ensure_ascii=False)
+    builder = VectorDBBuilder(
+        openai_api_key="stub",
+        vectordb_path=str(Path(tmp) / name),
+        collection_name=name,
+        openai_base_url=server.base_url,
+        max_concurrency=concurrency,
+        embedding_cache_path=str(Path(tmp) / f"cache_{name}"),
+        **kw
+    )
+    start = time.perf_counter()
+    builder.build_vectordb(str(input_file), batch_size=batch_size, force_rebuild=force_rebuild)
+    return builder, time.perf_counter() - start
+
+
+def main(n_recipes=200, delay=0.05):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # 1) 순차(1개씩) vs 배치+동시
+        server = OpenAIStubServer(delay=delay).start()
+        _, serial_s = build(tmp, server, make_recipes(n_recipes), 1, 1, "serial")
+        serial_requests = server.embedding_stats['requests']
+        builder, batched_s = build(tmp, server, make_recipes(n_recipes), 50, 4, "batched")
+        batched_requests = server.embedding_stats['requests'] - serial_requests
+        server.stop()
+        results.append(check("배치 요청 수", batched_requests == -(-n_recipes // 50),
+                             f"(순차 {serial_requests}회 → 배치 {batched_requests}회)"))
+        results.append(check("배치+동시 속도", batched_s < serial_s / 5,
+                             f"(순차 {serial_s:.2f}s → 배치 {batched_s:.2f}s)"))
+        results.append(check("전체 저장", builder.collection.count() == n_recipes, f"({builder.collection.count()}개)"))
+
+        # 2) 500 오류 재시도 + 400 입력 분리
+        server = OpenAIStubServer(delay=0.01, error_rate=0.3, bad_keyword="불량입력").start()
+        recipes = make_recipes(n_recipes, bad_every=40)
+        n_bad = sum("불량입력" in recipe['name'] for recipe in recipes)
+        builder, _ = build(tmp, server, recipes, 20, 4, "flaky")
+        server.stop()
+        stored = builder.collection.get(include=["embeddings"])
+        norms = np.linalg.norm(np.asarray(stored['embeddings']), axis=1)
+        results.append(check("500 오류 재시도 후 저장", builder.collection.count() == n_recipes - n_bad,
+                             f"({builder.collection.count()}개 저장, 400 입력 {n_bad}개 제외, "
+                             f"스텁 오류 {server.embedding_stats['errors']}회)"))
+        results.append(check("0 벡터 없음", bool((norms > 0.5).all())))
+        results.append(check("400 입력만 제외", not any("불량입력" in m['name'] for m in builder.collection.get()['metadatas'])))
+
+        # 3) 분당 한도 (창을 3초로 줄여 빠르게 확인)
+        server = OpenAIStubServer(delay=0.01, requests_per_minute=10, rate_window=3.0).start()
+        builder, elapsed = build(tmp, server, make_recipes(48), 4, 4, "limited")
+        server.stop()
+        stats = server.embedding_stats
+        results.append(check("한도 초과 후 모두 저장", builder.collection.count() == 48,
+                             f"({stats['requests']}회 요청, 429 {stats['rate_limited']}회, {elapsed:.1f}s)"))
+        results.append(check("429 최소화", stats['rate_limited'] <= 4))
+
+        # 4) 증분 빌드: 10개 수정 + 5개 삭제 + 15개 추가 → 25개만 임베딩
+        server = OpenAIStubServer(delay=0.01).start()
+        recipes = make_recipes(n_recipes)
+        build(tmp, server, recipes, 50, 4, "incremental")
+        before = server.embedding_stats['inputs']
+        updated = recipes[5:] + make_recipes(n_recipes + 15)[n_recipes:]
+        for recipe in updated[:10]:
+            recipe['description'] += " (수정)"
+        builder, _ = build(tmp, server, updated, 50, 4, "incremental", force_rebuild=False)
+        embedded = server.embedding_stats['inputs'] - before
+        results.append(check("바뀐 레시피만 임베딩", embedded == 25, f"({embedded}개 임베딩)"))
+        results.append(check("삭제 반영", builder.collection.count() == len(updated)
+                             and not builder.collection.get(ids=["recipe_0"])['ids'],
+                             f"({builder.collection.count()}개)"))
+        server.stop()
+
+        # 실패(중단)한 레시피는 다음 실행에서 그것만 다시 임베딩
+        server = OpenAIStubServer(delay=0.01, bad_keyword="불량입력").start()
+        recipes = make_recipes(n_recipes, bad_every=10)
+        build(tmp, server, recipes, 20, 4, "resume")
+        server.bad_keyword = None
+        before = server.embedding_stats['inputs']
+        builder, _ = build(tmp, server, recipes, 20, 4, "resume", force_rebuild=False)
+        server.stop()
+        resumed = server.embedding_stats['inputs'] - before
+        results.append(check("실패분만 이어서 처리", resumed == n_recipes // 10 and builder.collection.count() == n_recipes,
+                             f"({resumed}개 재시도, {builder.collection.count()}개 저장)"))
+
+        # 5) 같은 텍스트로 HNSW 파라미터만 바꿔 전체 재빌드 → 캐시에서 읽어 API 호출 없음
+        server = OpenAIStubServer(delay=0.01).start()
+        build(tmp, server, make_recipes(n_recipes), 50, 4, "cached")
+        before = server.embedding_stats['requests']
+        builder, _ = build(tmp, server, make_recipes(n_recipes), 50, 4, "cached", hnsw_M=32)
+        server.stop()
+        results.append(check("캐시로 재빌드", server.embedding_stats['requests'] == before
+                             and builder.collection.count() == n_recipes,
+                             f"(API 요청 {server.embedding_stats['requests'] - before}회, "
+                             f"캐시 {builder.embedding_cache.stats()})"))
+
+    print(f"\n{'🎉 모두 통과' if all(results) else '⚠️ 일부 실패'} ({sum(results)}/{len(results)})")
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
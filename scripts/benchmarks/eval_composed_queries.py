@@ -0,0 +1,122 @@
+"""
+재료 벡터 합성 쿼리 평가
+- 합성 벡터(ingredient_vectors.py)가 실제 SentenceTransformer 인코딩과 얼마나 가까운지 측정
+  1) 코사인 유사도 (합성 vs 실제)
+  2) recall@k: 실제 인코딩으로 찾은 상위 k개 레시피 중 합성 벡터로도 찾은 비율 (정확 검색 기준)
+- 쿼리는 컬렉션 레시피의 재료에서 2~5개를 무작위로 뽑아 생성
+
+실행: python -m scripts.benchmarks.eval_composed_queries --queries 500 --k 5
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from modules.vector_db.ingredient_vectors import (
+    COMPOSE_MODES,
+    DEFAULT_DIR,
+    MODEL_NAME,
+    IngredientVectorTable,
+    build_query_text,
+)
+
+
+def load_collection(db_path, collection_name, page_size=1000):
+    """컬렉션 전체 임베딩(정규화)과 재료 목록 로드"""
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=db_path).get_collection(collection_name)
+    embeddings, ingredient_lists = [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "metadatas"], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        embeddings.append(np.asarray(page['embeddings'], dtype=np.float32))
+        ingredient_lists.extend(json.loads(m.get('ingredients', '[]')) for m in page['metadatas'])
+        offset += len(page['ids'])
+
+    matrix = np.vstack(embeddings)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+    return matrix, ingredient_lists
+
+
+def sample_queries(ingredient_lists, table, n_queries, seed=42):
+    """레시피 재료에서 사전에 있는 재료 2~5개를 뽑아 쿼리 생성 (정렬된 튜플)"""
+    rng = random.Random(seed)
+    candidates = [[ing for ing in dict.fromkeys(ings) if ing in table] for ings in ingredient_lists]
+    candidates = [ings for ings in candidates if len(ings) >= 2]
+
+    queries = []
+    while len(queries) < n_queries and candidates:
+        ings = rng.choice(candidates)
+        queries.append(tuple(sorted(rng.sample(ings, rng.randint(2, min(5, len(ings)))))))
+    return queries
+
+
+def top_k(matrix, vectors, k):
+    """정규화된 행렬곱 + argpartition 정확 검색"""
+    vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+    scores = vectors @ matrix.T
+    return np.argpartition(-scores, k, axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="재료 벡터 합성 쿼리 평가 (recall@k)")
+    parser.add_argument("--db-path", default="./modules/vector_db/vectordb_recipes")
+    parser.add_argument("--collection", default="recipes_local_cosine")
+    parser.add_argument("--table", default=DEFAULT_DIR)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", default=None, help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    table = IngredientVectorTable.load(args.table)
+    matrix, ingredient_lists = load_collection(args.db_path, args.collection)
+    queries = sample_queries(ingredient_lists, table, args.queries)
+    print(f"📊 레시피 {matrix.shape[0]}개, 재료 사전 {len(table)}종, 쿼리 {len(queries)}개")
+
+    model = SentenceTransformer(MODEL_NAME, device='cpu')
+    start = time.perf_counter()
+    true_vectors = np.asarray(model.encode([build_query_text(q) for q in queries]), dtype=np.float32)
+    encode_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    true_top = top_k(matrix, true_vectors, args.k)
+
+    report = {'queries': len(queries), 'k': args.k, 'model_encode_ms_per_query': round(encode_ms, 3), 'modes': {}}
+    for mode in COMPOSE_MODES:
+        start = time.perf_counter()
+        composed = np.stack([table.compose(q, mode=mode) for q in queries])
+        compose_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        cosine = np.sum(
+            (composed / np.linalg.norm(composed, axis=1, keepdims=True))
+            * (true_vectors / np.linalg.norm(true_vectors, axis=1, keepdims=True)),
+            axis=1
+        )
+        composed_top = top_k(matrix, composed, args.k)
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(true_top, composed_top)])
+
+        report['modes'][mode] = {
+            'cosine_mean': round(float(cosine.mean()), 4),
+            'cosine_p5': round(float(np.percentile(cosine, 5)), 4),
+            f'recall@{args.k}': round(float(recall), 4),
+            'compose_ms_per_query': round(compose_ms, 4),
+        }
+        print(f"   [{mode}] cos={cosine.mean():.4f} (p5 {np.percentile(cosine, 5):.4f}) "
+              f"recall@{args.k}={recall:.4f} | 합성 {compose_ms:.3f}ms vs 인코딩 {encode_ms:.2f}ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+LLM 요리명 정제의 동시성 / 마감 시간 동작 확인
+- 로컬 OpenAI 스텁 서버(openai_stub.py)에 요청별 지연을 주입하여 검증
+  1) 캐시 미스 5개가 순차가 아닌 동시에 처리되는지
+  2) 느린 응답이 있어도 마감 시간 안에 반환되고, 해당 이름은 규칙 기반으로 대체되는지
+  3) 마감 후 늦게 도착한 결과가 캐시에 저장되어 다음 검색에서 LLM 호출이 없는지
+
+실행: python -m scripts.benchmarks.llm_deadline_check
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from openai import OpenAI
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from modules.vector_db.name_cleaner import (
+    CleanedNameCache,
+    ConcurrentNameCleaner,
+    LLMNameCleaner,
+    clean_recipe_name,
+)
+from scripts.benchmarks.openai_stub import OpenAIStubServer, stub_clean_name
+
+NAMES = [
+    "[176.오트밀과일빵(2025.11.7)]",
+    "아삭한 콩나물무침 레시피 만들기",
+    "입맛 돋구는 양파덮밥 레시피!",
+    "초간단 계란말이 만드는 법",
+    "느린응답 김치찌개 황금레시피",
+]
+
+
+def check(label, ok, detail=""):
+    print(f"{'✅' if ok else '❌'} {label} {detail}")
+    return ok
+
+
+def main(fast_delay=0.3, slow_delay=3.0, budget=1.0):
+    server = OpenAIStubServer(delay=fast_delay, delays={"느린응답": slow_delay}).start()
+    client = OpenAI(api_key="stub", base_url=server.base_url, max_retries=0, timeout=10.0)
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = CleanedNameCache(Path(tmp) / "cleaned_names.sqlite3")
+        pool = ConcurrentNameCleaner(LLMNameCleaner(client), cache, max_workers=5)
+
+        # 1) 빠른 요청 4개: 순차라면 4 * fast_delay, 동시라면 약 fast_delay
+        start = time.perf_counter()
+        cleaned, stats = pool.clean_many(NAMES[:4])
+        elapsed = time.perf_counter() - start
+        results.append(check("동시 요청", elapsed < 2 * fast_delay, f"({elapsed:.2f}s, 순차 시 {4 * fast_delay:.2f}s)"))
+        results.append(check("스텁 응답 사용", all(cleaned[n] == stub_clean_name(n) for n in NAMES[:4]), str(stats)))
+
+        # 2) 느린 요청 1개 포함 + 마감 시간 적용 (캐시에 없는 이름만 요청)
+        misses = [n for n in NAMES if cache.get(n) is None]
+        start = time.perf_counter()
+        cleaned, stats = pool.clean_many(misses, deadline=time.perf_counter() + budget)
+        elapsed = time.perf_counter() - start
+        results.append(check("마감 시간 준수", elapsed < budget + 0.2, f"({elapsed:.2f}s, 예산 {budget:.2f}s)"))
+        results.append(check(
+            "마감 초과 → 규칙 기반 대체",
+            stats['timed_out'] == 1 and cleaned[NAMES[4]] == clean_recipe_name(NAMES[4]),
+            str(stats)
+        ))
+
+        # 3) 늦게 도착한 결과가 캐시에 저장되었는지
+        time.sleep(slow_delay)
+        requests_before = server.request_count
+        cached = cache.get_many(NAMES)
+        results.append(check("지연 결과 캐시 저장", len(cached) == len(NAMES), f"({len(cached)}/{len(NAMES)})"))
+        results.append(check("캐시 히트 시 LLM 호출 없음", server.request_count == requests_before))
+
+        pool.shutdown()
+        cache.close()
+
+    server.stop()
+    print(f"\n{'🎉 모두 통과' if all(results) else '⚠️ 실패 항목 있음'} ({sum(results)}/{len(results)})")
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,119 @@
+"""
+검색 마이크로서비스 부하 테스트
+- 동시 사용자(세션) N명이 각자 keep-alive 연결로 /search를 반복 호출
+- 쿼리는 raw_recipes.json 재료를 표준 재료명으로 정규화해 2~5개씩 뽑아 생성
+- 지연 p50/p95/p99, 처리량(QPS), 오류 수, 서버 배치 통계(/stats) 출력
+
+실행:
+    python -m sever.search_server.server                       # 서버 (다른 터미널)
+    python -m scripts.benchmarks.load_test_search_service --sessions 64 --requests 20
+    (배치 효과 비교: 서버를 SEARCH_MAX_BATCH=1 로 띄워 같은 부하를 다시 실행)
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import requests
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+
+def load_queries(recipes_file, n_queries, seed=0):
+    """레시피 재료(표준 재료명)에서 2~5개를 뽑아 쿼리 생성"""
+    from scripts.scrapers.ingredient_normalizer import IngredientNormalizer
+
+    normalizer = IngredientNormalizer()
+    with open(recipes_file, 'r', encoding='utf-8') as f:
+        recipes = json.load(f)
+
+    candidates = []
+    for recipe in recipes:
+        canonical = [ing['canonical'] for ing in normalizer.normalize_recipe_ingredients(recipe.get('ingredients', []))]
+        canonical = list(dict.fromkeys(ing for ing in canonical if ing))
+        if len(canonical) >= 2:
+            candidates.append(canonical)
+
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n_queries):
+        ings = rng.choice(candidates)
+        queries.append(rng.sample(ings, rng.randint(2, min(5, len(ings)))))
+    return queries
+
+
+def run_session(url, queries, think_s, latencies, errors, lock):
+    """세션 하나: 같은 연결로 쿼리를 순서대로 요청"""
+    session = requests.Session()
+    for ingredients in queries:
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{url}/search", json={"ingredients": ingredients, "n_results": 5}, timeout=30)
+            response.raise_for_status()
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed * 1000)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+        if think_s:
+            time.sleep(think_s)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="검색 마이크로서비스 부하 테스트")
+    parser.add_argument("--url", default="http://localhost:8090")
+    parser.add_argument("--recipes", default="data/recipes/raw_recipes.json")
+    parser.add_argument("--sessions", type=int, default=32, help="동시 세션 수")
+    parser.add_argument("--requests", type=int, default=20, help="세션당 요청 수")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="세션별 요청 간 대기 시간(ms)")
+    parser.add_argument("--output", default=None, help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    url = args.url.rstrip('/')
+    health = requests.get(f"{url}/health", timeout=10).json()
+    print(f"🩺 서버 상태: {health}")
+
+    queries = load_queries(args.recipes, args.sessions * args.requests)
+    per_session = [queries[i::args.sessions] for i in range(args.sessions)]
+
+    latencies, errors, lock = [], [], threading.Lock()
+    print(f"🚀 세션 {args.sessions}개 x 요청 {args.requests}개 시작...")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        for session_queries in per_session:
+            executor.submit(run_session, url, session_queries, args.think_ms / 1000, latencies, errors, lock)
+    elapsed = time.perf_counter() - start
+
+    report = {
+        'sessions': args.sessions,
+        'requests': len(latencies) + len(errors),
+        'errors': len(errors),
+        'elapsed_s': round(elapsed, 2),
+        'qps': round(len(latencies) / elapsed, 1),
+    }
+    if latencies:
+        for p in (50, 95, 99):
+            report[f'p{p}_ms'] = round(float(np.percentile(latencies, p)), 1)
+    try:
+        report['server'] = requests.get(f"{url}/stats", timeout=10).json()
+    except Exception as e:
+        print(f"⚠️ /stats 조회 실패: {e}")
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if errors:
+        print(f"❌ 오류 예시: {errors[0]}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
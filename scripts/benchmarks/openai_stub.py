@@ -0,0 +1,238 @@
+"""
+로컬 OpenAI API 스텁 서버
+- 실제 API 키/네트워크 없이 LLM 정제 경로를 재현 가능하게 테스트하기 위한 용도
+- /v1/chat/completions: 결정적(deterministic) 요리명 정제 응답
+- /v1/embeddings: 텍스트 해시 기반 결정적 단위 벡터 (input 리스트 지원)
+  + 분당 요청/토큰 한도 흉내 (x-ratelimit-* 헤더, 한도 초과 시 429 + retry-after)
+  + 오류 주입 (error_rate 비율로 500, bad_keyword가 포함된 입력은 400)
+- 요청별 지연 시간 주입 가능 (기본 지연 + 요리명 키워드별 지연)
+
+사용 예:
+    server = OpenAIStubServer(delay=0.1, delays={"느린": 5.0}).start()
+    client = OpenAI(api_key="stub", base_url=server.base_url)
+    ...
+    server.stop()
+
+단독 실행: python scripts/benchmarks/openai_stub.py --port 8765 --delay 0.2
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def stub_clean_name(raw_name):
+    """결정적인 요리명 정제: 한글 단어 중 가장 긴 것을 요리명으로 간주"""
+    words = re.findall(r'[가-힣]+', raw_name)
+    return max(words, key=len) if words else raw_name
+
+
+class OpenAIStubServer:
+    """OpenAI 호환 로컬 스텁 서버 (별도 스레드에서 실행)"""
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0, delays=None, delay_fn=None,
+                 embedding_dim=1536, requests_per_minute=None, tokens_per_minute=None,
+                 error_rate=0.0, bad_keyword=None, rate_window=60.0, seed=0):
+        """
+        Args:
+            host, port: 바인딩 주소 (port=0이면 빈 포트 자동 선택)
+            delay: 모든 요청의 기본 지연(초)
+            delays: {키워드: 지연(초)} - 요청 본문에 키워드가 있으면 해당 지연 적용
+            delay_fn: 요청 본문(dict)을 받아 지연(초)을 반환하는 함수 (가장 우선)
+            embedding_dim: /v1/embeddings 벡터 차원
+            requests_per_minute, tokens_per_minute: /v1/embeddings 분당 한도 (None이면 무제한)
+            error_rate: /v1/embeddings 요청 중 500으로 실패시킬 비율
+            bad_keyword: 이 문자열이 포함된 입력이 있으면 400 (재시도해도 실패하는 입력 흉내)
+            rate_window: 한도 창 길이(초) - 테스트를 빨리 끝내기 위해 60초보다 짧게 줄일 수 있음
+        """
+        self.delay = delay
+        self.delays = delays or {}
+        self.delay_fn = delay_fn
+        self.embedding_dim = embedding_dim
+        self.limits = {'requests': requests_per_minute, 'tokens': tokens_per_minute}
+        self.error_rate = error_rate
+        self.bad_keyword = bad_keyword
+        self.rate_window = rate_window
+        self._random = random.Random(seed)
+        self._window_start = time.monotonic()
+        self._used = {'requests': 0, 'tokens': 0}
+        self.request_count = 0
+        self.embedding_stats = {'requests': 0, 'inputs': 0, 'rate_limited': 0, 'errors': 0}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def delay_for(self, body):
+        """요청 본문에 적용할 지연 시간 계산"""
+        if self.delay_fn is not None:
+            return self.delay_fn(body)
+        text = json.dumps(body, ensure_ascii=False)
+        for keyword, seconds in self.delays.items():
+            if keyword in text:
+                return seconds
+        return self.delay
+
+    def chat_completion(self, body):
+        """프롬프트 마지막 '입력: [...]'의 요리명을 결정적으로 정제해 응답"""
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        match = re.findall(r'입력: \[(.*)\]', prompt)
+        raw_name = match[-1] if match else prompt
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": stub_clean_name(raw_name)},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def embedding(self, text):
+        """텍스트 해시로 시드를 정한 결정적 단위 벡터"""
+        seed = int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "little")
+        rng = random.Random(seed)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.embedding_dim)]
+        norm = sum(value * value for value in vector) ** 0.5
+        return [value / norm for value in vector]
+
+    def _rate_limit(self, tokens):
+        """고정 창(rate_window초) 한도 확인 → (허용 여부, 응답 헤더)"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.rate_window:
+                self._window_start = now
+                self._used = {'requests': 0, 'tokens': 0}
+            reset = self.rate_window - (now - self._window_start)
+            cost = {'requests': 1, 'tokens': tokens}
+            allowed = all(
+                limit is None or self._used[kind] + cost[kind] <= limit
+                for kind, limit in self.limits.items()
+            )
+            if allowed:
+                for kind in cost:
+                    self._used[kind] += cost[kind]
+            headers = {}
+            for kind, limit in self.limits.items():
+                if limit is None:
+                    continue
+                headers[f"x-ratelimit-limit-{kind}"] = str(limit)
+                headers[f"x-ratelimit-remaining-{kind}"] = str(max(0, limit - self._used[kind]))
+                headers[f"x-ratelimit-reset-{kind}"] = f"{reset:.3f}s"
+            if not allowed:
+                headers["retry-after"] = f"{reset:.3f}"
+            return allowed, headers
+
+    def embeddings(self, body):
+        """(상태 코드, 응답 본문, 헤더)"""
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        allowed, headers = self._rate_limit(sum(len(text) for text in inputs))
+        with self._lock:
+            self.embedding_stats['requests'] += 1
+            if not allowed:
+                self.embedding_stats['rate_limited'] += 1
+            failed = allowed and self._random.random() < self.error_rate
+            if failed:
+                self.embedding_stats['errors'] += 1
+        if not allowed:
+            return 429, {"error": {"message": "Rate limit reached", "type": "requests"}}, headers
+        if failed:
+            return 500, {"error": {"message": "stub internal error", "type": "server_error"}}, headers
+        if self.bad_keyword and any(self.bad_keyword in text for text in inputs):
+            return 400, {"error": {"message": "invalid input", "type": "invalid_request_error"}}, headers
+
+        with self._lock:
+            self.embedding_stats['inputs'] += len(inputs)
+        payload = {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": self.embedding(text)}
+                for i, text in enumerate(inputs)
+            ],
+            "model": body.get("model", "stub"),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+        return 200, payload, headers
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.request_count += 1
+
+                time.sleep(server.delay_for(body))
+
+                if self.path.endswith("/chat/completions"):
+                    self._send_json(200, server.chat_completion(body))
+                elif self.path.endswith("/embeddings"):
+                    self._send_json(*server.embeddings(body))
+                else:
+                    self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 OpenAI API 스텁 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="기본 응답 지연(초)")
+    parser.add_argument("--rpm", type=int, default=None, help="/v1/embeddings 분당 요청 한도")
+    parser.add_argument("--tpm", type=int, default=None, help="/v1/embeddings 분당 토큰 한도")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="/v1/embeddings 500 오류 비율")
+    args = parser.parse_args()
+
+    server = OpenAIStubServer(
+        host=args.host, port=args.port, delay=args.delay,
+        requests_per_minute=args.rpm, tokens_per_minute=args.tpm, error_rate=args.error_rate
+    ).start()
+    print(f"✅ OpenAI 스텁 서버 실행 중: {server.base_url} (OPENAI_BASE_URL로 지정하세요)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
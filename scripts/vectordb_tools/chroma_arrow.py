@@ -0,0 +1,257 @@
+"""
+Chroma 컬렉션 ↔ Parquet / Arrow 스트리밍 내보내기 / 가져오기 (임베딩 포함)
+- limit/offset 페이지 단위로 읽어 페이지마다 Parquet row group(또는 Arrow 레코드 배치)으로 기록 → 메모리는 페이지 크기만큼
+- 컬럼: id(string), document(string, null 가능), embedding(fixed_size_list<float32>[dim]), metadata(JSON string)
+  메타데이터는 레시피마다 키가 달라도 되도록 JSON 문자열로 저장 (str/int/float/bool 타입 그대로 복원)
+- 컬렉션 이름 / 메타데이터(hnsw:* / tuning:*) / 차원 / 개수는 스키마 메타데이터(b"chroma")에 기록
+- 가져오기는 재임베딩 없이 배치 add → 노드 사이 인덱스 복사용
+  --alias를 주면 새 버전 컬렉션으로 가져온 뒤 별칭 교체 (검색 서비스 무중단, collection_alias.py 참고)
+
+형식: 확장자 .parquet(기본) / .arrow, .feather (Arrow IPC 파일)
+
+실행:
+    python -m scripts.vectordb_tools.chroma_arrow export recipes_local_cosine recipes.parquet
+    python -m scripts.vectordb_tools.chroma_arrow import recipes.parquet --db-path /data/vectordb --alias recipes_local_cosine
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import chromadb
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from modules.vector_db.collection_alias import CollectionAliases, versioned_name
+
+PERSIST_DIR = "./modules/vector_db/vectordb_recipes"
+SCHEMA_KEY = b"chroma"
+FORMAT_VERSION = 1
+PAGE_SIZE = 1000
+IPC_SUFFIXES = (".arrow", ".feather", ".ipc")
+
+
+def arrow_schema(dim, info):
+    return pa.schema(
+        [
+            pa.field("id", pa.string(), nullable=False),
+            pa.field("document", pa.string()),
+            pa.field("embedding", pa.list_(pa.float32(), dim)),
+            pa.field("metadata", pa.string()),
+        ],
+        metadata={SCHEMA_KEY: json.dumps(info, ensure_ascii=False).encode("utf-8")},
+    )
+
+
+def page_to_batch(page, schema, dim):
+    """Chroma get() 결과 한 페이지 → Arrow 레코드 배치 (임베딩은 복사 한 번으로 고정 길이 리스트)"""
+    embeddings = np.asarray(page['embeddings'], dtype=np.float32).reshape(-1)
+    documents = page.get('documents') or [None] * len(page['ids'])
+    return pa.record_batch(
+        [
+            pa.array(page['ids'], type=pa.string()),
+            pa.array(documents, type=pa.string()),
+            pa.FixedSizeListArray.from_arrays(pa.array(embeddings, type=pa.float32()), dim),
+            pa.array([json.dumps(metadata, ensure_ascii=False) if metadata is not None else None
+                      for metadata in page['metadatas']], type=pa.string()),
+        ],
+        schema=schema,
+    )
+
+
+class _Writer:
+    """Parquet / Arrow IPC 공통 쓰기"""
+
+    def __init__(self, path, schema, compression, ipc):
+        self.ipc = ipc
+        if ipc:
+            self._sink = pa.OSFile(str(path), "wb")
+            self._writer = pa.ipc.new_file(self._sink, schema)
+        else:
+            self._writer = pq.ParquetWriter(str(path), schema, compression=compression)
+
+    def write(self, batch):
+        if self.ipc:
+            self._writer.write_batch(batch)
+        else:
+            self._writer.write_table(pa.Table.from_batches([batch]))
+
+    def close(self):
+        self._writer.close()
+        if self.ipc:
+            self._sink.close()
+
+
+def export_collection(collection, path, page_size=PAGE_SIZE, compression="zstd"):
+    """
+    컬렉션을 페이지 단위로 Parquet / Arrow 파일에 기록
+
+    Returns:
+        {'rows', 'dim', 'seconds', 'bytes'}
+    """
+    start = time.perf_counter()
+    total = collection.count()
+    first = collection.get(include=["embeddings"], limit=1)
+    if not first['ids']:
+        raise ValueError(f"빈 컬렉션: {collection.name}")
+    dim = len(first['embeddings'][0])
+    info = {
+        'format_version': FORMAT_VERSION,
+        'name': collection.name,
+        'metadata': collection.metadata or {},
+        'dim': dim,
+        'count': total,
+        'chromadb': chromadb.__version__,
+        'exported_at': time.time(),
+    }
+    schema = arrow_schema(dim, info)
+
+    # 다 쓰기 전에는 임시 이름 (중간에 실패해도 불완전한 파일이 완성본처럼 남지 않음)
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    writer = _Writer(tmp_path, schema, compression, ipc=path.suffix in IPC_SUFFIXES)
+    rows = 0
+    try:
+        offset = 0
+        while True:
+            page = collection.get(include=["embeddings", "metadatas", "documents"], limit=page_size, offset=offset)
+            if not page['ids']:
+                break
+            writer.write(page_to_batch(page, schema, dim))
+            rows += len(page['ids'])
+            offset += len(page['ids'])
+            print(f"   내보내기 {rows}/{total}")
+    finally:
+        writer.close()
+    tmp_path.replace(path)
+
+    return {
+        'rows': rows,
+        'dim': dim,
+        'seconds': round(time.perf_counter() - start, 2),
+        'bytes': path.stat().st_size,
+    }
+
+
+def read_info(path):
+    """파일의 컬렉션 정보 (스키마 메타데이터)"""
+    path = Path(path)
+    if path.suffix in IPC_SUFFIXES:
+        with pa.memory_map(str(path), "r") as source:
+            schema = pa.ipc.open_file(source).schema
+    else:
+        schema = pq.read_schema(str(path))
+    return json.loads(schema.metadata[SCHEMA_KEY])
+
+
+def iter_batches(path, batch_size):
+    """파일을 레코드 배치 단위로 읽기 (전체를 메모리에 올리지 않음)"""
+    path = Path(path)
+    if path.suffix in IPC_SUFFIXES:
+        with pa.memory_map(str(path), "r") as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                for start in range(0, batch.num_rows, batch_size):
+                    yield batch.slice(start, batch_size)
+    else:
+        yield from pq.ParquetFile(str(path)).iter_batches(batch_size=batch_size)
+
+
+def import_collection(client, path, name=None, overwrite=False, batch_size=PAGE_SIZE):
+    """
+    내보낸 파일을 새 컬렉션으로 가져오기 (임베딩 그대로 사용, 재임베딩 없음)
+
+    Args:
+        name: 새 컬렉션 이름 (기본: 내보낸 컬렉션 이름)
+        overwrite: 같은 이름의 컬렉션이 있으면 삭제 후 가져오기
+
+    Returns:
+        (새 컬렉션, {'rows', 'seconds'})
+    """
+    start = time.perf_counter()
+    info = read_info(path)
+    name = name or info['name']
+    # Chroma 0.6은 이름 리스트, 이전 버전은 Collection 리스트를 반환
+    existing = [c if isinstance(c, str) else c.name for c in client.list_collections()]
+    if name in existing:
+        if not overwrite:
+            raise ValueError(f"이미 있는 컬렉션: {name} (--overwrite 또는 --name 사용)")
+        client.delete_collection(name)
+
+    # HNSW 설정 등 컬렉션 메타데이터 그대로 생성 (HNSW 파라미터는 생성 시에만 적용)
+    collection = client.create_collection(name=name, metadata=info['metadata'] or None)
+    batch_size = min(batch_size, client.get_max_batch_size())
+    rows = 0
+    try:
+        for batch in iter_batches(path, batch_size):
+            dim = batch.schema.field("embedding").type.list_size
+            embeddings = batch.column("embedding").flatten().to_numpy(zero_copy_only=False).reshape(-1, dim)
+            documents = batch.column("document").to_pylist()
+            metadatas = [json.loads(m) if m is not None else None for m in batch.column("metadata").to_pylist()]
+            collection.add(
+                ids=batch.column("id").to_pylist(),
+                embeddings=embeddings,
+                metadatas=metadatas if any(m is not None for m in metadatas) else None,
+                documents=documents if any(d is not None for d in documents) else None,
+            )
+            rows += batch.num_rows
+            print(f"   가져오기 {rows}/{info['count']}")
+    except BaseException:
+        # 만들다 만 컬렉션은 남기지 않음
+        client.delete_collection(name)
+        raise
+
+    if collection.count() != info['count']:
+        print(f"⚠️ 개수 불일치: 파일 {info['count']}개, 컬렉션 {collection.count()}개")
+    return collection, {'rows': rows, 'seconds': round(time.perf_counter() - start, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chroma 컬렉션 Parquet / Arrow 내보내기 / 가져오기 (임베딩 포함)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="컬렉션 → 파일")
+    export_parser.add_argument("collection", help="컬렉션 이름 또는 별칭")
+    export_parser.add_argument("output", help="출력 파일 (.parquet / .arrow)")
+    export_parser.add_argument("--db-path", default=PERSIST_DIR)
+    export_parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    export_parser.add_argument("--compression", default="zstd", help="Parquet 압축 (zstd / snappy / none)")
+
+    import_parser = sub.add_parser("import", help="파일 → 새 컬렉션")
+    import_parser.add_argument("input", help="내보낸 파일 (.parquet / .arrow)")
+    import_parser.add_argument("--db-path", default=PERSIST_DIR)
+    import_parser.add_argument("--name", default=None, help="새 컬렉션 이름 (기본: 내보낸 컬렉션 이름)")
+    import_parser.add_argument("--alias", default=None, help="새 버전으로 가져온 뒤 이 별칭을 교체")
+    import_parser.add_argument("--overwrite", action="store_true", help="같은 이름의 컬렉션이 있으면 삭제")
+    import_parser.add_argument("--batch-size", type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=args.db_path)
+    if args.command == "export":
+        collection = client.get_collection(CollectionAliases(args.db_path).resolve(args.collection))
+        compression = None if args.compression == "none" else args.compression
+        print(f"🚀 '{collection.name}' 내보내기 → {args.output}")
+        stats = export_collection(collection, args.output, page_size=args.page_size, compression=compression)
+        print(f"✨ 완료! {stats}")
+        return
+
+    name = versioned_name(args.alias) if args.alias else args.name
+    print(f"🚀 {args.input} 가져오기...")
+    collection, stats = import_collection(client, args.input, name=name, overwrite=args.overwrite,
+                                          batch_size=args.batch_size)
+    print(f"✨ 완료! '{collection.name}' {stats}")
+    if args.alias:
+        aliases = CollectionAliases(args.db_path)
+        previous = aliases.switch(args.alias, collection.name)
+        print(f"🔁 '{args.alias}': '{previous}' → '{collection.name}'")
+        deleted = aliases.garbage_collect(client, args.alias)
+        if deleted:
+            print(f"🧹 이전 버전 삭제: {deleted}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,434 @@
+"""
+Chroma 컬렉션 상태 / 성능 점검
+컬렉션마다:
+- 벡터 차원 / 거리 함수 / HNSW 파라미터 (컬렉션 메타데이터 + 디스크의 hnswlib header.bin 실제 값)
+- 디스크 크기 (HNSW 세그먼트 디렉토리, NumPy/IVF 인덱스, chroma.sqlite3는 전체 공유) / 상주 크기 (추정 + 첫 쿼리 전후 RSS 차이)
+- 삭제되었지만 인덱스에 남은 항목(tombstone) / 할당만 된 빈 자리 → 부풀어 오른 인덱스
+- 메타데이터 필드별 개수 / 서로 다른 값 수 / 타입
+- 0 벡터, NaN/Inf 벡터, 차원이 다른 벡터 (예전 vectordb_builder는 임베딩 실패 시 0 벡터를 넣었음), 벡터 norm 분포
+- 프로브 쿼리 벤치마크: 저장된 벡터 근처의 쿼리로 단건 지연(p50/p95) + 정확 검색 대비 recall@k
+  (정확 검색은 페이지를 읽으면서 top-k를 갱신 → 전체 임베딩을 메모리에 올리지 않음)
+문제가 있으면 ⚠️로 표시, --strict면 종료 코드 1 (배포 전 점검용)
+
+실행:
+    python -m scripts.vectordb_tools.inspect_chroma
+    python -m scripts.vectordb_tools.inspect_chroma --collection recipes_local_cosine --probes 100 --json report.json --strict
+"""
+import argparse
+import json
+import os
+import sqlite3
+import struct
+import sys
+import time
+from pathlib import Path
+
 import chromadb
-from pprint import pprint
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from modules.vector_db.collection_alias import VERSION_SEPARATOR, CollectionAliases
+from modules.vector_db.hnsw import collection_hnsw_params
 
 PERSIST_DIR = "./modules/vector_db/vectordb_recipes"
+PAGE_SIZE = 1000
+MB = 2 ** 20
+
+# Chroma가 저장하는 hnswlib header.bin: 저장 형식 버전 + hnswlib 헤더
+HNSW_HEADER = struct.Struct("<i6QiI3QdQ")
+HNSW_HEADER_FIELDS = (
+    "version", "offset_level0", "max_elements", "element_count", "size_data_per_element",
+    "label_offset", "offset_data", "max_level", "enterpoint", "max_m", "max_m0", "M", "mult", "construction_ef",
+)
+
+# 경고 기준
+MIN_RECALL = 0.9
+MAX_TOMBSTONE_RATIO = 0.2
+MAX_CAPACITY_RATIO = 2.0
+
+
+# ============ 디스크 ============
+
+def dir_bytes(path, recursive=True):
+    path = Path(path)
+    if not path.is_dir():
+        return 0
+    files = path.rglob("*") if recursive else path.iterdir()
+    return sum(f.stat().st_size for f in files if f.is_file())
+
+
+def hnsw_segment_dir(db_path, collection_id):
+    """컬렉션의 HNSW 세그먼트 디렉토리 (chroma.sqlite3의 segments 테이블, 읽기 전용으로 조회)"""
+    try:
+        conn = sqlite3.connect(f"file:{Path(db_path) / 'chroma.sqlite3'}?mode=ro", uri=True)
+        try:
+            row = conn.execute(
+                "SELECT id FROM segments WHERE collection = ? AND scope = 'VECTOR'", (str(collection_id),)
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"⚠️ 세그먼트 조회 실패: {e}")
+        return None
+    return Path(db_path) / row[0] if row else None
+
+
+def read_hnsw_header(segment_dir):
+    """hnswlib 헤더 (아직 디스크에 쓰이지 않았으면 None)"""
+    try:
+        with open(Path(segment_dir) / "header.bin", "rb") as f:
+            values = HNSW_HEADER.unpack(f.read(HNSW_HEADER.size))
+    except (OSError, struct.error):
+        return None
+    header = dict(zip(HNSW_HEADER_FIELDS, values))
+    header["dim"] = (header["label_offset"] - header["offset_data"]) // 4
+    return header
+
+
+def side_index_bytes(db_path, name):
+    """검색기의 NumPy / IVF 인덱스 크기 (버전 컬렉션은 numpy_index/<이름>, 별칭 도입 전 컬렉션은 numpy_index 바로 아래)"""
+    root = Path(db_path) / "numpy_index"
+    if VERSION_SEPARATOR in name:
+        return dir_bytes(root / name)
+    return dir_bytes(root, recursive=False) + dir_bytes(root / "ivf")
+
+
+def rss_bytes():
+    """현재 프로세스 RSS (리눅스 /proc, 없으면 None)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# ============ 벡터 / 메타데이터 스캔 ============
+
+def similarity(space, queries, vectors):
+    """Chroma 거리 함수와 같은 순서의 점수 (클수록 가까움)"""
+    if space == "cosine":
+        vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+        return queries @ vectors.T
+    if space == "ip":
+        return queries @ vectors.T
+    return 2 * queries @ vectors.T - (vectors ** 2).sum(axis=1)[None, :]
+
+
+def pick_probes(collection, count, n_probes, space, seed=0):
+    """저장된 벡터에 작은 노이즈를 더한 프로브 쿼리 (0 벡터는 제외)"""
+    rng = np.random.default_rng(seed)
+    probes = []
+    for offset in rng.choice(count, size=min(n_probes, count), replace=False):
+        vector = np.asarray(collection.get(include=["embeddings"], limit=1, offset=int(offset))['embeddings'][0],
+                            dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0 or not np.isfinite(norm):
+            continue
+        probes.append(vector + 0.3 * norm * rng.standard_normal(vector.shape).astype(np.float32) / np.sqrt(len(vector)))
+    if not probes:
+        return None
+    probes = np.stack(probes)
+    if space == "cosine":
+        probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+    return probes
+
+
+def scan_collection(collection, space, probes, k, page_size=PAGE_SIZE, max_distinct=10000):
+    """
+    페이지 단위로 임베딩/메타데이터를 읽으며 벡터 상태, 메타데이터 카디널리티, 프로브의 정확 top-k 계산
+
+    Returns:
+        (벡터 통계 dict, 메타데이터 필드 dict, 프로브별 정확 top-k id 리스트)
+    """
+    dims = {}
+    zero, non_finite = [], []
+    norms = []
+    fields = {}
+    best_scores = np.full((len(probes), 0), -np.inf, dtype=np.float32) if probes is not None else None
+    best_ids = np.zeros((len(best_scores), 0), dtype=object) if probes is not None else None
+
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "metadatas"], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        offset += len(page['ids'])
+
+        for metadata in page['metadatas']:
+            for key, value in (metadata or {}).items():
+                field = fields.setdefault(key, {'present': 0, 'values': set(), 'types': set(), 'capped': False})
+                field['present'] += 1
+                field['types'].add(type(value).__name__)
+                if not field['capped']:
+                    field['values'].add(value)
+                    if len(field['values']) > max_distinct:
+                        field['capped'] = True
+                        field['values'] = set()
+
+        lengths = [len(e) for e in page['embeddings']]
+        for length in lengths:
+            dims[length] = dims.get(length, 0) + 1
+        dim = max(set(lengths), key=lengths.count)
+        keep = [i for i, length in enumerate(lengths) if length == dim]
+        vectors = np.asarray([page['embeddings'][i] for i in keep], dtype=np.float32)
+        page_ids = np.asarray([page['ids'][i] for i in keep], dtype=object)
+
+        page_norms = np.linalg.norm(vectors, axis=1)
+        finite = np.isfinite(page_norms)
+        non_finite.extend(page_ids[~finite].tolist())
+        zero.extend(page_ids[finite & (page_norms == 0)].tolist())
+        norms.append(page_norms[finite & (page_norms > 0)])
+
+        if probes is not None and dim == probes.shape[1]:
+            usable = finite & (page_norms > 0)
+            scores = similarity(space, probes, vectors[usable])
+            scores = np.concatenate([best_scores, scores], axis=1)
+            ids = np.concatenate([best_ids, np.broadcast_to(page_ids[usable], (len(probes), usable.sum()))], axis=1)
+            top = np.argsort(-scores, axis=1)[:, :k]
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_ids = np.take_along_axis(ids, top, axis=1)
+
+    norms = np.concatenate(norms) if norms else np.zeros(0, dtype=np.float32)
+    vectors_stats = {
+        'dims': dims,
+        'zero_vectors': len(zero),
+        'zero_vector_ids': zero[:10],
+        'non_finite_vectors': len(non_finite),
+        'non_finite_ids': non_finite[:10],
+        'norm': {
+            'min': round(float(norms.min()), 4), 'mean': round(float(norms.mean()), 4), 'max': round(float(norms.max()), 4),
+        } if len(norms) else None,
+    }
+    field_stats = {
+        key: {
+            'present': field['present'],
+            'distinct': f">{max_distinct}" if field['capped'] else len(field['values']),
+            'types': sorted(field['types']),
+        }
+        for key, field in sorted(fields.items())
+    }
+    truth = best_ids.tolist() if best_ids is not None else None
+    return vectors_stats, field_stats, truth
+
+
+# ============ 프로브 벤치마크 ============
+
+def cold_query(collection, dim):
+    """
+    인덱스를 처음 메모리에 올리는 쿼리의 시간 / RSS 증가 (다른 조회보다 먼저 호출해야 의미 있음,
+    임베딩 get도 HNSW 세그먼트를 로드함)
+    """
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    collection.query(query_embeddings=np.random.default_rng(0).standard_normal((1, dim)).astype(np.float32),
+                     n_results=1, include=["distances"])
+    first_ms = (time.perf_counter() - start) * 1000
+    rss_after = rss_bytes()
+    return {
+        'first_query_ms': round(first_ms, 1),
+        'load_rss_mb': round((rss_after - rss_before) / MB, 1) if rss_before is not None and rss_after is not None else None,
+    }
+
+
+def probe_benchmark(collection, probes, truth, k):
+    """단건 지연, 배치 처리량, recall@k"""
+    latencies, found = [], []
+    for probe in probes:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=probe[None, :], n_results=k, include=["distances"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(result['ids'][0])
+
+    start = time.perf_counter()
+    collection.query(query_embeddings=probes, n_results=k, include=["distances"])
+    batch_s = time.perf_counter() - start
+
+    recall = float(np.mean([len(set(f) & set(t)) / max(len(t), 1) for f, t in zip(found, truth)]))
+    return {
+        'probes': len(probes),
+        'k': k,
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+        'batch_qps': round(len(probes) / batch_s, 1) if batch_s > 0 else None,
+        'recall': round(recall, 4),
+    }
+
+
+# ============ 점검 ============
+
+def inspect_collection(client, db_path, name, aliases, probes=50, k=10, page_size=PAGE_SIZE):
+    collection = client.get_collection(name)
+    count = collection.count()
+    params = collection_hnsw_params(collection)
+    space = params['space']
+    report = {
+        'name': name,
+        'aliases': [alias for alias, entry in aliases.items() if entry.get('collection') == name],
+        'count': count,
+        'space': space,
+        'hnsw': {key: params[key] for key in ('M', 'construction_ef', 'search_ef', 'tuned_search_ef')},
+        'metadata': collection.metadata or {},
+        'warnings': [],
+    }
+    warnings = report['warnings']
+
+    # 디스크 / 상주 크기
+    segment_dir = hnsw_segment_dir(db_path, collection.id)
+    header = read_hnsw_header(segment_dir) if segment_dir else None
+    report['disk'] = {
+        'hnsw_segment_mb': round(dir_bytes(segment_dir) / MB, 2) if segment_dir else None,
+        'side_index_mb': round(side_index_bytes(db_path, name) / MB, 2),
+    }
+    if header and count:
+        report['load'] = cold_query(collection, header['dim'])
+    if header:
+        resident = header['max_elements'] * header['size_data_per_element'] + dir_bytes(segment_dir / "link_lists.bin")
+        report['index'] = {
+            'dim': header['dim'],
+            'M': header['M'],
+            'construction_ef': header['construction_ef'],
+            'max_elements': header['max_elements'],
+            'element_count': header['element_count'],
+            'tombstones': max(header['element_count'] - count, 0),
+            'bytes_per_element': header['size_data_per_element'],
+            'estimated_resident_mb': round(resident / MB, 2),
+        }
+        index = report['index']
+        if header['M'] != params['M'] or header['construction_ef'] != params['construction_ef']:
+            warnings.append(f"메타데이터 HNSW 파라미터(M={params['M']}, construction_ef={params['construction_ef']})와 "
+                            f"인덱스 실제 값(M={header['M']}, construction_ef={header['construction_ef']})이 다름")
+        if count and index['tombstones'] / count > MAX_TOMBSTONE_RATIO:
+            warnings.append(f"삭제된 항목 {index['tombstones']}개가 인덱스에 남아 있음 → tune_hnsw / reindex로 재구축")
+        if count and header['max_elements'] / count > MAX_CAPACITY_RATIO:
+            warnings.append(f"할당 용량 {header['max_elements']}개가 실제 {count}개의 {MAX_CAPACITY_RATIO:g}배 초과")
+        if header['element_count'] < count:
+            report['index']['note'] = "header.bin이 최신이 아님 (아직 디스크에 쓰이지 않은 추가분)"
+    elif count:
+        report['index'] = None
+        report['index_note'] = "디스크에 HNSW 인덱스가 없음 (아직 디스크에 쓰이지 않았거나 다른 세그먼트 형식)"
+
+    if not count:
+        warnings.append("빈 컬렉션")
+        return report
+
+    # 벡터 / 메타데이터 스캔 + 프로브 정답
+    probe_queries = pick_probes(collection, count, probes, space) if probes else None
+    vectors, fields, truth = scan_collection(collection, space, probe_queries, k, page_size=page_size)
+    report['vectors'] = vectors
+    report['metadata_fields'] = fields
+    report['dim'] = max(vectors['dims'], key=vectors['dims'].get)
+    if len(vectors['dims']) > 1:
+        warnings.append(f"차원이 다른 벡터가 섞여 있음: {vectors['dims']}")
+    if vectors['zero_vectors']:
+        warnings.append(f"0 벡터 {vectors['zero_vectors']}개 (임베딩 실패 흔적, 예: {vectors['zero_vector_ids'][:3]})")
+    if vectors['non_finite_vectors']:
+        warnings.append(f"NaN/Inf 벡터 {vectors['non_finite_vectors']}개 (예: {vectors['non_finite_ids'][:3]})")
+    missing = {key: count - field['present'] for key, field in fields.items() if field['present'] < count}
+    if missing:
+        report['metadata_missing'] = missing
+
+    # 프로브 쿼리 벤치마크
+    if probe_queries is not None:
+        report['benchmark'] = probe_benchmark(collection, probe_queries, truth, min(k, count))
+        if report['benchmark']['recall'] < MIN_RECALL:
+            warnings.append(f"recall@{k} {report['benchmark']['recall']:.3f} < {MIN_RECALL} → search_ef / M 조정 필요 (tune_hnsw)")
+    return report
+
+
+def print_report(report):
+    print(f"\n{'='*60}\n📦 {report['name']}" + (f"  (별칭: {', '.join(report['aliases'])})" if report['aliases'] else ""))
+    print(f"{'='*60}")
+    print(f"   개수 {report['count']:,} / 차원 {report.get('dim')} / 거리 {report['space']}")
+    hnsw = report['hnsw']
+    print(f"   HNSW: M={hnsw['M']} construction_ef={hnsw['construction_ef']} search_ef={hnsw['search_ef']}"
+          + (f" (튜닝 {hnsw['tuned_search_ef']})" if hnsw['tuned_search_ef'] else ""))
+    disk = report['disk']
+    print(f"   디스크: HNSW {disk['hnsw_segment_mb']} MB / NumPy·IVF 인덱스 {disk['side_index_mb']} MB")
+    index = report.get('index')
+    if index:
+        print(f"   인덱스: 용량 {index['max_elements']:,} / 항목 {index['element_count']:,} "
+              f"(tombstone {index['tombstones']:,}) / 항목당 {index['bytes_per_element']} B "
+              f"/ 상주 추정 {index['estimated_resident_mb']} MB")
+        if index.get('note'):
+            print(f"   ℹ️ {index['note']}")
+    elif report.get('index_note'):
+        print(f"   ℹ️ {report['index_note']}")
+
+    vectors = report.get('vectors')
+    if vectors:
+        print(f"   벡터: 0 벡터 {vectors['zero_vectors']} / NaN·Inf {vectors['non_finite_vectors']} / norm {vectors['norm']}")
+    if report.get('metadata_fields'):
+        print("   메타데이터 필드 (개수 / 서로 다른 값 / 타입):")
+        for key, field in report['metadata_fields'].items():
+            print(f"      {key:<28} {field['present']:>8,} {str(field['distinct']):>8}  {','.join(field['types'])}")
+
+    bench = report.get('benchmark')
+    if bench:
+        print(f"   프로브 {bench['probes']}개 (k={bench['k']}): recall {bench['recall']:.4f} / "
+              f"p50 {bench['p50_ms']} ms / p95 {bench['p95_ms']} ms / 배치 {bench['batch_qps']} QPS")
+    load = report.get('load')
+    if load:
+        print(f"   첫 쿼리(인덱스 로드) {load['first_query_ms']} ms / RSS +{load['load_rss_mb']} MB")
+
+    for warning in report['warnings']:
+        print(f"   ⚠️ {warning}")
+    if not report['warnings']:
+        print("   ✅ 문제 없음")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chroma 컬렉션 상태 / 성능 점검")
+    parser.add_argument("--db-path", default=PERSIST_DIR)
+    parser.add_argument("--collection", action="append", default=None,
+                        help="점검할 컬렉션 이름 또는 별칭 (여러 번 지정 가능, 기본: 전체)")
+    parser.add_argument("--probes", type=int, default=50, help="프로브 쿼리 수 (0이면 벤치마크 생략)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--json", default=None, help="결과 JSON 저장 경로")
+    parser.add_argument("--strict", action="store_true", help="경고가 있으면 종료 코드 1")
+    args = parser.parse_args()
+
+    if not (Path(args.db_path) / "chroma.sqlite3").exists():
+        # PersistentClient는 없는 경로에 빈 DB를 만들어 버리므로 먼저 확인
+        print(f"❌ Chroma DB 없음: {args.db_path}")
+        sys.exit(1)
+    client = chromadb.PersistentClient(path=args.db_path)
+    alias_store = CollectionAliases(args.db_path)
+    aliases = alias_store.load()
+    if args.collection:
+        names = [alias_store.resolve(name) for name in args.collection]
+    else:
+        # Chroma 0.6은 이름 리스트, 이전 버전은 Collection 리스트를 반환
+        names = sorted(c if isinstance(c, str) else c.name for c in client.list_collections())
+    if not names:
+        print("No collections found.")
+        return
+
+    print(f"🔍 {args.db_path}: 컬렉션 {len(names)}개 "
+          f"(chroma.sqlite3 {round(os.path.getsize(Path(args.db_path) / 'chroma.sqlite3') / MB, 2)} MB 공유)")
+    reports = []
+    for name in names:
+        try:
+            report = inspect_collection(client, args.db_path, name, aliases,
+                                        probes=args.probes, k=args.k, page_size=args.page_size)
+        except Exception as e:
+            report = {'name': name, 'warnings': [f"점검 실패: {e}"]}
+            print(f"\n❌ {name} 점검 실패: {e}")
+        else:
+            print_report(report)
+        reports.append(report)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2, default=str)
+        print(f"\n💾 저장: {args.json}")
+
+    warned = [report['name'] for report in reports if report['warnings']]
+    if warned:
+        print(f"\n⚠️ 경고가 있는 컬렉션: {warned}")
+        if args.strict:
+            sys.exit(1)
+
 
-client = chromadb.PersistentClient(path=PERSIST_DIR)
-
-cols = client.list_collections()
-print("Collections:")
-for c in cols:
-    print("-", c.name)
-
-if cols:
-    col = client.get_collection(cols[0].name)
-    print("\nCount:", col.count())
-
-    sample = col.get(
-        include=["documents", "metadatas"],
-        # include=["documents", "metadatas", "embeddings"],
-        limit=5
-    )
-    pprint(sample)
-else:
-    print("No collections found.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
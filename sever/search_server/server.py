@@ -0,0 +1,147 @@
+"""
+레시피 검색 마이크로서비스
+- RecipeSearcher(ko-sroberta + Chroma)를 프로세스 하나에서만 로드하고 여러 Streamlit 세션이 공유
+- 동시에 들어온 /search 요청을 몇 ms 모아 hybrid_search_many로 한 번에 인코딩/조회 (micro_batcher.py)
+
+실행 (저장소 루트에서): python -m sever.search_server.server
+Streamlit 쪽: SEARCH_SERVICE_URL=http://localhost:8090 설정 시 services.get_dish_candidates가 이 서비스를 호출
+
+환경변수:
+    SEARCH_DB_PATH          Chroma DB 경로 (기본 ./modules/vector_db/vectordb_recipes)
+    SEARCH_BACKEND          chroma / numpy / ivf (IVF+PQ 압축 인덱스, 대용량용)
+    SEARCH_IVF_KIND         ivf 백엔드 잔차 압축 방식 pq / sq8 (기본 pq)
+    SEARCH_IVF_NPROBE       ivf 백엔드 쿼리당 탐색 리스트 수 (기본 8)
+    SEARCH_IVF_SHORTLIST    ivf 백엔드 원본 벡터로 다시 계산할 후보 수 (기본 max(n_results x 4, 400))
+    SEARCH_HNSW_EF          Chroma HNSW 검색 탐색 폭 (기본: 컬렉션 튜닝 결과, tune_hnsw.py 참고)
+    SEARCH_BATCH_WAIT_MS    요청을 모으는 최대 시간 (기본 5)
+    SEARCH_MAX_BATCH        배치당 최대 요청 수 (기본 32)
+    SEARCH_WORKERS          배치 처리 워커 수 (기본 2)
+    SEARCH_METRICS_LOG      검색 계측 JSON-lines 파일 경로 (선택)
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+# 저장소 루트 (modules 패키지 import용)
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(REPO_ROOT))
+
+from modules.vector_db.filters import RecipeFilters
+from modules.vector_db.metrics import CompositeSink, JsonLinesSink, get_registry
+from modules.vector_db.micro_batcher import MicroBatcher
+from modules.vector_db.search import RecipeSearcher
+
+app = FastAPI(title="Recipe Search API")
+
+# Global searcher / batcher
+state = {}
+
+
+class SearchRequest(BaseModel):
+    ingredients: List[str]
+    n_results: int = 5
+    filters: Optional[Dict[str, Any]] = None
+
+
+@app.on_event("startup")
+async def load_searcher():
+    """검색기 로드 (모델/DB는 백그라운드 워밍업, 준비 전 요청은 키워드 매칭 결과)"""
+    print("Loading RecipeSearcher...")
+    sink = get_registry()
+    if os.getenv("SEARCH_METRICS_LOG"):
+        sink = CompositeSink([sink, JsonLinesSink(os.getenv("SEARCH_METRICS_LOG"))])
+
+    searcher = RecipeSearcher(
+        db_path=os.getenv("SEARCH_DB_PATH", "./modules/vector_db/vectordb_recipes"),
+        backend=os.getenv("SEARCH_BACKEND", "chroma"),
+        background_warmup=True,
+        warmup_wait=5.0,
+        metrics=sink,
+        hnsw_search_ef=int(os.getenv("SEARCH_HNSW_EF")) if os.getenv("SEARCH_HNSW_EF") else None,
+        backend_options={
+            "kind": os.getenv("SEARCH_IVF_KIND", "pq"),
+            "nprobe": int(os.getenv("SEARCH_IVF_NPROBE", "8")),
+            "shortlist": int(os.getenv("SEARCH_IVF_SHORTLIST")) if os.getenv("SEARCH_IVF_SHORTLIST") else None,
+        } if os.getenv("SEARCH_BACKEND") == "ivf" else None,
+    )
+    state["searcher"] = searcher
+    state["batcher"] = MicroBatcher(
+        searcher,
+        max_batch_size=int(os.getenv("SEARCH_MAX_BATCH", "32")),
+        max_wait_ms=float(os.getenv("SEARCH_BATCH_WAIT_MS", "5")),
+        workers=int(os.getenv("SEARCH_WORKERS", "2")),
+    )
+
+
+@app.on_event("shutdown")
+async def close_batcher():
+    if "batcher" in state:
+        state["batcher"].close()
+
+
+@app.post("/search")
+async def search(request: SearchRequest):
+    """
+    재료 리스트로 하이브리드 검색
+
+    Returns:
+        {"results": [{"name", "original_name", "score", "ingredients", "url"}, ...], "count": int}
+    """
+    if not request.ingredients:
+        return {"results": [], "count": 0}
+
+    # 잘못된 필터는 배처에 넣기 전에 400으로 응답
+    try:
+        filters = RecipeFilters.coerce(request.filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"invalid filters: {e}")
+
+    try:
+        future = state["batcher"].submit(request.ingredients, request.n_results, filters)
+        results = await asyncio.wrap_future(future)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {"results": results, "count": len(results)}
+
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint"""
+    searcher = state.get("searcher")
+    return {"status": "healthy", "ready": bool(searcher and searcher.ready)}
+
+
+@app.get("/stats")
+async def stats():
+    """배치/캐시/후보 추출 통계"""
+    searcher = state["searcher"]
+    return {
+        "batcher": state["batcher"].stats(),
+        "embedding_cache": searcher.embedding_cache.stats(),
+        "fetch": searcher.fetch_stats(),
+        "startup_timings": searcher.startup_timings,
+        "collection": {
+            "name": getattr(getattr(searcher, "collection", None), "name", None),
+            "swaps": searcher.collection_swaps,
+            "refreshes": searcher.collection_refreshes,
+        },
+        "metrics": get_registry().snapshot(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus 스크레이프용 단계별 지연/후보 수/캐시 히트 지표"""
+    return get_registry().to_prometheus()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("SEARCH_PORT", "8090")))